@@ -0,0 +1,222 @@
+import argparse
+import contextlib
+import functools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+import numpy as np
+
+# Benchmark harness for the two generators. Every scenario runs in a fresh child process, so
+# its peak RSS is its own, and writes its outputs to a temporary directory. Wall time is split
+# into stages by wrapping the generators' functions with exclusive timers (a nested stage pauses
+# its parent). Results are appended as one JSON line per run to benchmark_results.jsonl, so runs
+# of different versions can be compared; a failing scenario is recorded with its error instead of
+# its measurements. Standard library and NumPy only; no network access.
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(SRC_DIR, 'Output', 'benchmark_results.jsonl')
+
+# Historical scales, in days from START_DATE
+SCALES = {"day": 1, "month": 30, "year": 365, "5y": 5 * 365 + 1}
+DEFAULT_SCALES = ["day", "month", "year", "5y"]
+DEFAULT_LOADS = [1, 4]
+DEFAULT_DAILY_LOADS = [1, 10]
+DEFAULT_MODES = ["batch", "simulation"]
+
+class StageTimer:
+    """Accumulates exclusive wall time per stage across wrapped calls."""
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self._stack = []  # [stage, time the stage last (re)started]
+
+    def _enter(self, stage):
+        now = time.perf_counter()
+        if self._stack:
+            self.totals[self._stack[-1][0]] += now - self._stack[-1][1]
+        self._stack.append([stage, now])
+
+    def _exit(self):
+        now = time.perf_counter()
+        stage, started = self._stack.pop()
+        self.totals[stage] += now - started
+        if self._stack:
+            self._stack[-1][1] = now
+
+    def wrap(self, stage, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            self._enter(stage)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._exit()
+        return timed
+
+    def wrap_iter(self, stage, func):
+        """Like wrap, for generator functions: each step of the iteration is timed."""
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            iterator = iter(func(*args, **kwargs))
+            while True:
+                self._enter(stage)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self._exit()
+                yield item
+        return timed
+
+def patch(timer, stage, owner, names, iterator=False):
+    wrap = timer.wrap_iter if iterator else timer.wrap
+    for name in names:
+        setattr(owner, name, wrap(stage, getattr(owner, name)))
+
+def instrument_historical(timer):
+    import event_log_io
+    import historical_event_log as h
+    import id_allocator
+    patch(timer, "plan", h, ["build_day_plan"])
+    patch(timer, "roster", h, ["build_shift_roster"])
+    patch(timer, "id_allocation", id_allocator.UniqueIdAllocator, ["ids_at"])
+    patch(timer, "generation", h, ["iter_batch_day_tasks", "iter_per_case_days"], iterator=True)
+    patch(timer, "generation", h, ["generate_day_batch", "simulate_day_batch"])
+    patch(timer, "json_write", h, ["batch_to_cases", "serialize_cases_json"])
+    patch(timer, "csv_write", h, ["batch_to_csv_rows", "csv_text"])
+    patch(timer, "columnar_write", h, ["write_batch_columns"])
+    patch(timer, "checkpoint", h, ["save_checkpoint"])
+    # The writers' write_cases serialize through event_log_io's own reference
+    patch(timer, "json_write", event_log_io, ["serialize_cases_json"])
+    for writer in (event_log_io.CaseJsonWriter, event_log_io.CaseNdjsonWriter):
+        patch(timer, "json_write", writer, ["write_cases", "write_serialized", "close"])
+    patch(timer, "csv_write", event_log_io.CaseCsvWriter, ["write_cases", "write_text", "close"])
+    patch(timer, "columnar_write", event_log_io.ColumnarBundleWriter, ["write_cases", "write_columns", "close"])
+
+def instrument_daily(timer):
+    import daily_event_log as d
+    patch(timer, "id_allocation", d, ["random_patient_id", "random_case_id"])
+    patch(timer, "generation", d, [name for name in vars(d) if name.startswith("generate_")] + ["add_case_attributes"])
+    patch(timer, "json_write", d, ["save_event_log_json"])
+    patch(timer, "csv_write", d, ["save_event_log_csv"])
+    patch(timer, "columnar_write", d, ["save_event_log_columnar"])
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    return resource.getrusage(who).ru_maxrss / 1024  # ru_maxrss is in KiB on Linux
+
+def run_scenario(spec):
+    """Run one scenario in this process and return its result record."""
+    timer = StageTimer()
+    baseline_rss = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as output_dir, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if spec["generator"] == "historical":
+            import historical_event_log as h
+            instrument_historical(timer)
+            h.END_DATE = h.START_DATE + timedelta(days=spec["days"] - 1)
+            h.LOAD_MULTIPLIER = spec["load"]
+            start = time.perf_counter()
+            totals = h.main(output_dir=output_dir, mode=spec["mode"], workers=spec["workers"], instrumentation="quiet")
+        else:
+            import daily_event_log as d
+            instrument_daily(timer)
+            start = time.perf_counter()
+            totals = d.main(output_dir=output_dir, load=spec["load"], instrumentation="quiet")
+        wall = time.perf_counter() - start
+    stages = {stage: round(seconds, 4) for stage, seconds in sorted(timer.totals.items())}
+    stages["other"] = round(max(0.0, wall - sum(timer.totals.values())), 4)
+    return {
+        **spec,
+        "cases": totals["cases"],
+        "events": totals["events"],
+        "wall_seconds": round(wall, 4),
+        "cases_per_second": round(totals["cases"] / wall, 1),
+        "events_per_second": round(totals["events"] / wall, 1),
+        # With worker processes the generation runs in the children, so the stages only split the parent's time
+        "stages": stages,
+        "baseline_rss_mb": round(baseline_rss, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "workers_peak_rss_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    }
+
+def run_in_child(spec):
+    """Run a scenario in a fresh interpreter so peak RSS is measured per scenario."""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+        cwd=SRC_DIR, capture_output=True, text=True,
+    )
+    if completed.returncode:
+        # Recorded as an error entry, so one failing scenario does not lose the others' results
+        return {**spec, "error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit status {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def iter_scenarios(args):
+    if "historical" in args.generators:
+        for mode in args.modes:
+            for scale in args.scales:
+                for load in args.loads:
+                    yield {"generator": "historical", "mode": mode, "scale": scale, "days": SCALES[scale], "load": load, "workers": args.workers}
+    if "daily" in args.generators:
+        for load in args.daily_loads:
+            yield {"generator": "daily", "mode": "snapshot", "scale": "snapshot", "days": 1, "load": load, "workers": 1}
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_result(result):
+    if "error" in result:
+        print(f"{result['generator']:<10} {result['mode']:<10} {result['scale']:<8} x{result['load']:<4g} FAILED: {result['error']}")
+        return
+    stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["stages"].items())
+    print(f"{result['generator']:<10} {result['mode']:<10} {result['scale']:<8} x{result['load']:<4g} "
+          f"{result['cases']:>9} cases {result['wall_seconds']:>8.2f}s {result['cases_per_second']:>10.0f} cases/s "
+          f"{result['events_per_second']:>11.0f} events/s {result['peak_rss_mb']:>7.0f} MB")
+    print(f"    {stages}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the historical and daily event log generators.")
+    parser.add_argument("--generators", nargs="+", choices=["historical", "daily"], default=["historical", "daily"])
+    parser.add_argument("--modes", nargs="+", choices=["batch", "simulation", "per_case"], default=DEFAULT_MODES)
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=DEFAULT_SCALES)
+    parser.add_argument("--loads", nargs="+", type=float, default=DEFAULT_LOADS, help="historical case-count multipliers")
+    parser.add_argument("--daily-loads", nargs="+", type=float, default=DEFAULT_DAILY_LOADS, help="daily case-count multipliers")
+    parser.add_argument("--workers", type=int, default=1, help="historical PARALLEL_WORKERS (stage times need 1)")
+    parser.add_argument("--output", default=RESULTS_PATH, help="JSON Lines file the run is appended to")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(run_scenario(json.loads(args.child))))
+        return
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": [],
+    }
+    for spec in iter_scenarios(args):
+        result = run_in_child(spec)
+        print_result(result)
+        run["results"].append(result)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "a") as f:
+        f.write(json.dumps(run) + "\n")
+    print(f"Appended {len(run['results'])} results to {args.output}")
+    failed = sum("error" in result for result in run["results"])
+    if failed:
+        sys.exit(f"{failed} scenario(s) failed")
+
+if __name__ == "__main__":
+    main()
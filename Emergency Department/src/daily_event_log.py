@@ -1,604 +1,174 @@
 import random
-random.seed(42)
+RANDOM_SEED = 42
+random.seed(RANDOM_SEED)
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 import csv
 from collections import Counter
+import numpy as np
+from event_log_io import (
+    CSV_FIELDNAMES, ColumnarBundleWriter, format_epoch_minute, json_log_path, merge_case_rows,
+    open_case_json_writer, to_epoch_minutes,
+)
+from id_allocator import UniqueIdAllocator
+from instrumentation import Instrumentation
+from variant_spec import LWBS_ACTIVITY, allocate_counts, compile_daily_spec, load_variant_spec, split_paths
+
+# Also write a columnar .npy bundle next to the CSV/JSON (see event_log_io.load_columnar)
+COLUMNAR_EXPORT = True
+# "json" writes alderaan_daily.json; "ndjson" writes alderaan_daily.ndjson (FreezeTime header line,
+# then one case per line)
+JSON_FORMAT = "json"
+# "quiet", "progress" or "jsonl" (see instrumentation.py); None uses $ED_INSTRUMENTATION or "progress"
+INSTRUMENTATION = None
+# Stage thresholds, in-progress stages, LWBS and completed variants are declared in the "daily"
+# section of variants.json (see variant_spec.py); None uses src/variants.json
+VARIANT_SPEC_PATH = None
+# Digits in the numeric part of case IDs (ED123456) and patient IDs (P1234). IDs are drawn without
+# replacement, so a run needing more IDs than the width allows fails up front; widen it for
+# large loads or many sites.
+CASE_ID_DIGITS = 6
+PATIENT_ID_DIGITS = 4
+SNAPSHOT_TIME = datetime(2025, 5, 4, 14, 0)
 
 def load_activities(src_dir):
     with open(os.path.join(src_dir, 'activities.json'), 'r') as f:
         return json.load(f)
 
-def random_patient_id(used_patient_ids):
-    while True:
-        pid = f"P{random.randint(1000, 9999)}"
-        if pid not in used_patient_ids:
-            used_patient_ids.add(pid)
-            return pid
-
-def random_case_id(used_case_ids):
-    while True:
-        cid = f"ED{random.randint(100000, 999999)}"
-        if cid not in used_case_ids:
-            used_case_ids.add(cid)
-            return cid
-
-def generate_case_activities(start_time, complete=True, stage=None, stage_time=None, freeze_time=None):
-    activities_list = []
-    path = [
-        "Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination"
+def id_allocator(prefix, digits, key):
+    """Unique IDs f"{prefix}{n}" with n drawn without replacement from the `digits`-digit numbers."""
+    return UniqueIdAllocator(prefix, 10 ** (digits - 1), 10 ** digits - 1, key=[RANDOM_SEED, key])
+
+def check_id_capacity(case_ids, patient_ids, n_cases):
+    for ids, setting in ((case_ids, "CASE_ID_DIGITS"), (patient_ids, "PATIENT_ID_DIGITS")):
+        if ids.remaining < n_cases:
+            raise ValueError(f"{n_cases} cases need more than the {ids.remaining} unique {ids.prefix} IDs left; increase {setting}.")
+
+def plan_case_counts(spec, load=1, stage_loads=None):
+    """(in-progress, LWBS, completed) case counts of a snapshot, known before any case is drawn.
+
+    `stage_loads` optionally overrides `load` for the in-progress stages it names.
+    """
+    stage_loads = stage_loads or {}
+    n_in_progress = sum(
+        scaled(band['count'], stage_loads.get(stage['stage'], load)) for stage in spec['in_progress'] for band in stage['bands']
+    )
+    lwbs = spec['lwbs']
+    n_lwbs = max(lwbs['minimum'], round(lwbs['rate'] * n_in_progress))
+    return n_in_progress, n_lwbs, scaled(spec['completed']['total'], load)
+
+def random_patient_id(patient_ids):
+    """Next patient ID; constant time, never repeats (see id_allocator.UniqueIdAllocator)."""
+    return next(patient_ids)
+
+def random_case_id(case_ids):
+    return next(case_ids)
+
+def scaled(n, load=1):
+    return int(round(n * load))
+
+def draw_gaps(n, gap_minutes=(5, 30)):
+    return [random.randint(*gap_minutes) for _ in range(n)]
+
+def assign_timestamps(paths, last_times, intervals):
+    """Activity lists for a batch of cases: case k follows paths[k] and ends at last_times[k].
+
+    `intervals` holds the minutes between consecutive activities of all cases, flat and in case
+    order (len(path) - 1 per case). All times come from one cumulative sum, so the cost is linear
+    in the number of events however long the paths are.
+    """
+    lengths = np.fromiter(map(len, paths), dtype=np.int64, count=len(paths))
+    case_start = np.cumsum(lengths) - lengths
+    steps = np.ones(int(lengths.sum()), dtype=bool)
+    steps[case_start] = False
+    offset = np.zeros(len(steps), dtype=np.int64)
+    offset[steps] = intervals
+    # Minutes since each case's first activity; the last one is the case's total duration
+    offset = np.cumsum(offset)
+    offset -= np.repeat(offset[case_start], lengths)
+    first_time = np.asarray(last_times, dtype=np.int64) - offset[case_start + lengths - 1]
+    times = (np.repeat(first_time, lengths) + offset).tolist()
+    return [
+        [{"ActivityName": activity, "ActivityTime": t} for activity, t in zip(path, times[start:start + len(path)])]
+        for path, start in zip(paths, case_start.tolist())
     ]
-    if random.random() < 0.7:
-        path.append("Diagnostic Test Ordered")
-        if random.random() < 0.8:
-            path.append("Blood Test Performed")
-        if random.random() < 0.5:
-            path.append("Imaging Performed")
-        path.append("Test Results Available")
-    if random.random() < 0.8:
-        path.append("Treatment Administered")
-    if random.random() < 0.3:
-        path.append("Observation")
-    if random.random() < 0.1:
-        path.append("Specialist Consultation")
-    path.append("Disposition Decision Recorded")
-    if complete:
-        path.append(random.choice(["Discharged", "Admitted to Hospital"]))
-    stage_to_activity = {
-        'Waiting for Registration': 'Registration',
-        'Waiting for Triage': 'Triage',
-        'Waiting for Bed': 'Bed Assigned',
-        'Waiting for Nurse Assessment': 'Nurse Assessment',
-        'Waiting for Doctor': 'Doctor Examination',
-        'Waiting for Diagnostic Test': 'Diagnostic Test Ordered',
-        'Waiting for Test Results': 'Test Results Available',
-        'Waiting for Treatment': 'Treatment Administered',
-        'Waiting for Observation Completion': 'Observation',
-        'Waiting for Specialist Consultation': 'Specialist Consultation',
-        'Waiting for Discharge': 'Disposition Decision Recorded',
-        'Waiting for Admission to Hospital': 'Admitted to Hospital',
-        'Waiting for Transfer to Another Facility': 'Transferred to Another Facility'
-    }
-    if stage and stage in stage_to_activity:
-        stop_activity = stage_to_activity[stage]
-        if stop_activity in path:
-            stop_index = path.index(stop_activity)
-            path = path[:stop_index]
-    # If in-progress (not complete), generate backwards from freeze_time - stage_time
-    if not complete and stage and freeze_time is not None and stage_time is not None:
-        n = len(path)
-        # Generate random intervals for each activity
-        intervals = [random.randint(5, 30) for _ in range(n)]
-        total = sum(intervals)
-        # The last activity time is freeze_time - stage_time
-        last_time = freeze_time - timedelta(minutes=stage_time)
-        # Calculate all activity times backwards
-        times = [last_time - timedelta(minutes=sum(intervals[i+1:])) for i in range(n)]
-        for activity, t in zip(path, times):
-            activities_list.append({
-                "ActivityName": activity,
-                "ActivityTime": t.strftime("%Y-%m-%d %H:%M:%S")
-            })
-    else:
-        # Completed cases: generate forward as before
-        time = start_time
-        for activity in path:
-            time += timedelta(minutes=random.randint(5, 30))
-            activities_list.append({
-                "ActivityName": activity,
-                "ActivityTime": time.strftime("%Y-%m-%d %H:%M:%S")
-            })
-    return activities_list
-
-def generate_completed_cases(num_completed_patients, snapshot_time, used_patient_ids, used_case_ids):
-    completed_cases = []
-    for _ in range(num_completed_patients):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        # Build the path with optional activities
-        path = ["Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination"]
-        if random.random() < 0.7:
-            path.append("Diagnostic Test Ordered")
-            if random.random() < 0.8:
-                path.append("Blood Test Performed")
-            if random.random() < 0.5:
-                path.append("Imaging Performed")
-            path.append("Test Results Available")
-        if random.random() < 0.8:
-            path.append("Treatment Administered")
-        if random.random() < 0.3:
-            path.append("Observation")
-        # Always end with Disposition Decision Recorded and a final outcome
-        if path[-1] != "Observation":
-            # If last activity is not Observation, just append
-            path.append("Disposition Decision Recorded")
-        else:
-            # If last activity is Observation, ensure Disposition Decision Recorded comes after
-            path.append("Disposition Decision Recorded")
-        path.append(random.choice(["Discharged", "Admitted to Hospital"]))
-        # Assign timestamps forward
-        n = len(path)
-        intervals = [random.randint(5, 30) for _ in range(n-1)]
-        total = sum(intervals)
-        last_time = snapshot_time - timedelta(hours=random.randint(2, 10))
-        times = [last_time - timedelta(minutes=total)]
-        for interval in intervals:
-            times.append(times[-1] + timedelta(minutes=interval))
-        activities_list = [
-            {"ActivityName": activity, "ActivityTime": t.strftime("%Y-%m-%d %H:%M:%S")} 
-            for activity, t in zip(path, times)
-        ]
-        completed_cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list
-        })
-    return completed_cases
-
-def generate_discharged_cases(snapshot_time, used_patient_ids, used_case_ids, n=62):
-    cases = []
-    for _ in range(n):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        # Optionally add observation, but always end with Discharged
-        path = [
-            "Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination",
-            "Diagnostic Test Ordered", "Blood Test Performed", "Test Results Available",
-            "Treatment Administered"
-        ]
-        if random.random() < 0.3:
-            path.append("Observation")
-        path.append("Disposition Decision Recorded")
-        path.append("Discharged")
-        n_acts = len(path)
-        intervals = [random.randint(5, 30) for _ in range(n_acts-1)]
-        total = sum(intervals)
-        last_time = snapshot_time - timedelta(hours=random.randint(2, 10))
-        times = [last_time - timedelta(minutes=total)]
-        for interval in intervals:
-            times.append(times[-1] + timedelta(minutes=interval))
-        activities_list = [
-            {"ActivityName": activity, "ActivityTime": t.strftime("%Y-%m-%d %H:%M:%S")}
-            for activity, t in zip(path, times)
-        ]
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list
-        })
-    return cases
-
-def generate_admitted_cases(snapshot_time, used_patient_ids, used_case_ids, n=64):
-    cases = []
-    for _ in range(n):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        path = [
-            "Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination",
-            "Diagnostic Test Ordered", "Imaging Performed", "Test Results Available",
-            "Treatment Administered"
-        ]
-        if random.random() < 0.3:
-            path.append("Observation")
-        path.append("Disposition Decision Recorded")
-        path.append("Admitted to Hospital")
-        n_acts = len(path)
-        intervals = [random.randint(5, 30) for _ in range(n_acts-1)]
-        total = sum(intervals)
-        last_time = snapshot_time - timedelta(hours=random.randint(2, 10))
-        times = [last_time - timedelta(minutes=total)]
-        for interval in intervals:
-            times.append(times[-1] + timedelta(minutes=interval))
-        activities_list = [
-            {"ActivityName": activity, "ActivityTime": t.strftime("%Y-%m-%d %H:%M:%S")}
-            for activity, t in zip(path, times)
-        ]
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list
-        })
-    return cases
-
-def generate_triage_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=6, n_warning=0, n_critical=0):
-    cases = []
-    triage_warning = stage_thresholds['Waiting for Triage'][0]
-    triage_critical = stage_thresholds['Waiting for Triage'][1]
-    
-    # OK cases
-    for _ in range(n_ok):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(1, triage_warning)
-        path = ["Registration"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Triage',
-            "waiting_time": wait_time
-        })
-    
-    # Warning cases
-    for _ in range(n_warning):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(triage_warning+1, triage_critical-1)
-        path = ["Registration"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Triage',
-            "waiting_time": wait_time
-        })
-    
-    # Critical cases
-    for _ in range(n_critical):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(triage_critical+1, triage_critical+30)
-        path = ["Registration"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Triage',
-            "waiting_time": wait_time
-        })
-    
-    return cases
-
-def generate_bed_assignment_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=4, n_warning=0, n_critical=0):
-    cases = []
-    bed_warning = stage_thresholds['Waiting for Bed'][0]
-    for _ in range(n_ok):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(1, bed_warning)
-        path = ["Registration", "Triage"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Bed',
-            "waiting_time": wait_time
-        })
-    return cases
-
-def generate_nurse_assessment_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=5, n_warning=1):
-    cases = []
-    nurse_warning = stage_thresholds['Waiting for Nurse Assessment'][0]
-    for _ in range(n_ok):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(1, nurse_warning)
-        path = ["Registration", "Triage", "Bed Assigned"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Nurse Assessment',
-            "waiting_time": wait_time
-        })
-    for _ in range(n_warning):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(nurse_warning+1, nurse_warning+20)
-        path = ["Registration", "Triage", "Bed Assigned"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Nurse Assessment',
-            "waiting_time": wait_time
-        })
-    return cases
-
-def generate_doctor_examination_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=5):
-    cases = []
-    doctor_warning = stage_thresholds['Waiting for Doctor'][0]
-    for _ in range(n_ok):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(1, doctor_warning)
-        path = ["Registration", "Triage", "Bed Assigned", "Nurse Assessment"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Doctor',
-            "waiting_time": wait_time
-        })
-    return cases
-
-def generate_test_results_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=3, n_warning=1, n_critical=0):
-    cases = []
-    test_results_warning = stage_thresholds['Waiting for Test Results'][0]
-    for _ in range(n_ok):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(1, test_results_warning)
-        path = ["Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination", "Diagnostic Test Ordered", "Blood Test Performed"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Test Results',
-            "waiting_time": wait_time
-        })
-    for _ in range(n_warning):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(test_results_warning+1, test_results_warning+60)
-        path = ["Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination", "Diagnostic Test Ordered", "Imaging Performed"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Test Results',
-            "waiting_time": wait_time
-        })
-    return cases
-
-# --- ENFORCE STRICT CONTROL OVER OBSERVATION COMPLETION CASES ---
-# Only generate_observation_cases can end with 'Observation'.
-# Remove 'Observation' as a possible last activity from all other per-stage generators.
-
-def generate_treatment_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=3, n_warning=1):
-    cases = []
-    treatment_warning = stage_thresholds['Waiting for Treatment'][0]
-    n_ok_doctor = n_ok // 2
-    n_ok_test = n_ok - n_ok_doctor
-    n_warning_doctor = n_warning // 2
-    n_warning_test = n_warning - n_warning_doctor
-    def assign_timestamps_forward(path, last_time):
-        n = len(path)
-        intervals = [random.randint(5, 30) for _ in range(n-1)]
-        total = sum(intervals)
-        times = [last_time - timedelta(minutes=total)]
-        for interval in intervals:
-            times.append(times[-1] + timedelta(minutes=interval))
-        return [
-            {"ActivityName": activity, "ActivityTime": t.strftime("%Y-%m-%d %H:%M:%S")} 
-            for activity, t in zip(path, times)
-        ]
-    # OK cases: after Doctor Examination (no test ordered)
-    for _ in range(n_ok_doctor):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(1, treatment_warning)
-        path = ["Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Treatment',
-            "waiting_time": wait_time
-        })
-    # OK cases: after Test Results Available (test path)
-    for _ in range(n_ok_test):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(1, treatment_warning)
-        path = ["Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination", "Diagnostic Test Ordered", "Blood Test Performed", "Test Results Available"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Treatment',
-            "waiting_time": wait_time
-        })
-    # Warning cases: after Doctor Examination (no test ordered)
-    for _ in range(n_warning_doctor):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(treatment_warning+1, treatment_warning+30)
-        path = ["Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Treatment',
-            "waiting_time": wait_time
-        })
-    # Warning cases: after Test Results Available (test path)
-    for _ in range(n_warning_test):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(treatment_warning+1, treatment_warning+30)
-        path = ["Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination", "Diagnostic Test Ordered", "Blood Test Performed", "Test Results Available"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Treatment',
-            "waiting_time": wait_time
-        })
-    return cases
-
-# In all other per-stage generators, ensure the path does not end with 'Observation'.
-# (No changes needed for generate_observation_cases, which is the only function allowed to end with 'Observation'.)
-
-def generate_observation_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=9, n_warning=4, n_critical=0):
-    cases = []
-    obs_warning = stage_thresholds['Waiting for Observation Completion'][0] or 60
-    obs_critical = stage_thresholds['Waiting for Observation Completion'][1] or 180
-    # OK cases
-    for _ in range(n_ok):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(1, obs_warning)
-        path = ["Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination", "Treatment Administered", "Observation"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Observation Completion',
-            "waiting_time": wait_time
-        })
-    # Warning cases
-    for _ in range(n_warning):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        wait_time = random.randint(obs_warning+1, obs_critical-1)
-        path = ["Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination", "Treatment Administered", "Observation"]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Observation Completion',
-            "waiting_time": wait_time
-        })
-    # No critical cases
-    return cases
-
-def generate_disposition_decision_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=6, n_warning=2, n_critical=0):
-    cases = []
-    disp_warning = stage_thresholds['Waiting for Discharge'][0]
-    disp_critical = stage_thresholds['Waiting for Discharge'][1]
-    for _ in range(n_ok):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_case_ids)
-        wait_time = random.randint(1, disp_warning)
-        path = [
-            "Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination",
-            "Treatment Administered", "Observation", "Disposition Decision Recorded"
-        ]
-        # Truncate path so last activity is always 'Disposition Decision Recorded'
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Discharge',
-            "waiting_time": wait_time
-        })
-    for _ in range(n_warning):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_case_ids)
-        wait_time = random.randint(disp_warning+1, disp_critical-1)
-        path = [
-            "Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination",
-            "Treatment Administered", "Observation", "Disposition Decision Recorded"
-        ]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list,
-            "current_stage": 'Waiting for Discharge',
-            "waiting_time": wait_time
-        })
-    for _ in range(n_critical):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_case_ids)
-        wait_time = random.randint(disp_critical+1, disp_critical+30)
-        path = [
-            "Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination",
-            "Treatment Administered", "Observation", "Disposition Decision Recorded"
-        ]
-        last_time = snapshot_time - timedelta(minutes=wait_time)
-        activities_list = assign_timestamps_forward(path, last_time)
-        cases.append({
+
+def generate_stage_cases(stage, snapshot_time, patient_ids, case_ids, gap_minutes=(5, 30), load=1):
+    """In-progress cases waiting at one stage of the compiled daily spec, band by band.
+
+    A band's cases are shared over its paths in order (the last path takes the remainder); the
+    waiting time since the last activity is drawn from the band's range.
+    """
+    snapshot_minute = to_epoch_minutes(snapshot_time)
+    drawn, paths, last_times, intervals = [], [], [], []
+    for band in stage['bands']:
+        for path, n in split_paths(scaled(band['count'], load), band['paths']):
+            for _ in range(n):
+                case_id = random_case_id(case_ids)
+                patient_id = random_patient_id(patient_ids)
+                wait_time = random.randint(*band['wait'])
+                paths.append(path)
+                last_times.append(snapshot_minute - wait_time)
+                intervals.extend(draw_gaps(len(path) - 1, gap_minutes))
+                drawn.append((case_id, patient_id, wait_time))
+    return [
+        {
             "CaseId": case_id,
             "PatientID": patient_id,
             "activities": activities_list,
-            "current_stage": 'Waiting for Discharge',
+            "current_stage": stage['stage'],
             "waiting_time": wait_time
-        })
-    return cases
-
-# Helper for forward timestamp assignment (shared)
-def assign_timestamps_forward(path, last_time):
-    n = len(path)
-    intervals = [random.randint(5, 30) for _ in range(n-1)]
-    total = sum(intervals)
-    times = [last_time - timedelta(minutes=total)]
-    for interval in intervals:
-        times.append(times[-1] + timedelta(minutes=interval))
+        }
+        for (case_id, patient_id, wait_time), activities_list in zip(drawn, assign_timestamps(paths, last_times, intervals))
+    ]
+
+def generate_completed_cases(completed, snapshot_time, patient_ids, case_ids, gap_minutes=(5, 30), load=1):
+    """Closed cases of the compiled daily spec's completed variants, ending some hours before the snapshot."""
+    snapshot_minute = to_epoch_minutes(snapshot_time)
+    variants = completed['variants']
+    drawn, paths, last_times, intervals = [], [], [], []
+    for variant, n in zip(variants, allocate_counts(scaled(completed['total'], load), variants)):
+        for _ in range(n):
+            case_id = random_case_id(case_ids)
+            patient_id = random_patient_id(patient_ids)
+            # Optional activities are kept with their probability
+            path = [activity for activity, p in variant['path'] if p is None or random.random() < p]
+            paths.append(path)
+            intervals.extend(draw_gaps(len(path) - 1, gap_minutes))
+            last_times.append(snapshot_minute - 60 * random.randint(*completed['end_hours_ago']))
+            drawn.append((case_id, patient_id))
     return [
-        {"ActivityName": activity, "ActivityTime": t.strftime("%Y-%m-%d %H:%M:%S")} 
-        for activity, t in zip(path, times)
+        {"CaseId": case_id, "PatientID": patient_id, "activities": activities_list}
+        for (case_id, patient_id), activities_list in zip(drawn, assign_timestamps(paths, last_times, intervals))
     ]
 
 def save_event_log_json(all_cases, output_dir, snapshot_time):
-    event_log = {
-        "FreezeTime": snapshot_time.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-        "cases": all_cases
-    }
+    metadata = {"FreezeTime": snapshot_time.strftime("%Y-%m-%dT%H:%M:%S+00:00")}
     os.makedirs(output_dir, exist_ok=True)
-    with open(os.path.join(output_dir, 'alderaan_daily.json'), 'w') as f:
-        json.dump(event_log, f, indent=2)
+    with open_case_json_writer(json_log_path(os.path.join(output_dir, 'alderaan_daily'), JSON_FORMAT), metadata) as writer:
+        writer.write_cases(all_cases)
 
 def save_event_log_csv(all_cases, output_dir):
-    all_events = []
-    for case in all_cases:
-        vitals = case.get('VitalSigns', {})
-        for activity in case['activities']:
-            all_events.append({
-                "CaseId": case['CaseId'],
-                "ActivityName": activity['ActivityName'],
-                "ActivityTime": activity['ActivityTime'],
-                "PatientID": case['PatientID'],
-                "Resource": activity.get('Resource', ''),
-                "Age": case.get('Age', ''),
-                "Sex": case.get('Sex', ''),
-                "ModeOfArrival": case.get('ModeOfArrival', ''),
-                "VisitType": case.get('VisitType', ''),
-                "HR": vitals.get('HR', ''),
-                "BP": vitals.get('BP', ''),
-                "Temp": vitals.get('Temp', ''),
-                "O2Sat": vitals.get('O2Sat', ''),
-                "Triage": case.get('Triage', ''),
-                "ArrivalShift": case.get('ArrivalShift', '')
-            })
-    all_events.sort(key=lambda x: (x['ActivityTime'], x['CaseId']))
     os.makedirs(output_dir, exist_ok=True)
     csv_path = os.path.join(output_dir, 'alderaan_daily.csv')
-    fieldnames = [
-        "CaseId", "ActivityName", "ActivityTime", "PatientID", "Resource",
-        "Age", "Sex", "ModeOfArrival", "VisitType", "HR", "BP", "Temp", "O2Sat", "Triage", "ArrivalShift"
-    ]
+    n_events = 0
     with open(csv_path, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for event in all_events:
-            writer.writerow(event)
-    print(f"Generated {len(all_events)} event log entries (JSON and CSV).\n")
+        writer = csv.writer(csvfile)
+        writer.writerow(CSV_FIELDNAMES)
+        # Each case's activities are already in time order, so the rows are k-way merged by
+        # (ActivityTime, CaseId) as they are written; times are formatted one row at a time
+        for row in merge_case_rows(all_cases):
+            row[2] = format_epoch_minute(row[2])
+            writer.writerow(row)
+            n_events += 1
+    print(f"Generated {n_events} event log entries (JSON and CSV).\n")
+
+def save_event_log_columnar(all_cases, output_dir, snapshot_time):
+    os.makedirs(output_dir, exist_ok=True)
+    metadata = {"FreezeTime": snapshot_time.strftime("%Y-%m-%dT%H:%M:%S+00:00")}
+    with ColumnarBundleWriter(os.path.join(output_dir, 'alderaan_daily_columnar'), metadata) as writer:
+        writer.write_cases(all_cases)
 
 def print_statistics(completed_cases, current_cases):
     print("=== Event Log Statistics Report ===\n")
@@ -627,39 +197,58 @@ def print_statistics(completed_cases, current_cases):
         print(f"    {activity}: {count}")
     print()
 
-def generate_lwbs_cases(snapshot_time, used_patient_ids, used_case_ids, n=2):
+def generate_lwbs_cases(lwbs, snapshot_time, patient_ids, case_ids, n=2, gap_minutes=(5, 30)):
     """Generate cases where the patient leaves without being seen (LWBS) at various stages."""
-    cases = []
-    lwbs_variants = [
-        ["Registration"],
-        ["Registration", "Triage"],
-        ["Registration", "Triage", "Bed Assigned"],
-        ["Registration", "Triage", "Bed Assigned", "Nurse Assessment"]
-    ]
+    snapshot_minute = to_epoch_minutes(snapshot_time)
+    drawn, paths, last_times, intervals = [], [], [], []
     for i in range(n):
-        case_id = random_case_id(used_case_ids)
-        patient_id = random_patient_id(used_patient_ids)
-        # Cycle through variants
-        path = lwbs_variants[i % len(lwbs_variants)].copy()
-        # Add LWBS as the last activity (no abbreviation)
-        path.append("Left Without Being Seen")
-        # Assign timestamps
-        time = snapshot_time - timedelta(hours=random.randint(1, 10))
-        activities_list = []
-        for activity in path:
-            time += timedelta(minutes=random.randint(5, 30))
-            activities_list.append({
-                "ActivityName": activity,
-                "ActivityTime": time.strftime("%Y-%m-%d %H:%M:%S")
-            })
-        cases.append({
+        case_id = random_case_id(case_ids)
+        patient_id = random_patient_id(patient_ids)
+        # Cycle through the LWBS paths (each ends with "Left Without Being Seen")
+        path = lwbs['paths'][i % len(lwbs['paths'])]
+        start_time = snapshot_minute - 60 * random.randint(*lwbs['start_hours_ago'])
+        # The registration itself comes one gap after the start time
+        gaps = draw_gaps(len(path), gap_minutes)
+        paths.append(path)
+        last_times.append(start_time + sum(gaps))
+        intervals.extend(gaps[1:])
+        drawn.append((case_id, patient_id, float(sum(gaps[1:]))))
+    return [
+        {
             "CaseId": case_id,
             "PatientID": patient_id,
             "activities": activities_list,
-            "current_stage": "Left Without Being Seen",
-            "waiting_time": (datetime.strptime(activities_list[-1]["ActivityTime"], "%Y-%m-%d %H:%M:%S") - datetime.strptime(activities_list[0]["ActivityTime"], "%Y-%m-%d %H:%M:%S")).total_seconds() // 60
-        })
-    return cases
+            "current_stage": LWBS_ACTIVITY,
+            "waiting_time": waiting_time
+        }
+        for (case_id, patient_id, waiting_time), activities_list in zip(drawn, assign_timestamps(paths, last_times, intervals))
+    ]
+
+def generate_snapshot(spec, snapshot_time, case_ids, patient_ids, load=1, stage_loads=None):
+    """(completed cases, in-progress and LWBS cases) of one snapshot; see plan_case_counts for the loads."""
+    stage_loads = stage_loads or {}
+    gap_minutes = spec['gap_minutes']
+    n_in_progress, lwbs_n, n_completed = plan_case_counts(spec, load, stage_loads)
+    check_id_capacity(case_ids, patient_ids, n_in_progress + lwbs_n + n_completed)
+    # In-progress cases, stage by stage as declared in the spec
+    current_cases = []
+    for stage in spec['in_progress']:
+        current_cases.extend(generate_stage_cases(
+            stage, snapshot_time, patient_ids, case_ids, gap_minutes, stage_loads.get(stage['stage'], load),
+        ))
+    # LWBS cases: a share of the in-progress cases (rounded)
+    current_cases.extend(generate_lwbs_cases(spec['lwbs'], snapshot_time, patient_ids, case_ids, lwbs_n, gap_minutes))
+    # Completed cases: only explicit discharged/admitted
+    completed_cases = generate_completed_cases(spec['completed'], snapshot_time, patient_ids, case_ids, gap_minutes, load)
+    # Only stages whose paths stop at Observation may leave a case there
+    obs_end_count = sum(1 for case in completed_cases + current_cases if case['activities'][-1]['ActivityName'] == 'Observation')
+    expected_obs_end = sum(
+        n for stage in spec['in_progress'] for band in stage['bands']
+        for path, n in split_paths(scaled(band['count'], stage_loads.get(stage['stage'], load)), band['paths'])
+        if path[-1] == 'Observation'
+    )
+    assert obs_end_count == expected_obs_end, f"Expected {expected_obs_end} cases ending with 'Observation', found {obs_end_count}"
+    return completed_cases, current_cases
 
 def random_age():
     # Skew toward adults, but include children and elderly
@@ -693,15 +282,14 @@ def random_triage():
     return random.choices([1, 2, 3, 4, 5], weights=[0.05, 0.15, 0.5, 0.2, 0.1])[0]
 
 def get_arrival_shift(activities):
-    reg_time_str = None
+    reg_time = None
     for act in activities:
         if act['ActivityName'] == 'Registration':
-            reg_time_str = act['ActivityTime']
+            reg_time = act['ActivityTime']
             break
-    if not reg_time_str:
+    if reg_time is None:
         return None
-    reg_time = datetime.strptime(reg_time_str, '%Y-%m-%d %H:%M:%S')
-    hour = reg_time.hour
+    hour = reg_time // 60 % 24
     if 7 <= hour < 15:
         return 'Day'
     elif 15 <= hour < 23:
@@ -719,69 +307,41 @@ def add_case_attributes(case):
     case['ArrivalShift'] = get_arrival_shift(case['activities'])
     return case
 
-def main():
+def main(output_dir=None, load=1, instrumentation=None):
+    """Generate the daily snapshot; `load` multiplies every case count (for stress tests and benchmarks).
+
+    Returns {"cases", "events"} written. Raises ValueError if the load needs more unique IDs than
+    CASE_ID_DIGITS / PATIENT_ID_DIGITS allow.
+    """
     SRC_DIR = os.path.dirname(os.path.abspath(__file__))
-    OUTPUT_DIR = os.path.join(SRC_DIR, 'Output')
+    OUTPUT_DIR = os.path.join(SRC_DIR, 'Output') if output_dir is None else output_dir
     activities = load_activities(SRC_DIR)
     activity_names = [a['name'] for a in activities]
-    stage_thresholds = {
-        'Waiting for Registration': (10, 30),
-        'Waiting for Triage': (15, 45),
-        'Waiting for Bed': (20, 60),
-        'Waiting for Nurse Assessment': (10, 30),
-        'Waiting for Doctor': (30, 90),
-        'Waiting for Diagnostic Test': (20, 60),
-        'Waiting for Test Results': (60, 180),
-        'Waiting for Treatment': (15, 45),
-        'Waiting for Observation Completion': (None, None),
-        'Waiting for Specialist Consultation': (60, 180),
-        'Waiting for Discharge': (15, 45),
-        'Waiting for Admission to Hospital': (30, 90),
-        'Waiting for Transfer to Another Facility': (60, 180)
-    }
-    snapshot_time = datetime(2025, 5, 4, 14, 0)
-    used_patient_ids = set()
-    used_case_ids = set()
-    # Modular per-stage in-progress case generation ONLY
-    current_cases = []
-    triage_cases = generate_triage_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=6, n_warning=3, n_critical=2)
-    current_cases.extend(triage_cases)
-    bed_assignment_cases = generate_bed_assignment_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=4, n_warning=0, n_critical=0)
-    current_cases.extend(bed_assignment_cases)
-    nurse_assessment_cases = generate_nurse_assessment_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=5, n_warning=1)
-    current_cases.extend(nurse_assessment_cases)
-    doctor_examination_cases = generate_doctor_examination_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=5)
-    current_cases.extend(doctor_examination_cases)
-    test_results_cases = generate_test_results_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=3, n_warning=1, n_critical=0)
-    current_cases.extend(test_results_cases)
-    treatment_cases = generate_treatment_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=3, n_warning=1)
-    current_cases.extend(treatment_cases)
-    observation_cases = generate_observation_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=9, n_warning=4, n_critical=0)
-    current_cases.extend(observation_cases)
-    disposition_cases = generate_disposition_decision_cases(snapshot_time, stage_thresholds, used_patient_ids, used_case_ids, n_ok=6, n_warning=2, n_critical=0)
-    current_cases.extend(disposition_cases)
-    # LWBS cases: 2% of total cases (rounded)
-    total_cases_so_far = len(current_cases)
-    lwbs_n = max(1, round(0.02 * total_cases_so_far))
-    lwbs_cases = generate_lwbs_cases(snapshot_time, used_patient_ids, used_case_ids, n=lwbs_n)
-    current_cases.extend(lwbs_cases)
-    # Completed cases: only explicit discharged/admitted
-    # Set total number of completed cases and admission rate
-    total_completed = 100  # Adjust as needed for realism
-    admit_rate = 0.17
-    n_admitted = int(round(total_completed * admit_rate))
-    n_discharged = total_completed - n_admitted
-    completed_cases = []
-    completed_cases.extend(generate_discharged_cases(snapshot_time, used_patient_ids, used_case_ids, n=n_discharged))
-    completed_cases.extend(generate_admitted_cases(snapshot_time, used_patient_ids, used_case_ids, n=n_admitted))
-    all_cases = completed_cases + current_cases
-    # Check for cases ending with 'Observation'
-    obs_end_count = sum(1 for case in all_cases if case['activities'][-1]['ActivityName'] == 'Observation')
-    print(f"CASES ENDING WITH 'Observation': {obs_end_count}")
-    assert obs_end_count == 13, f"Expected 13 cases ending with 'Observation', found {obs_end_count}"  # 9 OK + 4 warning
-    save_event_log_json(all_cases, OUTPUT_DIR, snapshot_time)
-    save_event_log_csv(all_cases, OUTPUT_DIR)
+    spec = compile_daily_spec(load_variant_spec(VARIANT_SPEC_PATH), set(activity_names) | {LWBS_ACTIVITY})
+    snapshot_time = SNAPSHOT_TIME
+    with Instrumentation("daily_event_log", INSTRUMENTATION if instrumentation is None else instrumentation) as inst:
+        with inst.phase("generate"):
+            case_ids = id_allocator("ED", CASE_ID_DIGITS, 1)
+            patient_ids = id_allocator("P", PATIENT_ID_DIGITS, 2)
+            completed_cases, current_cases = generate_snapshot(spec, snapshot_time, case_ids, patient_ids, load)
+        all_cases = completed_cases + current_cases
+        inst.count("cases", len(all_cases))
+        inst.count("events", sum(len(case['activities']) for case in all_cases))
+        obs_end_count = sum(1 for case in all_cases if case['activities'][-1]['ActivityName'] == 'Observation')
+        inst.message(f"CASES ENDING WITH 'Observation': {obs_end_count}")
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        inst.watch(json_log_path(os.path.join(OUTPUT_DIR, 'alderaan_daily'), JSON_FORMAT), 0)
+        inst.watch(os.path.join(OUTPUT_DIR, 'alderaan_daily.csv'), 0)
+        with inst.phase("json_write"):
+            save_event_log_json(all_cases, OUTPUT_DIR, snapshot_time)
+        with inst.phase("csv_write"):
+            save_event_log_csv(all_cases, OUTPUT_DIR)
+        if COLUMNAR_EXPORT:
+            inst.watch(os.path.join(OUTPUT_DIR, 'alderaan_daily_columnar'), 0)
+            with inst.phase("columnar_write"):
+                save_event_log_columnar(all_cases, OUTPUT_DIR, snapshot_time)
     print_statistics(completed_cases, current_cases)
+    return {"cases": len(all_cases), "events": sum(len(case['activities']) for case in all_cases)}
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,7 +1,7 @@
-import json
 from collections import defaultdict, Counter
 from datetime import datetime
 import os
+from event_log_io import find_event_log, read_event_log
 
 # Define thresholds for each stage (should match your generator)
 stage_thresholds = {
@@ -75,20 +75,22 @@ def get_status(stage, waiting_time):
     else:
         return 'Critical'
 
-# Load event_log.json
+# Load the event log (alderaan_daily.json or .ndjson, whichever was written last; NDJSON is streamed)
 dir_path = os.path.dirname(os.path.abspath(__file__))
 output_dir = os.path.join(dir_path, 'Output')
-with open(os.path.join(output_dir, 'alderaan_daily.json'), 'r') as f:
-    data = json.load(f)
+metadata, cases = read_event_log(find_event_log(output_dir, 'alderaan_daily'))
 
-cases = data['cases'] if 'cases' in data else data
-
-# Track cases per stage and check for overlaps
+# Track cases per stage and check for overlaps; last activities are tallied in the same pass
 stage_case_ids = defaultdict(set)
 stage_status_counts = defaultdict(lambda: Counter({'OK':0, 'Warning':0, 'Critical':0}))
 overlap_cases = set()
+last_activity_counter = Counter()
+obs_end_cases = []
+lwbs_cases = []
+num_cases = 0
 
 for case in cases:
+    num_cases += 1
     cid = case['CaseId']
     stage = case.get('current_stage')
     if not stage:
@@ -100,6 +102,13 @@ for case in cases:
     status = get_status(stage, waiting_time)
     stage_case_ids[stage].add(cid)
     stage_status_counts[stage][status] += 1
+    if case['activities']:
+        last_act = case['activities'][-1]['ActivityName']
+        last_activity_counter[last_act] += 1
+        if last_act == 'Observation':
+            obs_end_cases.append(case)
+        if last_act == 'Left Without Being Seen':
+            lwbs_cases.append(case)
 
 # Check for overlaps (cases in more than one stage)
 all_case_to_stages = defaultdict(list)
@@ -117,17 +126,6 @@ for stage in all_stages:
     print(f"{stage:<30} {counts['OK']:>4} {counts['Warning']:>5} {counts['Critical']:>5} {total:>6}")
 
 # Print breakdown of last activity for all cases
-last_activity_counter = Counter()
-obs_end_cases = []
-lwbs_cases = []
-for case in cases:
-    if case['activities']:
-        last_act = case['activities'][-1]['ActivityName']
-        last_activity_counter[last_act] += 1
-        if last_act == 'Observation':
-            obs_end_cases.append(case)
-        if last_act == 'Left Without Being Seen':
-            lwbs_cases.append(case)
 print("\nBreakdown by Last Activity (all cases):")
 print(f"{'Last Activity':<30} {'Count':>6}")
 print('-'*38)
@@ -136,7 +134,7 @@ for activity, count in last_activity_counter.most_common():
 
 # Print number and percentage of LWBS cases
 num_lwbs = len(lwbs_cases)
-percent_lwbs = 100.0 * num_lwbs / len(cases) if cases else 0
+percent_lwbs = 100.0 * num_lwbs / num_cases if num_cases else 0
 print(f"\nNumber of cases Left Without Being Seen: {num_lwbs} ({percent_lwbs:.2f}% of all cases)")
 
 # Print debug info for cases ending with 'Observation' but not in Waiting for Observation Completion
@@ -0,0 +1,222 @@
+import argparse
+import heapq
+import json
+import math
+import os
+import random
+import socket
+import sys
+import time
+from datetime import datetime
+from daily_event_log import (
+    CASE_ID_DIGITS, PATIENT_ID_DIGITS, RANDOM_SEED, VARIANT_SPEC_PATH, id_allocator, load_activities,
+)
+from event_log_io import format_epoch_minute, to_epoch_minutes
+from instrumentation import Instrumentation
+from variant_spec import LWBS_ACTIVITY, compile_daily_spec, load_variant_spec
+
+# Live feed for the daily generator. Instead of one frozen snapshot, simulated time advances in
+# ticks, and each tick emits only the events that happened during it as NDJSON: registrations,
+# stage transitions and completions, followed by a tick record with the patients per stage.
+#
+# Patients arrive at random (a Poisson count per tick). Each follows a completed or LWBS path
+# from the daily section of variants.json. The wait before leaving a stage is drawn from that
+# stage's bands (weighted by their snapshot counts), so the ok/warning/critical mix of the live
+# ED follows the snapshot and its stage_thresholds. Other steps take gap_minutes. A journey's
+# times are drawn when the patient arrives; the calendar is a heap, so a tick costs
+# O(events log pending) however long the feed runs.
+
+START_TIME = datetime(2025, 5, 4, 14, 0)  # the snapshot's FreezeTime
+TICK_MINUTES = 1         # simulated minutes per tick
+SPEED = 60               # simulated minutes per wall-clock minute; 0 runs as fast as possible
+ARRIVALS_PER_HOUR = 4.2  # about 100 patients a day, like the historical baseline
+WARMUP_HOURS = 12        # simulated silently before the start, so the feed opens on a busy ED
+# Stages of activities that end no in-progress path of the snapshot (no snapshot patient is
+# waiting right after them), so every patient in the ED is in some stage
+EXTRA_STAGE_AFTER = {
+    "Diagnostic Test Ordered": "Waiting for Diagnostic Test",
+    "Treatment Administered": "Waiting for Discharge",
+}
+
+def poisson(rng, mean):
+    """Poisson-distributed count (Knuth's method; means per tick are small)."""
+    limit, k, p = math.exp(-mean), 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+class LiveFeed:
+    """Simulated ED whose tick() returns the records for the next TICK_MINUTES of simulated time."""
+
+    def __init__(self, spec, start_time=None, tick_minutes=TICK_MINUTES, load=1, seed=RANDOM_SEED, warmup_hours=WARMUP_HOURS, record=False):
+        self.rng = random.Random(seed)
+        self.tick_minutes = tick_minutes
+        self.arrival_mean = ARRIVALS_PER_HOUR * load * tick_minutes / 60
+        self.gap_minutes = spec['gap_minutes']
+        self.case_ids = id_allocator("ED", CASE_ID_DIGITS, 1)
+        self.patient_ids = id_allocator("P", PATIENT_ID_DIGITS, 2)
+        # Stage entered after each activity, and the waiting-time bands for leaving it (activities
+        # of EXTRA_STAGE_AFTER have no bands and take gap_minutes)
+        self.stage_after = {}
+        self.waits_after = {}
+        for stage in spec['in_progress']:
+            waits = ([band['wait'] for band in stage['bands']], [band['count'] for band in stage['bands']])
+            for band in stage['bands']:
+                for path in band['paths']:
+                    self.stage_after.setdefault(path[-1], stage['stage'])
+                    self.waits_after.setdefault(path[-1], waits)
+        for activity, stage in EXTRA_STAGE_AFTER.items():
+            if stage not in spec['stage_thresholds']:
+                raise ValueError(f"EXTRA_STAGE_AFTER: {stage!r} is not in stage_thresholds.")
+            self.stage_after.setdefault(activity, stage)
+        # Journeys: LWBS at the LWBS rate, else a completed variant by its rate or weight share
+        lwbs = spec['lwbs']
+        variants = spec['completed']['variants']
+        rest = 1 - sum(v.get('rate', 0) for v in variants)
+        total_weight = sum(v['weight'] for v in variants if 'rate' not in v)
+        self.lwbs_rate = lwbs['rate']
+        self.lwbs_paths = lwbs['paths']
+        self.variant_paths = [v['path'] for v in variants]
+        self.variant_shares = [v['rate'] if 'rate' in v else rest * v['weight'] / total_weight for v in variants]
+        self.calendar = []  # (minute, sequence, case, step)
+        self.cases = {}         # case -> (case id, patient id, [(activity, minute)]), until it completes
+        self.stage = {}         # case -> stage it is waiting in (None between stages)
+        self.stage_counts = {}  # stage -> patients waiting in it
+        self._sequence = 0
+        # With record=True every planned journey (warm-up included) is also kept, in arrival order
+        self.journeys = [] if record else None
+        start = START_TIME if start_time is None else start_time
+        self.clock = to_epoch_minutes(start) - 60 * warmup_hours
+        while self.clock < to_epoch_minutes(start):
+            self.tick()
+
+    def plan_journey(self, arrival):
+        rng = self.rng
+        if rng.random() < self.lwbs_rate:
+            path = rng.choice(self.lwbs_paths)
+        else:
+            variant = rng.choices(self.variant_paths, weights=self.variant_shares)[0]
+            path = [activity for activity, p in variant if p is None or rng.random() < p]
+        try:
+            case_id, patient_id = next(self.case_ids), next(self.patient_ids)
+        except StopIteration:
+            raise ValueError("Ran out of unique IDs; increase CASE_ID_DIGITS / PATIENT_ID_DIGITS.")
+        steps = [(path[0], arrival)]
+        for previous, activity in zip(path, path[1:]):
+            if previous in self.waits_after:
+                ranges, counts = self.waits_after[previous]
+                gap = rng.randint(*rng.choices(ranges, weights=counts)[0])
+            else:
+                gap = rng.randint(*self.gap_minutes)
+            steps.append((activity, steps[-1][1] + gap))
+        case = self._sequence
+        self.cases[case] = (case_id, patient_id, steps)
+        if self.journeys is not None:
+            self.journeys.append(self.cases[case])
+        for step, (_, minute) in enumerate(steps):
+            heapq.heappush(self.calendar, (minute, self._sequence, case, step))
+            self._sequence += 1
+
+    def move(self, case, stage):
+        # Update the per-stage counts as a case leaves its stage for `stage` (None: leaves the ED)
+        previous = self.stage.pop(case, None)
+        if previous is not None:
+            self.stage_counts[previous] -= 1
+            if not self.stage_counts[previous]:
+                del self.stage_counts[previous]
+        if stage is not None:
+            self.stage_counts[stage] = self.stage_counts.get(stage, 0) + 1
+
+    def tick(self):
+        """Advance one tick; return its event records (in time order) and a closing tick record."""
+        end = self.clock + self.tick_minutes
+        for _ in range(poisson(self.rng, self.arrival_mean)):
+            self.plan_journey(self.rng.randint(self.clock + 1, end))
+        records = []
+        while self.calendar and self.calendar[0][0] <= end:
+            minute, _, case, step = heapq.heappop(self.calendar)
+            case_id, patient_id, steps = self.cases[case]
+            activity = steps[step][0]
+            if step == len(steps) - 1:
+                kind, stage = "completion", LWBS_ACTIVITY if activity == LWBS_ACTIVITY else None
+                self.move(case, None)
+                del self.cases[case]
+            else:
+                kind, stage = "registration" if step == 0 else "transition", self.stage_after.get(activity)
+                self.move(case, stage)
+                self.stage[case] = stage
+            records.append({
+                "type": "event", "kind": kind, "CaseId": case_id, "PatientID": patient_id,
+                "ActivityName": activity, "ActivityTime": format_epoch_minute(minute), "stage": stage,
+            })
+        self.clock = end
+        records.append({
+            "type": "tick", "time": format_epoch_minute(end), "events": len(records),
+            "active": len(self.stage), "stages": dict(self.stage_counts),
+        })
+        return records
+
+def open_sink(target):
+    """Writable text stream for "-" (stdout), "tcp://host:port" or a file path (appended to)."""
+    if target in (None, "-"):
+        return sys.stdout
+    if target.startswith("tcp://"):
+        host, port = target[len("tcp://"):].rsplit(":", 1)
+        return socket.create_connection((host, int(port))).makefile("w", encoding="utf-8")
+    return open(target, "a")
+
+def run(feed, sink, ticks=None, speed=SPEED, inst=None):
+    """Write `ticks` ticks (None: until interrupted) to `sink`, paced at `speed`; returns ticks written."""
+    tick_seconds = feed.tick_minutes * 60 / speed if speed else 0
+    deadline = time.monotonic()
+    written = 0
+    while ticks is None or written < ticks:
+        records = feed.tick()
+        sink.write("".join(json.dumps(record) + "\n" for record in records))
+        sink.flush()
+        written += 1
+        if inst:
+            inst.count("ticks")
+            inst.count("events", len(records) - 1)
+        if tick_seconds:
+            deadline += tick_seconds
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a live-moving ED as NDJSON, one batch of new events per tick.")
+    parser.add_argument("--output", default="-", help='"-" (stdout), "tcp://host:port" or a file to append to')
+    parser.add_argument("--ticks", type=int, help="ticks to emit (default: until interrupted)")
+    parser.add_argument("--tick-minutes", type=int, default=TICK_MINUTES, help="simulated minutes per tick")
+    parser.add_argument("--speed", type=float, default=SPEED, help="simulated minutes per wall-clock minute (0: no pacing)")
+    parser.add_argument("--start", default=START_TIME.strftime("%Y-%m-%d %H:%M"), help='simulated start time, "YYYY-MM-DD HH:MM"')
+    parser.add_argument("--load", type=float, default=1, help="arrival-rate multiplier")
+    parser.add_argument("--seed", type=int, default=RANDOM_SEED)
+    parser.add_argument("--instrumentation", help="quiet, progress or jsonl (reported on stderr / the metrics file)")
+    args = parser.parse_args()
+    if args.tick_minutes < 1 or args.speed < 0:
+        parser.error("--tick-minutes must be at least 1 and --speed not negative")
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    known = {a['name'] for a in load_activities(src_dir)} | {LWBS_ACTIVITY}
+    spec = compile_daily_spec(load_variant_spec(VARIANT_SPEC_PATH), known)
+    feed = LiveFeed(spec, datetime.strptime(args.start, "%Y-%m-%d %H:%M"), args.tick_minutes, args.load, args.seed)
+    sink = open_sink(args.output)
+    with Instrumentation("daily_live_feed", args.instrumentation) as inst:
+        if args.ticks:
+            inst.expect("ticks", args.ticks)
+        try:
+            run(feed, sink, args.ticks, args.speed, inst)
+        except BrokenPipeError:
+            # The consumer went away; point stdout at devnull so the interpreter's final flush is quiet
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if sink is not sys.stdout:
+                sink.close()
+
+if __name__ == "__main__":
+    main()
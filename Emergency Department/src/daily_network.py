@@ -0,0 +1,145 @@
+import argparse
+import csv
+import heapq
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from daily_event_log import (
+    CASE_ID_DIGITS, PATIENT_ID_DIGITS, RANDOM_SEED, SNAPSHOT_TIME, VARIANT_SPEC_PATH, check_id_capacity,
+    generate_snapshot, id_allocator, load_activities, plan_case_counts,
+)
+from event_log_io import CSV_FIELDNAMES, case_csv_rows, format_epoch_minute, json_log_path, open_case_json_writer
+from instrumentation import Instrumentation
+from variant_spec import LWBS_ACTIVITY, compile_daily_spec, load_variant_spec
+
+# Hospital-network mode for the daily generator: one snapshot per ED site, generated in a process
+# pool and written as a single network log with a Site column. Site profiles live in sites.json:
+#
+#   name       the Site value in the outputs
+#   volume     multiplies every case count of the site (like daily_event_log.main's load)
+#   stage_mix  optional {stage: factor} on top of the volume for single in-progress stages
+#   beds       in-progress patients past "Bed Assigned" are scaled down (proportionally over those
+#              stages, rounded per band) when the site's mix would put more of them in the ED
+#
+# Every site reseeds the `random` module with its own stream derived from RANDOM_SEED and its
+# position in the list, and takes its case and patient IDs from its own block of the shared ID
+# permutations, so the output is the same for any number of workers and IDs never collide
+# across sites.
+
+SITES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sites.json")
+NETWORK_WORKERS = 0  # processes generating sites (0 = one per CPU core, 1 = in this process)
+NETWORK_LOG_NAME = "network_daily"
+BED_ACTIVITY = "Bed Assigned"
+
+def load_site_profiles(path=None):
+    with open(path or SITES_PATH, "r") as f:
+        sites = json.load(f)["sites"]
+    names = [site["name"] for site in sites]
+    if len(set(names)) != len(names):
+        raise ValueError("sites.json: site names must be unique.")
+    for site in sites:
+        if site.get("volume", 1) <= 0 or site.get("beds", 1) < 1:
+            raise ValueError(f"site {site['name']!r}: volume must be positive and beds at least 1.")
+    return sites
+
+def site_stage_loads(spec, site):
+    """Per-stage case-count multipliers for a site profile: volume, stage mix, then the bed cap."""
+    volume = site.get("volume", 1)
+    mix = site.get("stage_mix", {})
+    stages = {stage["stage"]: stage for stage in spec["in_progress"]}
+    unknown = set(mix) - set(stages)
+    if unknown:
+        raise ValueError(f"site {site['name']!r}: stage_mix names unknown stages {sorted(unknown)}.")
+    loads = {name: volume * mix.get(name, 1) for name in stages}
+    bed_stages = [name for name, stage in stages.items() if any(BED_ACTIVITY in path for band in stage["bands"] for path in band["paths"])]
+    in_beds = sum(band["count"] * loads[name] for name in bed_stages for band in stages[name]["bands"])
+    if "beds" in site and in_beds > site["beds"]:
+        for name in bed_stages:
+            loads[name] *= site["beds"] / in_beds
+    return loads
+
+def site_case_count(spec, site):
+    return sum(plan_case_counts(spec, site.get("volume", 1), site_stage_loads(spec, site)))
+
+def generate_site(task):
+    """One site's snapshot cases, each tagged with its Site (runs in worker processes)."""
+    site_index, site, spec, snapshot_time, id_base = task
+    random.seed(f"{RANDOM_SEED}/{site_index}")
+    case_ids = id_allocator("ED", CASE_ID_DIGITS, 1)
+    patient_ids = id_allocator("P", PATIENT_ID_DIGITS, 2)
+    case_ids.position = patient_ids.position = id_base
+    completed_cases, current_cases = generate_snapshot(
+        spec, snapshot_time, case_ids, patient_ids, site.get("volume", 1), site_stage_loads(spec, site),
+    )
+    return [{"Site": site["name"], **case} for case in completed_cases + current_cases]
+
+def iter_site_cases(tasks, workers):
+    """Yield each site's cases in site order, generating the sites in a process pool."""
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        yield from map(generate_site, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        yield from executor.map(generate_site, tasks)
+
+def site_csv_rows(case):
+    for row in case_csv_rows(case):
+        yield [case["Site"]] + row
+
+def save_network_csv(all_cases, path):
+    """CSV rows of every site, in (ActivityTime, CaseId) order, with the Site in the first column."""
+    n_events = 0
+    with open(path, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Site"] + CSV_FIELDNAMES)
+        for row in heapq.merge(*(site_csv_rows(case) for case in all_cases), key=itemgetter(3, 1)):
+            row[3] = format_epoch_minute(row[3])
+            writer.writerow(row)
+            n_events += 1
+    return n_events
+
+def main(output_dir=None, sites_path=None, workers=None, instrumentation=None):
+    """Write the network snapshot (CSV and JSON) for every site in sites.json; returns {"sites", "cases", "events"}."""
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    output_dir = os.path.join(src_dir, "Output") if output_dir is None else output_dir
+    workers = NETWORK_WORKERS if workers is None else workers
+    known = {a["name"] for a in load_activities(src_dir)} | {LWBS_ACTIVITY}
+    spec = compile_daily_spec(load_variant_spec(VARIANT_SPEC_PATH), known)
+    sites = load_site_profiles(sites_path)
+    # Each site's ID block starts where the previous site's ends
+    counts = [site_case_count(spec, site) for site in sites]
+    check_id_capacity(id_allocator("ED", CASE_ID_DIGITS, 1), id_allocator("P", PATIENT_ID_DIGITS, 2), sum(counts))
+    tasks = [(i, site, spec, SNAPSHOT_TIME, sum(counts[:i])) for i, site in enumerate(sites)]
+    os.makedirs(output_dir, exist_ok=True)
+    json_path = json_log_path(os.path.join(output_dir, NETWORK_LOG_NAME), "json")
+    csv_path = os.path.join(output_dir, f"{NETWORK_LOG_NAME}.csv")
+    metadata = {"FreezeTime": SNAPSHOT_TIME.strftime("%Y-%m-%dT%H:%M:%S+00:00"), "Sites": [site["name"] for site in sites]}
+    with Instrumentation("daily_network", instrumentation) as inst:
+        inst.expect("sites", len(sites))
+        inst.expect("cases", sum(counts))
+        all_cases = []
+        with inst.phase("generate"):
+            for cases in iter_site_cases(tasks, workers):
+                all_cases.extend(cases)
+                inst.count("sites")
+                inst.count("cases", len(cases))
+        inst.watch(json_path, 0)
+        inst.watch(csv_path, 0)
+        with inst.phase("json_write"), open_case_json_writer(json_path, metadata) as writer:
+            writer.write_cases(all_cases)
+        with inst.phase("csv_write"):
+            inst.count("events", save_network_csv(all_cases, csv_path))
+        inst.message(f"Saved {len(all_cases)} cases of {len(sites)} sites to {json_path} and {csv_path}")
+        return {name: inst.counters.get(name, 0) for name in ("sites", "cases", "events")}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the daily snapshot of every ED site in a hospital network.")
+    parser.add_argument("--sites", help="site profiles (default: src/sites.json)")
+    parser.add_argument("--workers", type=int, default=NETWORK_WORKERS, help="processes (0: one per CPU core)")
+    parser.add_argument("--output", help="directory (default: Output)")
+    parser.add_argument("--instrumentation", help="quiet, progress or jsonl")
+    args = parser.parse_args()
+    main(args.output, args.sites, args.workers, args.instrumentation)
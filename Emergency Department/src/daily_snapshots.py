@@ -0,0 +1,113 @@
+import argparse
+import os
+from datetime import datetime, timedelta
+from daily_event_log import JSON_FORMAT, RANDOM_SEED, VARIANT_SPEC_PATH, load_activities
+from daily_live_feed import LiveFeed
+from event_log_io import json_log_path, open_case_json_writer, to_epoch_minutes
+from instrumentation import Instrumentation
+from variant_spec import LWBS_ACTIVITY, compile_daily_spec, load_variant_spec
+
+# Many snapshots of one day, for time-travel dashboards. The whole day is simulated once (the
+# live feed's engine, LiveFeed, with its journeys recorded); every freeze point is then derived
+# from it in a single sweep over the day's events in time order. A snapshot holds each case up to
+# the freeze point, so all snapshots are consistent prefixes of the same underlying day: a case
+# keeps its IDs and past activity times from one snapshot to the next and only grows.
+#
+# Cases still in progress at a freeze point get current_stage and waiting_time like the single
+# snapshot of daily_event_log.py (the stage comes from the feed's stage_after, which covers every
+# activity a patient can wait after); cases that already left are closed. Cases left over from the
+# previous evening are included when they are still in the ED after midnight.
+
+SNAPSHOT_DAY = datetime(2025, 5, 4)
+FREEZE_START = "00:00"
+FREEZE_END = "23:45"
+FREEZE_EVERY_MINUTES = 15
+SNAPSHOT_DIR_NAME = "daily_snapshots"
+
+def freeze_points(day, start=FREEZE_START, end=FREEZE_END, every=FREEZE_EVERY_MINUTES):
+    """Datetimes from start to end (inclusive, "HH:MM" on `day`) every `every` minutes."""
+    first = datetime.combine(day.date(), datetime.strptime(start, "%H:%M").time())
+    last = datetime.combine(day.date(), datetime.strptime(end, "%H:%M").time())
+    if every < 1 or last < first:
+        raise ValueError("Freeze points need every >= 1 minute and an end not before the start.")
+    return [first + timedelta(minutes=every * i) for i in range(int((last - first) / timedelta(minutes=every)) + 1)]
+
+def simulate_day(spec, day, until, load=1, seed=RANDOM_SEED):
+    """A LiveFeed run from midnight (after its warm-up) to `until`; feed.journeys holds every
+    patient's (case id, patient id, [(activity, minute)])."""
+    feed = LiveFeed(spec, day, tick_minutes=60, load=load, seed=seed, record=True)
+    while feed.clock < to_epoch_minutes(until):
+        feed.tick()
+    return feed
+
+def iter_snapshots(journeys, freezes, stage_after, day_start):
+    """Yield (freeze time, case dicts) per freeze point, advancing through the events once."""
+    # Journeys over before the day starts are not part of it
+    journeys = [j for j in journeys if j[2][-1][1] >= day_start]
+    events = sorted((minute, case, step) for case, (_, _, steps) in enumerate(journeys) for step, (_, minute) in enumerate(steps))
+    seen = [0] * len(journeys)  # activities of each case up to the current freeze point
+    registered = []             # cases in registration order
+    i = 0
+    for freeze in freezes:
+        freeze_minute = to_epoch_minutes(freeze)
+        while i < len(events) and events[i][0] <= freeze_minute:
+            _, case, step = events[i]
+            if step == 0:
+                registered.append(case)
+            seen[case] = step + 1
+            i += 1
+        cases = []
+        for case in registered:
+            case_id, patient_id, steps = journeys[case]
+            n = seen[case]
+            snapshot_case = {
+                "CaseId": case_id,
+                "PatientID": patient_id,
+                "activities": [{"ActivityName": activity, "ActivityTime": minute} for activity, minute in steps[:n]],
+            }
+            last_activity, last_minute = steps[n - 1]
+            if n < len(steps):
+                snapshot_case["current_stage"] = stage_after[last_activity]
+                snapshot_case["waiting_time"] = freeze_minute - last_minute
+            elif last_activity == LWBS_ACTIVITY:
+                snapshot_case["current_stage"] = LWBS_ACTIVITY
+                snapshot_case["waiting_time"] = float(last_minute - steps[0][1])
+            cases.append(snapshot_case)
+        yield freeze, cases
+
+def main(output_dir=None, day=None, start=FREEZE_START, end=FREEZE_END, every=FREEZE_EVERY_MINUTES, load=1, instrumentation=None):
+    """Write one daily event log per freeze point of `day`; returns {"snapshots", "cases", "events"}."""
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    output_dir = os.path.join(src_dir, 'Output', SNAPSHOT_DIR_NAME) if output_dir is None else output_dir
+    day = SNAPSHOT_DAY if day is None else day
+    known = {a['name'] for a in load_activities(src_dir)} | {LWBS_ACTIVITY}
+    spec = compile_daily_spec(load_variant_spec(VARIANT_SPEC_PATH), known)
+    freezes = freeze_points(day, start, end, every)
+    os.makedirs(output_dir, exist_ok=True)
+    with Instrumentation("daily_snapshots", instrumentation) as inst:
+        inst.expect("snapshots", len(freezes))
+        inst.watch(output_dir)
+        with inst.phase("simulate"):
+            feed = simulate_day(spec, day, freezes[-1], load)
+        with inst.phase("write"):
+            for freeze, cases in iter_snapshots(feed.journeys, freezes, feed.stage_after, to_epoch_minutes(day)):
+                metadata = {"FreezeTime": freeze.strftime("%Y-%m-%dT%H:%M:%S+00:00")}
+                path = json_log_path(os.path.join(output_dir, f"alderaan_daily_{freeze:%Y-%m-%d_%H%M}"), JSON_FORMAT)
+                with open_case_json_writer(path, metadata) as writer:
+                    writer.write_cases(cases)
+                inst.count("snapshots")
+                inst.count("cases", len(cases))
+                inst.count("events", sum(len(case["activities"]) for case in cases))
+        inst.message(f"Saved {len(freezes)} snapshots of {day:%Y-%m-%d} to {output_dir}")
+        return {name: inst.counters.get(name, 0) for name in ("snapshots", "cases", "events")}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write consistent snapshots of one simulated day, one file per freeze point.")
+    parser.add_argument("--day", default=SNAPSHOT_DAY.strftime("%Y-%m-%d"), help="YYYY-MM-DD")
+    parser.add_argument("--start", default=FREEZE_START, help="first freeze point, HH:MM")
+    parser.add_argument("--end", default=FREEZE_END, help="last freeze point, HH:MM")
+    parser.add_argument("--every", type=int, default=FREEZE_EVERY_MINUTES, help="minutes between freeze points")
+    parser.add_argument("--load", type=float, default=1, help="arrival-rate multiplier")
+    parser.add_argument("--output", help=f"directory (default: Output/{SNAPSHOT_DIR_NAME})")
+    args = parser.parse_args()
+    main(args.output, datetime.strptime(args.day, "%Y-%m-%d"), args.start, args.end, args.every, args.load)
@@ -0,0 +1,139 @@
+import heapq
+import numpy as np
+
+# Discrete-event simulation of patient flow through the ED. Patients walk their activity paths
+# and contend for beds and for staff; staff availability follows a shift_roster.ShiftRoster. The
+# event calendar is a binary heap, so a run costs O(E log E) for E activities: simulated time
+# jumps from one event to the next instead of ticking through every minute.
+#
+# Activities come in two kinds. Service activities hold one staff member of their role from
+# start to finish; patients queue for them by priority (lower first), then by time queued. Only
+# staff on duty start new work; someone whose shift ends mid-activity finishes it first. Delay
+# activities (lab turnaround, observation, transfer) take time but hold nobody; they are
+# attributed to a staff member of their role on duty at the time. The bed is taken before the bed
+# activity and held until the patient's last activity completes. Event times are completion times.
+
+_DONE = 0   # a patient finished its current activity (processed first at equal times)
+_SHIFT = 1  # the on-duty set of a role changes: queued patients may now be served
+_READY = 2  # a patient arrives and requests its first activity
+
+class RosterExhausted(ValueError):
+    """The simulated queue outlasted the roster: run again with a roster covering more days."""
+
+def simulate_day(arrivals, priorities, paths, service, roster, beds, bed_activity, rng):
+    """Simulate one day and return (event_case, event_activity, event_minute, event_resource) arrays.
+
+    arrivals: arrival minute per patient (the roster's time scale); priorities: queue priority per
+    patient (lower first); paths: activity codes per patient; service: per activity code, (role,
+    min minutes, max minutes, holds_staff); roster: a ShiftRoster covering the simulated period;
+    beds: number of beds; bed_activity: the activity code that needs a bed. Events are ordered by
+    patient, then path. Raises RosterExhausted when patients are still waiting past the roster.
+    """
+    n = len(paths)
+    lengths = np.fromiter((len(p) for p in paths), dtype=np.int64, count=n)
+    base = (np.cumsum(lengths) - lengths).tolist()
+    activity = np.fromiter((a for p in paths for a in p), dtype=np.int64, count=int(lengths.sum()))
+    # Durations and the draws that pick delay-activity staff are made up front, vectorized
+    roles = sorted({s[0] for s in service})
+    role_of = np.array([roles.index(s[0]) for s in service])
+    low = np.array([s[1] for s in service])
+    high = np.array([s[2] for s in service])
+    holds = [s[3] for s in service]
+    duration = (low[activity] + rng.random(len(activity)) * (high - low + 1)[activity]).astype(np.int64).tolist()
+    pick = rng.random(len(activity)).tolist()
+    role = role_of[activity].tolist()
+    activity = activity.tolist()
+    lengths = lengths.tolist()
+
+    minute = [0] * len(activity)
+    resource = [0] * len(activity)
+    position = [0] * n
+    serving = [0] * n
+    has_bed = [False] * n
+    busy = [set() for _ in roles]
+    staff_queue = [[] for _ in roles]
+    bed_queue = []
+    free_beds = beds
+    calendar = [(int(t), _READY, c) for c, t in enumerate(arrivals)]
+    if n:
+        first = min(calendar)[0]
+        calendar += [(t, _SHIFT, r) for r, name in enumerate(roles) for t in roster.changes(name, first)]
+    heapq.heapify(calendar)
+
+    def free_member(r, now):
+        # The first on-duty member of the role who is not busy, or None
+        for member in roster.on_duty(roles[r], now):
+            if member not in busy[r]:
+                return member
+        return None
+
+    def begin(c, member, now):
+        serving[c] = member
+        heapq.heappush(calendar, (now + duration[base[c] + position[c]], _DONE, c))
+
+    def serve_queue(r, now):
+        queue = staff_queue[r]
+        while queue:
+            member = free_member(r, now)
+            if member is None:
+                break
+            busy[r].add(member)
+            begin(heapq.heappop(queue)[2], member, now)
+
+    def request(c, now):
+        # Start the patient's current activity, or queue it for a bed or a staff member
+        nonlocal free_beds
+        i = base[c] + position[c]
+        if activity[i] == bed_activity and not has_bed[c]:
+            if not free_beds:
+                heapq.heappush(bed_queue, (priorities[c], now, c))
+                return
+            free_beds -= 1
+            has_bed[c] = True
+        r = role[i]
+        if not holds[activity[i]]:
+            on_duty = roster.on_duty(roles[r], now)
+            if not on_duty:
+                raise RosterExhausted(f"No {roles[r]} on duty at minute {now}; the roster must cover the simulated period.")
+            begin(c, on_duty[int(pick[i] * len(on_duty))], now)
+            return
+        member = free_member(r, now)
+        if member is None:
+            heapq.heappush(staff_queue[r], (priorities[c], now, c))
+        else:
+            busy[r].add(member)
+            begin(c, member, now)
+
+    while calendar:
+        now, kind, c = heapq.heappop(calendar)
+        if kind == _READY:
+            request(c, now)
+            continue
+        if kind == _SHIFT:
+            serve_queue(c, now)
+            continue
+        i = base[c] + position[c]
+        minute[i] = now
+        resource[i] = serving[c]
+        if holds[activity[i]]:
+            busy[role[i]].discard(serving[c])
+            serve_queue(role[i], now)
+        position[c] += 1
+        if position[c] < lengths[c]:
+            request(c, now)
+        elif has_bed[c]:
+            has_bed[c] = False
+            if bed_queue:
+                waiting = heapq.heappop(bed_queue)[2]
+                has_bed[waiting] = True
+                request(waiting, now)
+            else:
+                free_beds += 1
+
+    if any(p < length for p, length in zip(position, lengths)):
+        raise RosterExhausted("Some patients never got their staff; the roster must cover the simulated period.")
+    event_case = np.repeat(np.arange(n, dtype=np.int32), lengths)
+    return (
+        event_case, np.array(activity, dtype=np.int8), np.array(minute, dtype=np.int32),
+        np.array(resource, dtype=np.int16),
+    )
@@ -0,0 +1,769 @@
+import csv
+import gzip
+import heapq
+import io
+import json
+import os
+import shutil
+import tempfile
+from operator import itemgetter
+from datetime import datetime, timedelta
+import numpy as np
+
+# Shared event log writers used by the generators. Writers are incremental: cases are
+# written as they are produced, so memory does not grow with the size of the log.
+
+# --- TIMESTAMPS ---
+# Generators keep activity times as integer minutes since the Unix epoch and only format them
+# when writing. Formatting reuses a cached 'YYYY-MM-DD ' prefix per day and a table of the
+# 1440 'HH:MM:00' labels, so no strftime call is made per activity. Parsing them back is the
+# mirror image: the date part is parsed once per distinct day, the time of day by slicing.
+
+_EPOCH = datetime(1970, 1, 1)
+MINUTE_OF_DAY_LABELS = [f"{m // 60:02d}:{m % 60:02d}:00" for m in range(24 * 60)]
+_day_prefixes = {}
+_day_seconds = {}
+
+def to_epoch_minutes(dt):
+    return (dt - _EPOCH) // timedelta(minutes=1)
+
+def from_epoch_minutes(minute):
+    return _EPOCH + timedelta(minutes=int(minute))
+
+def _day_prefix(day_number):
+    prefix = _day_prefixes.get(day_number)
+    if prefix is None:
+        prefix = _day_prefixes[day_number] = (_EPOCH + timedelta(days=day_number)).strftime("%Y-%m-%d ")
+    return prefix
+
+def format_epoch_minute(minute):
+    """'YYYY-MM-DD HH:MM:SS' for one epoch minute."""
+    day_number, minute_of_day = divmod(int(minute), 1440)
+    return _day_prefix(day_number) + MINUTE_OF_DAY_LABELS[minute_of_day]
+
+def format_epoch_minutes(minutes):
+    """'YYYY-MM-DD HH:MM:SS' for a list or array of epoch minutes, in one vectorized pass."""
+    days, minute_of_day = np.divmod(np.asarray(minutes, dtype=np.int64), 1440)
+    labels = MINUTE_OF_DAY_LABELS
+    return [_day_prefix(d) + labels[m] for d, m in zip(days.tolist(), minute_of_day.tolist())]
+
+def parse_epoch_seconds(text):
+    """Seconds since the Unix epoch for a 'YYYY-MM-DD HH:MM:SS' time (or epoch minutes)."""
+    if not isinstance(text, str):
+        return int(text) * 60
+    day = text[:10]
+    seconds = _day_seconds.get(day)
+    if seconds is None:
+        seconds = _day_seconds[day] = int((datetime.strptime(day, "%Y-%m-%d") - _EPOCH).total_seconds())
+    return seconds + int(text[11:13]) * 3600 + int(text[14:16]) * 60 + int(text[17:19])
+
+def format_case_times(cases):
+    """Copies of case dicts with integer ActivityTimes formatted; already formatted cases pass through."""
+    formatted = []
+    for case in cases:
+        activities = case["activities"]
+        if activities and not isinstance(activities[0]["ActivityTime"], str):
+            times = format_epoch_minutes([a["ActivityTime"] for a in activities])
+            activities = [{**a, "ActivityTime": t} for a, t in zip(activities, times)]
+            case = {**case, "activities": activities}
+        formatted.append(case)
+    return formatted
+
+# --- WRITERS ---
+
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+def compressed_path(path, compression):
+    """Append the extension for `compression` (None, "gzip" or "zstd") to an output path."""
+    if compression is None:
+        return path
+    if compression not in COMPRESSION_EXTENSIONS:
+        raise ValueError(f"Unknown compression: {compression!r} (expected None, 'gzip' or 'zstd')")
+    return path + COMPRESSION_EXTENSIONS[compression]
+
+def _open_zstd(path, mode, level=None, newline=None):
+    try:
+        from compression import zstd  # Python 3.14+
+        return zstd.open(path, mode, level=level, newline=newline)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd compression needs Python 3.14+ or the 'zstandard' package (pip install zstandard)")
+    cctx = zstandard.ZstdCompressor(level=3 if level is None else level) if "w" in mode or "a" in mode else None
+    return zstandard.open(path, mode, cctx=cctx, newline=newline)
+
+def open_text_output(path, level=None, newline=None, resume_offset=None):
+    """Open a text file for writing, compressing on the fly when the path ends in .gz or .zst.
+
+    With resume_offset the file is cut back to that many bytes (dropping anything written after a
+    checkpoint) and appended to. A compressed file then gets a new gzip member or zstd frame,
+    which readers decompress as one continuous stream.
+    """
+    mode = "w"
+    if resume_offset is not None:
+        with open(path, "r+b") as f:
+            f.truncate(resume_offset)
+        mode = "a"
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", compresslevel=6 if level is None else level, newline=newline)
+    if path.endswith(".zst"):
+        return _open_zstd(path, mode + "t", level, newline)
+    return open(path, mode, newline=newline)
+
+def is_compressed_path(path):
+    return _strip_compression(path) != path
+
+def _resume_point(file, path, count):
+    # Byte offset to resume appending from; a compressed stream is only resumable once closed
+    if is_compressed_path(path):
+        raise ValueError(f"{path} is compressed; it can only be checkpointed after it is closed.")
+    file.flush()
+    return {"offset": file.tell(), "count": count}
+
+def _abort_output(file, path, keep):
+    # Close a failed run's output without finishing it; it is removed unless a resume point refers to it
+    if file.closed:
+        return
+    file.close()
+    if not keep:
+        os.remove(path)
+
+def open_text_input(path, newline=None):
+    """Open a possibly compressed (.gz/.zst) text file for reading."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline=newline)
+    if path.endswith(".zst"):
+        return _open_zstd(path, "rt", newline=newline)
+    return open(path, "r", newline=newline)
+
+def open_binary_input(path):
+    """Open a possibly compressed (.gz/.zst) file for reading bytes."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        return _open_zstd(path, "rb")
+    return open(path, "rb")
+
+CSV_FIELDNAMES = [
+    "CaseId", "ActivityName", "ActivityTime", "PatientID", "Resource",
+    "Age", "Sex", "ModeOfArrival", "VisitType", "HR", "BP", "Temp", "O2Sat", "Triage", "ArrivalShift"
+]
+
+def case_csv_rows(case):
+    """Yield one CSV row (in CSV_FIELDNAMES order) per activity of a case dict."""
+    vitals = case.get("VitalSigns", {})
+    case_values = [
+        case.get("Age", ""), case.get("Sex", ""), case.get("ModeOfArrival", ""), case.get("VisitType", ""),
+        vitals.get("HR", ""), vitals.get("BP", ""), vitals.get("Temp", ""), vitals.get("O2Sat", ""),
+        case.get("Triage", ""), case.get("ArrivalShift", ""),
+    ]
+    for activity in case["activities"]:
+        yield [
+            case["CaseId"], activity["ActivityName"], activity["ActivityTime"], case["PatientID"],
+            activity.get("Resource", ""),
+        ] + case_values
+
+# Time-sorted CSV: rows ordered by (ActivityTime, CaseId). ActivityTime may be epoch minutes or
+# the formatted 'YYYY-MM-DD HH:MM:SS' text, which sorts the same way.
+CSV_SORT_KEY = itemgetter(2, 0)
+CSV_SORT_CHUNK_ROWS = 250_000  # rows SortedCsvWriter holds in memory before spilling a sorted run
+
+def merge_case_rows(cases):
+    """CSV rows of all cases in CSV_SORT_KEY order, as a streaming k-way merge of the per-case rows.
+
+    Each case's activities must already be in time order; no list of all rows is built or sorted.
+    """
+    return heapq.merge(*(case_csv_rows(case) for case in cases), key=CSV_SORT_KEY)
+
+def csv_text(rows):
+    """Serialize CSV rows to text exactly as CaseCsvWriter would write them."""
+    buffer = io.StringIO(newline="")
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+def serialize_cases_json(cases, indent=2):
+    """Serialize cases to the per-case text CaseJsonWriter.write_serialized expects."""
+    if indent is None:
+        return [json.dumps(case, separators=(",", ":")) for case in cases]
+    prefix = " " * (2 * indent)
+    return [_indent(json.dumps(case, indent=indent), prefix) for case in cases]
+
+class CaseCsvWriter:
+    """Incremental event log CSV writer: one row per activity, header written on open."""
+
+    def __init__(self, path, compression_level=None, resume=None):
+        self.path = path
+        self.rows_written = 0 if resume is None else resume["count"]
+        self._final = None
+        self._checkpointed = resume is not None
+        self._file = open_text_output(path, compression_level, newline="", resume_offset=resume and resume["offset"])
+        self._writer = csv.writer(self._file)
+        if resume is None:
+            self._writer.writerow(CSV_FIELDNAMES)
+
+    def write_rows(self, rows):
+        for row in rows:
+            self._writer.writerow(row)
+            self.rows_written += 1
+
+    def write_cases(self, cases):
+        for case in format_case_times(cases):
+            self.write_rows(case_csv_rows(case))
+
+    def write_text(self, text, n_rows):
+        """Append rows already serialized with csv_text (e.g. by a worker process)."""
+        self._file.write(text)
+        self.rows_written += n_rows
+
+    def resume_point(self):
+        """{"offset", "count"} to pass back as `resume` to append to this file later."""
+        if self._final:
+            return self._final
+        point = _resume_point(self._file, self.path, self.rows_written)
+        self._checkpointed = True
+        return point
+
+    def close(self):
+        self._file.close()
+        self._final = {"offset": os.path.getsize(self.path), "count": self.rows_written}
+
+    def abort(self):
+        """Stop writing after a failure: the CSV is removed unless a resume point refers to it."""
+        if self._final is None:
+            _abort_output(self._file, self.path, self._checkpointed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A failed run must not leave a log that looks complete
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class SortedCsvWriter(CaseCsvWriter):
+    """CaseCsvWriter whose rows come out in CSV_SORT_KEY order, whatever order they are written in.
+
+    External merge sort: rows are buffered up to `chunk_rows`, each full buffer is sorted and
+    spilled to a temporary run file next to the output, and close() k-way merges the runs into
+    the output. Memory stays bounded by one buffer plus one row per run. Both sorts are stable,
+    so rows with equal keys keep their write order. Cannot resume (rows written later may sort
+    before rows already in the file).
+    """
+
+    def __init__(self, path, compression_level=None, chunk_rows=CSV_SORT_CHUNK_ROWS):
+        super().__init__(path, compression_level)
+        self.chunk_rows = chunk_rows
+        self._buffer = []
+        self._runs = []
+        self._run_dir = None
+
+    def write_rows(self, rows):
+        for row in rows:
+            self._buffer.append(row)
+            self.rows_written += 1
+            if len(self._buffer) >= self.chunk_rows:
+                self._spill()
+
+    def write_text(self, text, n_rows):
+        rows_before = self.rows_written
+        self.write_rows(csv.reader(io.StringIO(text, newline="")))
+        if self.rows_written - rows_before != n_rows:
+            raise ValueError(f"{self.path}: text holds {self.rows_written - rows_before} CSV rows, expected {n_rows}.")
+
+    def _spill(self):
+        if self._run_dir is None:
+            self._run_dir = tempfile.mkdtemp(prefix=".csv_sort_", dir=os.path.dirname(os.path.abspath(self.path)))
+        run_path = os.path.join(self._run_dir, f"run_{len(self._runs):05d}.csv")
+        with open(run_path, "w", newline="") as f:
+            csv.writer(f).writerows(sorted(self._buffer, key=CSV_SORT_KEY))
+        self._runs.append(run_path)
+        self._buffer = []
+
+    def resume_point(self):
+        if self._final is None:
+            raise ValueError(f"{self.path} is written sorted; it can only be checkpointed after it is closed.")
+        return self._final
+
+    def close(self):
+        if self._final is not None:
+            return
+        try:
+            n_merged = 0
+            if self._runs:
+                if self._buffer:
+                    self._spill()
+                run_files = [open(run_path, "r", newline="") for run_path in self._runs]
+                try:
+                    for row in heapq.merge(*(csv.reader(f) for f in run_files), key=CSV_SORT_KEY):
+                        self._writer.writerow(row)
+                        n_merged += 1
+                finally:
+                    for f in run_files:
+                        f.close()
+            else:
+                self._writer.writerows(sorted(self._buffer, key=CSV_SORT_KEY))
+                n_merged = len(self._buffer)
+            self._buffer = []
+            # The rows in the file are the rows counted (resume points and reported totals use the count)
+            if n_merged != self.rows_written:
+                raise RuntimeError(f"{self.path}: wrote {n_merged} sorted rows but counted {self.rows_written}.")
+        finally:
+            if self._run_dir is not None:
+                shutil.rmtree(self._run_dir, ignore_errors=True)
+                self._run_dir = None
+            super().close()
+
+    def abort(self):
+        """Drop the sorted runs and the unfinished CSV."""
+        if self._run_dir is not None:
+            shutil.rmtree(self._run_dir, ignore_errors=True)
+            self._run_dir = None
+        self._buffer = []
+        super().abort()
+
+class CaseJsonWriter:
+    """Incremental writer for the {"cases": [...]} JSON layout.
+
+    With indent=2 the output is byte-identical to json.dump({**metadata, "cases": cases}, f, indent=2);
+    indent=None writes compact JSON. Cases are serialized one at a time as they are written.
+    """
+
+    def __init__(self, path, metadata=None, indent=2, compression_level=None, resume=None):
+        self.path = path
+        self.indent = indent
+        self.cases_written = 0
+        self._final = None
+        self._checkpointed = resume is not None
+        if resume is not None:
+            # The offset is where the closing brackets start; they are written again on close
+            if is_compressed_path(path):
+                raise ValueError("A compressed JSON document cannot be appended to; use NDJSON instead.")
+            self.cases_written = resume["count"]
+            self._file = open_text_output(path, compression_level, resume_offset=resume["offset"])
+            return
+        self._file = open_text_output(path, compression_level)
+        if indent is None:
+            self._file.write("{")
+            for key, value in (metadata or {}).items():
+                self._file.write(f"{json.dumps(key)}:{json.dumps(value, separators=(',', ':'))},")
+            self._file.write('"cases":[')
+        else:
+            pad = " " * indent
+            self._file.write("{\n")
+            for key, value in (metadata or {}).items():
+                self._file.write(f"{pad}{json.dumps(key)}: {_indent(json.dumps(value, indent=indent), pad, first=False)},\n")
+            self._file.write(f'{pad}"cases": [')
+
+    def write_cases(self, cases):
+        self.write_serialized(serialize_cases_json(format_case_times(cases), self.indent))
+
+    def write_serialized(self, case_texts):
+        """Append cases already serialized with serialize_cases_json (e.g. by a worker process)."""
+        separator = "," if self.indent is None else ",\n"
+        first = "" if self.indent is None else "\n"
+        for text in case_texts:
+            self._file.write(separator if self.cases_written else first)
+            self._file.write(text)
+            self.cases_written += 1
+
+    def resume_point(self):
+        """{"offset", "count"} to pass back as `resume` to append more cases later (uncompressed only)."""
+        if self._final:
+            return self._final
+        point = _resume_point(self._file, self.path, self.cases_written)
+        self._checkpointed = True
+        return point
+
+    def close(self):
+        if not is_compressed_path(self.path):
+            self._final = _resume_point(self._file, self.path, self.cases_written)
+        if self.indent is None:
+            self._file.write("]}")
+        else:
+            self._file.write(f"\n{' ' * self.indent}]\n}}" if self.cases_written else "]\n}")
+        self._file.close()
+
+    def abort(self):
+        """Stop writing after a failure without the closing brackets, so the document does not
+        parse; it is removed unless a resume point refers to it."""
+        _abort_output(self._file, self.path, self._checkpointed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A failed run must not leave a log that looks complete
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def _indent(text, prefix, first=True):
+    lines = text.split("\n")
+    head = prefix + lines[0] if first else lines[0]
+    return "\n".join([head] + [prefix + line for line in lines[1:]])
+
+# --- NDJSON ---
+# Newline-delimited JSON: one compact case object per line, preceded by an optional header line
+# holding the metadata (e.g. FreezeTime). The header is the only line without an "activities"
+# key, so files can be split, concatenated or tailed and still be read case by case.
+
+JSON_FORMATS = {"json": ".json", "ndjson": ".ndjson"}
+
+def json_log_path(base_path, json_format="json", compression=None):
+    """Output path for a JSON event log: base path + .json/.ndjson + optional compression extension."""
+    if json_format not in JSON_FORMATS:
+        raise ValueError(f"Unknown JSON format: {json_format!r} (expected 'json' or 'ndjson')")
+    return compressed_path(base_path + JSON_FORMATS[json_format], compression)
+
+class CaseNdjsonWriter:
+    """Incremental NDJSON event log writer; same interface as CaseJsonWriter."""
+
+    indent = None  # cases are always serialized compactly, one per line
+
+    def __init__(self, path, metadata=None, compression_level=None, resume=None):
+        self.path = path
+        self.cases_written = 0 if resume is None else resume["count"]
+        self._final = None
+        self._checkpointed = resume is not None
+        self._file = open_text_output(path, compression_level, resume_offset=resume and resume["offset"])
+        if metadata and resume is None:
+            self._file.write(json.dumps(metadata, separators=(",", ":")) + "\n")
+
+    def write_cases(self, cases):
+        self.write_serialized(serialize_cases_json(format_case_times(cases), None))
+
+    def write_serialized(self, case_texts):
+        """Append cases already serialized with serialize_cases_json(..., indent=None)."""
+        for text in case_texts:
+            self._file.write(text)
+            self._file.write("\n")
+            self.cases_written += 1
+
+    def resume_point(self):
+        """{"offset", "count"} to pass back as `resume` to append more cases later."""
+        if self._final:
+            return self._final
+        point = _resume_point(self._file, self.path, self.cases_written)
+        self._checkpointed = True
+        return point
+
+    def close(self):
+        self._file.close()
+        self._final = {"offset": os.path.getsize(self.path), "count": self.cases_written}
+
+    def abort(self):
+        """Stop writing after a failure: the log is removed unless a resume point refers to it."""
+        if self._final is None:
+            _abort_output(self._file, self.path, self._checkpointed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A failed run must not leave a log that looks complete
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def open_case_json_writer(path, metadata=None, indent=2, compression_level=None, resume=None):
+    """CaseNdjsonWriter for .ndjson[.gz|.zst] paths, CaseJsonWriter otherwise."""
+    if _strip_compression(path).endswith(".ndjson"):
+        return CaseNdjsonWriter(path, metadata, compression_level, resume)
+    return CaseJsonWriter(path, metadata, indent, compression_level, resume)
+
+def _strip_compression(path):
+    for extension in COMPRESSION_EXTENSIONS.values():
+        if path.endswith(extension):
+            return path[:-len(extension)]
+    return path
+
+def find_event_log(output_dir, name):
+    """Path of the most recently written <name>.json/.ndjson log (optionally compressed) in output_dir."""
+    candidates = [
+        os.path.join(output_dir, name + extension + compression)
+        for extension in JSON_FORMATS.values()
+        for compression in ["", *COMPRESSION_EXTENSIONS.values()]
+    ]
+    existing = [path for path in candidates if os.path.exists(path)]
+    if not existing:
+        raise FileNotFoundError(f"No {name}.json or {name}.ndjson event log in {output_dir}")
+    return max(existing, key=os.path.getmtime)
+
+def read_event_log(path):
+    """Return (metadata, cases) for a .json or .ndjson event log, optionally .gz/.zst compressed.
+
+    NDJSON cases are a generator that streams the file one line at a time; a .json log is
+    loaded whole and its cases returned as a list.
+    """
+    if not _strip_compression(path).endswith(".ndjson"):
+        with open_text_input(path) as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            return {}, data
+        cases = data.pop("cases")
+        return data, cases
+    f = open_text_input(path)
+    first = f.readline()
+    record = json.loads(first) if first.strip() else None
+    if record is not None and "activities" not in record:
+        return record, _iter_ndjson_cases(f)
+    return {}, _iter_ndjson_cases(f, record)
+
+def _iter_ndjson_cases(f, first_case=None):
+    with f:
+        if first_case is not None:
+            yield first_case
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+# --- COLUMNAR (.npy BUNDLE) EXPORT ---
+# A bundle is a directory of plain .npy files, one per column, plus schema.json holding the
+# dictionaries for the coded columns. Event columns have one entry per activity, case columns one
+# entry per case; events point at their case through "event_case". Timestamps are int64 seconds
+# since the Unix epoch (the generators' times are naive, so they are read as UTC).
+
+EVENT_COLUMNS = {
+    "event_case": np.int64,
+    "event_activity": np.int16,   # code into dictionaries["ActivityName"]
+    "event_resource": np.int16,   # code into dictionaries["Resource"]
+    "event_time": np.int64,
+}
+CASE_COLUMNS = {
+    "CaseId": "S16",
+    "PatientID": "S16",
+    "Age": np.int16,
+    "Sex": np.int16,              # coded columns index into dictionaries[<column>]
+    "ModeOfArrival": np.int16,
+    "VisitType": np.int16,
+    "HR": np.int16,
+    "BPSystolic": np.int16,
+    "BPDiastolic": np.int16,
+    "Temp": np.float32,
+    "O2Sat": np.int16,
+    "Triage": np.int16,
+    "ArrivalShift": np.int16,
+    "current_stage": np.int16,
+    "waiting_time": np.float32,
+}
+DICTIONARY_COLUMNS = ["ActivityName", "Resource", "Sex", "ModeOfArrival", "VisitType", "ArrivalShift", "current_stage"]
+MISSING_INT = -1  # missing values: -1 in integer columns, NaN in float columns
+
+class ColumnarBundleWriter:
+    """Incremental writer for a columnar .npy bundle; column chunks are spilled to disk as written.
+
+    The spill files (<column>.bin) are append-only, so resume_point() works while the bundle is
+    open too: it records the rows written so far and the dictionaries, and a writer resumed from it
+    cuts the spill files back to those rows and appends to them.
+    """
+
+    def __init__(self, path, metadata=None, resume=None):
+        self.path = path
+        self.metadata = metadata or {}
+        self.cases_written = 0
+        self.rows_written = 0
+        self.dictionaries = {name: {} for name in DICTIONARY_COLUMNS}
+        self._dtypes = {**EVENT_COLUMNS, **CASE_COLUMNS}
+        self._lengths = dict.fromkeys(self._dtypes, 0)
+        self._resumed = dict.fromkeys(self._dtypes, 0)
+        # True once a resume point may refer to the spill files, which must then survive abort()
+        self._checkpointed = False
+        if resume is not None:
+            # Continue the bundle as it was last closed: new rows are appended to its .npy files on
+            # close, and dictionary codes continue from its schema
+            closed = resume.get("closed", resume)
+            if closed["cases"] or "closed" not in resume:
+                with open(os.path.join(path, "schema.json")) as f:
+                    schema = json.load(f)
+                if (schema["cases"], schema["events"]) != (closed["cases"], closed["events"]):
+                    raise ValueError(f"Columnar bundle {path} does not match the checkpoint.")
+                self.dictionaries = {name: {v: i for i, v in enumerate(values)} for name, values in schema["dictionaries"].items()}
+            for name in self._dtypes:
+                self._resumed[name] = closed["events"] if name in EVENT_COLUMNS else closed["cases"]
+            self.cases_written, self.rows_written = resume["cases"], resume["events"]
+        self._closed = False
+        self._created = not os.path.isdir(path)
+        os.makedirs(path, exist_ok=True)
+        if resume is not None and "closed" in resume:
+            # Checkpointed while open: the spill files hold the rows written since the bundle was
+            # last closed, and maybe rows after the checkpoint, which are dropped
+            self.dictionaries = {name: {v: i for i, v in enumerate(values)} for name, values in resume["dictionaries"].items()}
+            self._raw = {}
+            for name, dtype in self._dtypes.items():
+                self._lengths[name] = (self.rows_written if name in EVENT_COLUMNS else self.cases_written) - self._resumed[name]
+                raw_path = os.path.join(path, name + ".bin")
+                size = self._lengths[name] * np.dtype(dtype).itemsize
+                if not os.path.exists(raw_path) or os.path.getsize(raw_path) < size:
+                    raise ValueError(f"Columnar bundle {path} does not match the checkpoint.")
+                self._raw[name] = open(raw_path, "r+b")
+                self._raw[name].truncate(size)
+                self._raw[name].seek(size)
+            self._checkpointed = True
+        else:
+            self._raw = {name: open(os.path.join(path, name + ".bin"), "wb") for name in self._dtypes}
+
+    def encode(self, column, value):
+        if value is None or value == "":
+            return MISSING_INT
+        codes = self.dictionaries[column]
+        if value not in codes:
+            codes[value] = len(codes)
+        return codes[value]
+
+    def code_map(self, column, values):
+        """Array mapping positions in `values` (e.g. an engine's name table) to this bundle's codes."""
+        return np.array([self.encode(column, v) for v in values], dtype=np.int16)
+
+    def epoch_seconds(self, text):
+        return parse_epoch_seconds(text)
+
+    def write_columns(self, case_columns, event_columns):
+        """Append already-encoded columns; event_case is relative to the cases in this call."""
+        for name, values in case_columns.items():
+            self._append(name, values)
+        for name, values in event_columns.items():
+            if name == "event_case":
+                values = np.asarray(values, dtype=np.int64) + self.cases_written
+            self._append(name, values)
+        self.cases_written += len(case_columns["CaseId"])
+        self.rows_written += len(event_columns["event_case"])
+
+    def write_cases(self, cases):
+        """Encode and append case dicts (the generators' JSON structure)."""
+        case_columns = {name: [] for name in CASE_COLUMNS}
+        event_columns = {name: [] for name in EVENT_COLUMNS}
+        for i, case in enumerate(cases):
+            vitals = case.get("VitalSigns", {})
+            bp = str(vitals.get("BP", "")).split("/")
+            values = {
+                "CaseId": case["CaseId"], "PatientID": case["PatientID"],
+                "Age": case.get("Age", MISSING_INT), "HR": vitals.get("HR", MISSING_INT),
+                "BPSystolic": int(bp[0]) if len(bp) == 2 else MISSING_INT,
+                "BPDiastolic": int(bp[1]) if len(bp) == 2 else MISSING_INT,
+                "Temp": vitals.get("Temp", np.nan), "O2Sat": vitals.get("O2Sat", MISSING_INT),
+                "Triage": case.get("Triage", MISSING_INT),
+                "waiting_time": case.get("waiting_time", np.nan),
+            }
+            for column in ("Sex", "ModeOfArrival", "VisitType", "ArrivalShift", "current_stage"):
+                values[column] = self.encode(column, case.get(column))
+            for name in CASE_COLUMNS:
+                case_columns[name].append(values[name])
+            for activity in case["activities"]:
+                event_columns["event_case"].append(i)
+                event_columns["event_activity"].append(self.encode("ActivityName", activity["ActivityName"]))
+                event_columns["event_resource"].append(self.encode("Resource", activity.get("Resource")))
+                event_columns["event_time"].append(self.epoch_seconds(activity["ActivityTime"]))
+        self.write_columns(case_columns, event_columns)
+
+    def _append(self, name, values):
+        array = np.asarray(values, dtype=self._dtypes[name])
+        array.tofile(self._raw[name])
+        self._lengths[name] += len(array)
+
+    def resume_point(self):
+        """{"cases", "events"} to pass back as `resume` to append to this bundle; while it is open
+        also the state it was last closed in ("closed") and the dictionaries."""
+        if self._closed:
+            return {"cases": self.cases_written, "events": self.rows_written}
+        for raw in self._raw.values():
+            raw.flush()
+        self._checkpointed = True
+        return {
+            "cases": self.cases_written, "events": self.rows_written,
+            "closed": {"cases": self._resumed["CaseId"], "events": self._resumed["event_case"]},
+            "dictionaries": {name: list(codes) for name, codes in self.dictionaries.items()},
+        }
+
+    def abort(self):
+        """Drop the rows written since opening: the spill files go (unless a resume point refers to
+        them), and an existing bundle keeps its .npy files and schema as they were."""
+        if self._closed:
+            return
+        self._closed = True
+        for name, raw in self._raw.items():
+            raw.close()
+            if not self._checkpointed:
+                os.remove(os.path.join(self.path, name + ".bin"))
+        if self._created and not os.listdir(self.path):
+            os.rmdir(self.path)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        # Turn each spilled column into a .npy file (header + raw data), streaming the copy
+        for name, raw in self._raw.items():
+            raw.close()
+            raw_path = os.path.join(self.path, name + ".bin")
+            npy_path = os.path.join(self.path, name + ".npy")
+            header = io.BytesIO()
+            np.lib.format.write_array_header_1_0(header, {
+                "descr": np.lib.format.dtype_to_descr(np.dtype(self._dtypes[name])),
+                "fortran_order": False, "shape": (self._resumed[name] + self._lengths[name],),
+            })
+            header = header.getvalue()
+            if self._resumed[name] and _npy_header_size(npy_path) == len(header):
+                # Same header size: rewrite the header in place and append the new rows
+                with open(npy_path, "r+b") as out, open(raw_path, "rb") as src:
+                    out.write(header)
+                    out.seek(0, os.SEEK_END)
+                    shutil.copyfileobj(src, out)
+            else:
+                tmp_path = npy_path + ".tmp"
+                with open(tmp_path, "wb") as out:
+                    out.write(header)
+                    if self._resumed[name]:
+                        with open(npy_path, "rb") as old:
+                            old.seek(_npy_header_size(npy_path))
+                            shutil.copyfileobj(old, out)
+                    with open(raw_path, "rb") as src:
+                        shutil.copyfileobj(src, out)
+                os.replace(tmp_path, npy_path)
+            os.remove(raw_path)
+        schema = {
+            "format": "event-log-npy-bundle",
+            "version": 1,
+            "metadata": self.metadata,
+            "cases": self.cases_written,
+            "events": self.rows_written,
+            "event_columns": list(EVENT_COLUMNS),
+            "case_columns": list(CASE_COLUMNS),
+            "time_unit": "seconds since 1970-01-01",
+            "missing_int": MISSING_INT,
+            "dictionaries": {name: list(codes) for name, codes in self.dictionaries.items()},
+        }
+        with open(os.path.join(self.path, "schema.json"), "w") as f:
+            json.dump(schema, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A failed run must not turn half of its rows into the bundle
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def _npy_header_size(path):
+    with open(path, "rb") as f:
+        np.lib.format.read_magic(f)
+        np.lib.format.read_array_header_1_0(f)
+        return f.tell()
+
+def load_columnar(path, mmap=True):
+    """Load a columnar bundle: returns (columns dict of arrays, schema dict)."""
+    with open(os.path.join(path, "schema.json")) as f:
+        schema = json.load(f)
+    columns = {}
+    for name in schema["event_columns"] + schema["case_columns"]:
+        count = schema["events"] if name in schema["event_columns"] else schema["cases"]
+        # Empty files cannot be memory-mapped
+        columns[name] = np.load(os.path.join(path, name + ".npy"), mmap_mode="r" if mmap and count else None)
+    return columns, schema
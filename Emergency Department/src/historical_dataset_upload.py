@@ -3,6 +3,8 @@ import requests
 from dotenv import load_dotenv
 import json
 import subprocess
+import historical_event_log
+from instrumentation import Instrumentation
 
 API_BASE_URL = 'https://www.mindziestudio.com'  # No trailing slash
 
@@ -79,43 +81,54 @@ def get_all_datasets(tenant_id, project_id, api_key):
         return []
 
 def main():
-    # Generate the historical event log before uploading
-    print("Generating historical event log...")
-    subprocess.run(['python', os.path.join(os.path.dirname(__file__), 'historical_event_log.py')], check=True)
-    # Load .env and get keys
-    load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
-    tenant_id = os.getenv('TENANT_ID')
-    project_id = os.getenv('PROJECT_ID')
-    api_key = os.getenv('API_KEY')
-    print(f"Tenant ID: {tenant_id}")
-    print(f"Project ID: {project_id}")
-    output_dir = os.path.join(os.path.dirname(__file__), 'Output')
-    csv_path = os.path.join(output_dir, 'alderaan_year_to_date.csv')
-    dataset_name = 'Alderaan Year to Date'
-    datasets = get_all_datasets(tenant_id, project_id, api_key)
-    print("Datasets response:", datasets)  # Debug print
+    # The dataset API takes the plain single-file CSV; check before spending time on generation
+    if historical_event_log.OUTPUT_COMPRESSION or historical_event_log.OUTPUT_PARTITION:
+        raise ValueError("The upload needs the uncompressed, single-file CSV; set OUTPUT_COMPRESSION and OUTPUT_PARTITION to None in historical_event_log.py.")
+    # The generator inherits this run's instrumentation mode (and metrics file)
+    with Instrumentation("historical_dataset_upload") as inst:
+        # Generate the historical event log before uploading; only days after the last run's
+        # checkpoint are generated and appended
+        print("Generating historical event log...")
+        with inst.phase("generate"):
+            subprocess.run(['python', os.path.join(os.path.dirname(__file__), 'historical_event_log.py'), '--incremental'], check=True, env=inst.child_env())
+        # Load .env and get keys
+        load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+        tenant_id = os.getenv('TENANT_ID')
+        project_id = os.getenv('PROJECT_ID')
+        api_key = os.getenv('API_KEY')
+        print(f"Tenant ID: {tenant_id}")
+        print(f"Project ID: {project_id}")
+        output_dir = os.path.join(os.path.dirname(__file__), 'Output')
+        csv_path = os.path.join(output_dir, 'alderaan_year_to_date.csv')
+        dataset_name = 'Alderaan Year to Date'
+        with inst.phase("list_datasets"):
+            datasets = get_all_datasets(tenant_id, project_id, api_key)
+        print("Datasets response:", datasets)  # Debug print
 
-    # Extract the list of datasets from the correct key
-    if isinstance(datasets, dict):
-        for key in ['Items', 'datasets', 'items', 'data']:
-            if key in datasets:
-                datasets = datasets[key]
-                break
+        # Extract the list of datasets from the correct key
+        if isinstance(datasets, dict):
+            for key in ['Items', 'datasets', 'items', 'data']:
+                if key in datasets:
+                    datasets = datasets[key]
+                    break
 
-    if not isinstance(datasets, list):
-        print("Unexpected datasets response format.")
-        datasets = []
+        if not isinstance(datasets, list):
+            print("Unexpected datasets response format.")
+            datasets = []
 
-    # Use 'datasetName' for comparison
-    dataset = next((d for d in datasets if isinstance(d, dict) and d.get('datasetName') == dataset_name), None)
-    if dataset:
-        print(f"Dataset '{dataset_name}' exists. Updating dataset...")
-        result = update_data_set(dataset['datasetId'], csv_path, tenant_id, project_id, api_key)
-        print_result_report(result, "Update")
-    else:
-        print(f"Dataset '{dataset_name}' does not exist. Creating new dataset...")
-        result = create_data_set(csv_path, dataset_name, tenant_id, project_id, api_key)
-        print_result_report(result, "Create")
+        inst.count("bytes_uploaded", os.path.getsize(csv_path))
+        # Use 'datasetName' for comparison
+        dataset = next((d for d in datasets if isinstance(d, dict) and d.get('datasetName') == dataset_name), None)
+        if dataset:
+            print(f"Dataset '{dataset_name}' exists. Updating dataset...")
+            with inst.phase("upload"):
+                result = update_data_set(dataset['datasetId'], csv_path, tenant_id, project_id, api_key)
+            print_result_report(result, "Update")
+        else:
+            print(f"Dataset '{dataset_name}' does not exist. Creating new dataset...")
+            with inst.phase("upload"):
+                result = create_data_set(csv_path, dataset_name, tenant_id, project_id, api_key)
+            print_result_report(result, "Create")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,8 +1,23 @@
 import os
+import sys
 import json
 import random
+import hashlib
+import contextlib
 from datetime import datetime, timedelta
-import csv
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from functools import partial
+from event_log_io import (
+    CaseCsvWriter, ColumnarBundleWriter, SortedCsvWriter, compressed_path, csv_text, format_epoch_minutes, from_epoch_minutes,
+    json_log_path, open_case_json_writer, serialize_cases_json, to_epoch_minutes,
+)
+from id_allocator import UniqueIdAllocator
+from variant_spec import CompiledVariants, load_variant_spec
+from instrumentation import Instrumentation
+from ed_simulation import RosterExhausted, simulate_day
+from shift_roster import ShiftRoster
 
 # --- CONFIGURATION ---
 
@@ -24,12 +39,59 @@ CASE_COUNT_BY_WEEKDAY = {
     6: 85,  # Sunday
 }
 
-# Variant mix: proportion of each variant (must sum to 1.0)
-VARIANT_MIX = {
-    'simple_discharge': 0.6,
-    'discharge_with_tests': 0.3,
-    'admission_after_observation': 0.1,
-}
+# Scales every day's case count (for stress tests and benchmarks; see benchmark_generators.py)
+LOAD_MULTIPLIER = 1
+
+# Case variants (activity paths, times, the variant mix and the LWBS rate) are declared in
+# variants.json and compiled once at import (see STEP 1b and variant_spec.py)
+VARIANT_SPEC_PATH = None  # None uses src/variants.json
+
+# Case generation engine: "batch" builds each day's cases as columnar NumPy arrays from fixed
+# templates, "simulation" times them with the queueing simulation (beds and staff are contended;
+# see STEP 1e), "per_case" is the original one-dict-at-a-time reference implementation
+GENERATION_MODE = "batch"
+
+# Worker processes for batch generation (1 = in this process, 0 = one per CPU core). Every day
+# draws from its own RNG stream, so the output is identical for any number of workers.
+PARALLEL_WORKERS = 1
+
+# Output layout: None writes the single alderaan_year_to_date.csv/json pair; "day" or "month"
+# writes one shard per period (and per site) under year_to_date_shards/, plus a manifest.json
+OUTPUT_PARTITION = None
+
+# Also write a columnar .npy bundle (dictionary-encoded activities/resources, int64 timestamps,
+# per-case attribute columns) next to the CSV/JSON; see event_log_io.load_columnar
+COLUMNAR_EXPORT = True
+
+# Streaming compression for the CSV/JSON outputs: None, "gzip" (.gz) or "zstd" (.zst; needs Python
+# 3.14+ or the zstandard package). COMPRESSION_LEVEL None uses the codec default (gzip 6, zstd 3).
+OUTPUT_COMPRESSION = None
+COMPRESSION_LEVEL = None
+# True writes the CSV rows in (ActivityTime, CaseId) order instead of case by case, with an
+# external merge sort: sorted runs of CSV_SORT_CHUNK_ROWS rows are spilled to a temporary directory
+# next to the CSV and k-way merged when it closes, so memory stays bounded at any scale. Not
+# available with INCREMENTAL (appended rows would sort before rows already written).
+CSV_SORTED = False
+CSV_SORT_CHUNK_ROWS = 250_000
+# JSON indentation; None writes compact JSON, which is several times smaller
+JSON_INDENT = 2
+# "json" writes the {"cases": [...]} document; "ndjson" writes .ndjson with one compact case per
+# line, which can be streamed, split and tailed (see event_log_io.read_event_log)
+JSON_FORMAT = "json"
+
+# Hospital sites to generate; each site gets its own RNG streams and ID block. More than one
+# site requires a partitioned output, since shards (and the manifest) identify the site.
+HOSPITAL_SITES = ["Alderaan"]
+
+# Incremental runs append only the days after the last checkpoint to the existing single-file
+# outputs (see STEP 2c); the result is identical to regenerating from START_DATE. Also enabled
+# with the --incremental command line flag.
+INCREMENTAL = False
+
+# Progress reporting: "quiet", "progress" (a progress bar with rates on stderr) or "jsonl" (phase
+# timings, counters and rates appended to Output/metrics.jsonl); None uses $ED_INSTRUMENTATION
+# or "progress". See instrumentation.py.
+INSTRUMENTATION = None
 
 # Problem injection plan (to be expanded)
 PROBLEM_DAYS = {
@@ -64,156 +126,93 @@ ACTIVITY_RESOURCE_MAP = {
     "Left Without Being Seen": CLERKS,
 }
 
-def assign_resource(activity_name):
-    pool = ACTIVITY_RESOURCE_MAP.get(activity_name, NURSES)
-    return random.choice(pool)
+# Staff role of each pool; shift rosters (STEP 1d) are built per role
+ROLE_POOLS = {"clerk": CLERKS, "nurse": NURSES, "doctor": DOCTORS, "tech": TECHS}
+ACTIVITY_ROLE = {
+    activity: next(role for role, members in ROLE_POOLS.items() if members is pool)
+    for activity, pool in ACTIVITY_RESOURCE_MAP.items()
+}
+
+def assign_resource(activity_name, minute=None, roster=None):
+    """Staff member for an activity: someone of its role on duty at `minute` when a roster is given."""
+    if roster is None:
+        pool = ACTIVITY_RESOURCE_MAP.get(activity_name, NURSES)
+        return random.choice(pool)
+    return RESOURCE_NAMES[random.choice(roster.on_duty(ACTIVITY_ROLE.get(activity_name, "nurse"), minute))]
 
 # Update activity generation to include resource
 
-def add_resource_to_activities(activities):
+def add_resource_to_activities(activities, roster=None):
     for act in activities:
-        act["Resource"] = assign_resource(act["ActivityName"])
+        act["Resource"] = assign_resource(act["ActivityName"], act["ActivityTime"], roster)
     return activities
 
-def generate_simple_discharge(day, used_case_ids, used_patient_ids):
-    # Registration → Triage → Bed Assigned → Nurse Assessment → Doctor Examination → Discharged
-    activities = [
-        {"ActivityName": "Registration", "ActivityTime": day.strftime("%Y-%m-%d 08:00:00")},
-        {"ActivityName": "Triage", "ActivityTime": day.strftime("%Y-%m-%d 08:15:00")},
-        {"ActivityName": "Bed Assigned", "ActivityTime": day.strftime("%Y-%m-%d 08:30:00")},
-        {"ActivityName": "Nurse Assessment", "ActivityTime": day.strftime("%Y-%m-%d 08:45:00")},
-        {"ActivityName": "Doctor Examination", "ActivityTime": day.strftime("%Y-%m-%d 09:00:00")},
-        {"ActivityName": "Discharged", "ActivityTime": day.strftime("%Y-%m-%d 09:30:00")},
-    ]
+def generate_variant_case(code, day, roster=None):
+    """Per-case mode: one case of variant `code`, laid out from its compiled steps (see STEP 1b)."""
+    case_id = f"ED{random.randint(100000, 999999)}"
+    patient_id = f"P{random.randint(1000, 9999)}"
+    midnight = to_epoch_minutes(day)
+    offset = 0
+    activities = []
+    for activity, base, gap_low, gap_high in HISTORICAL_VARIANTS.steps(code):
+        if gap_high:
+            offset += random.randint(gap_low, gap_high)
+        activities.append({"ActivityName": ACTIVITY_NAMES[activity], "ActivityTime": midnight + base + offset})
     return {
-        "CaseId": f"ED{random.randint(100000, 999999)}",
-        "PatientID": f"P{random.randint(1000, 9999)}",
-        "activities": add_resource_to_activities(activities)
+        "CaseId": case_id,
+        "PatientID": patient_id,
+        "activities": add_resource_to_activities(activities, roster)
     }
 
-def generate_discharge_with_tests(day, used_case_ids, used_patient_ids):
-    # Registration → Triage → Bed Assigned → Nurse Assessment → Doctor Examination → Diagnostic Test Ordered → Blood Test Performed → Test Results Available → Treatment Administered → Discharged
-    activities = [
-        {"ActivityName": "Registration", "ActivityTime": day.strftime("%Y-%m-%d 08:00:00")},
-        {"ActivityName": "Triage", "ActivityTime": day.strftime("%Y-%m-%d 08:10:00")},
-        {"ActivityName": "Bed Assigned", "ActivityTime": day.strftime("%Y-%m-%d 08:25:00")},
-        {"ActivityName": "Nurse Assessment", "ActivityTime": day.strftime("%Y-%m-%d 08:40:00")},
-        {"ActivityName": "Doctor Examination", "ActivityTime": day.strftime("%Y-%m-%d 09:00:00")},
-        {"ActivityName": "Diagnostic Test Ordered", "ActivityTime": day.strftime("%Y-%m-%d 09:10:00")},
-        {"ActivityName": "Blood Test Performed", "ActivityTime": day.strftime("%Y-%m-%d 09:20:00")},
-        {"ActivityName": "Test Results Available", "ActivityTime": day.strftime("%Y-%m-%d 09:50:00")},
-        {"ActivityName": "Treatment Administered", "ActivityTime": day.strftime("%Y-%m-%d 10:00:00")},
-        {"ActivityName": "Discharged", "ActivityTime": day.strftime("%Y-%m-%d 10:30:00")},
-    ]
-    return {
-        "CaseId": f"ED{random.randint(100000, 999999)}",
-        "PatientID": f"P{random.randint(1000, 9999)}",
-        "activities": add_resource_to_activities(activities)
-    }
+def open_csv_writer(path, compression_level=None, resume=None, sort=None):
+    """CaseCsvWriter for `path`, or a SortedCsvWriter if `sort` (default CSV_SORTED)."""
+    if CSV_SORTED if sort is None else sort:
+        return SortedCsvWriter(path, compression_level, chunk_rows=CSV_SORT_CHUNK_ROWS)
+    return CaseCsvWriter(path, compression_level=compression_level, resume=resume)
 
-def generate_admission_after_observation(day, used_case_ids, used_patient_ids):
-    # Registration → ... → Observation → Disposition Decision Recorded → Admitted to Hospital
-    activities = [
-        {"ActivityName": "Registration", "ActivityTime": day.strftime("%Y-%m-%d 08:00:00")},
-        {"ActivityName": "Triage", "ActivityTime": day.strftime("%Y-%m-%d 08:20:00")},
-        {"ActivityName": "Bed Assigned", "ActivityTime": day.strftime("%Y-%m-%d 08:40:00")},
-        {"ActivityName": "Nurse Assessment", "ActivityTime": day.strftime("%Y-%m-%d 09:00:00")},
-        {"ActivityName": "Doctor Examination", "ActivityTime": day.strftime("%Y-%m-%d 09:30:00")},
-        {"ActivityName": "Treatment Administered", "ActivityTime": day.strftime("%Y-%m-%d 10:00:00")},
-        {"ActivityName": "Observation", "ActivityTime": day.strftime("%Y-%m-%d 10:30:00")},
-        {"ActivityName": "Disposition Decision Recorded", "ActivityTime": day.strftime("%Y-%m-%d 12:00:00")},
-        {"ActivityName": "Admitted to Hospital", "ActivityTime": day.strftime("%Y-%m-%d 12:30:00")},
-    ]
-    return {
-        "CaseId": f"ED{random.randint(100000, 999999)}",
-        "PatientID": f"P{random.randint(1000, 9999)}",
-        "activities": add_resource_to_activities(activities)
-    }
+def open_columnar_writer(path, resume=None):
+    """ColumnarBundleWriter for `path`, or a context yielding None when there is no bundle to write."""
+    return ColumnarBundleWriter(path, resume=resume) if path else contextlib.nullcontext()
 
-VARIANT_FUNCTIONS = {
-    'simple_discharge': generate_simple_discharge,
-    'discharge_with_tests': generate_discharge_with_tests,
-    'admission_after_observation': generate_admission_after_observation,
-}
+def save_all_cases_json(all_cases, output_dir, compression=None):
+    out_path = json_log_path(os.path.join(output_dir, "alderaan_year_to_date"), JSON_FORMAT, compression)
+    with open_case_json_writer(out_path, indent=JSON_INDENT, compression_level=COMPRESSION_LEVEL) as writer:
+        writer.write_cases(all_cases)
+    print(f"Saved all cases to {out_path}")
 
-def save_all_cases_json(all_cases, output_dir):
-    out_path = os.path.join(output_dir, "alderaan_year_to_date.json")
-    with open(out_path, "w") as f:
-        json.dump({"cases": all_cases}, f, indent=2)
+def save_all_cases_csv(all_cases, output_dir, compression=None):
+    out_path = compressed_path(os.path.join(output_dir, "alderaan_year_to_date.csv"), compression)
+    with open_csv_writer(out_path, compression_level=COMPRESSION_LEVEL) as writer:
+        writer.write_cases(all_cases)
     print(f"Saved all cases to {out_path}")
 
-def save_all_cases_csv(all_cases, output_dir):
-    out_path = os.path.join(output_dir, "alderaan_year_to_date.csv")
-    fieldnames = [
-        "CaseId", "ActivityName", "ActivityTime", "PatientID", "Resource",
-        "Age", "Sex", "ModeOfArrival", "VisitType", "HR", "BP", "Temp", "O2Sat", "Triage", "ArrivalShift"
-    ]
-    with open(out_path, "w", newline="") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for case in all_cases:
-            vitals = case.get("VitalSigns", {})
-            for activity in case["activities"]:
-                writer.writerow({
-                    "CaseId": case["CaseId"],
-                    "ActivityName": activity["ActivityName"],
-                    "ActivityTime": activity["ActivityTime"],
-                    "PatientID": case["PatientID"],
-                    "Resource": activity.get("Resource", ""),
-                    "Age": case.get("Age", ""),
-                    "Sex": case.get("Sex", ""),
-                    "ModeOfArrival": case.get("ModeOfArrival", ""),
-                    "VisitType": case.get("VisitType", ""),
-                    "HR": vitals.get("HR", ""),
-                    "BP": vitals.get("BP", ""),
-                    "Temp": vitals.get("Temp", ""),
-                    "O2Sat": vitals.get("O2Sat", ""),
-                    "Triage": case.get("Triage", ""),
-                    "ArrivalShift": case.get("ArrivalShift", "")
-                })
+def save_all_cases_columnar(all_cases, output_dir):
+    out_path = os.path.join(output_dir, "alderaan_year_to_date_columnar")
+    with ColumnarBundleWriter(out_path) as writer:
+        writer.write_cases(all_cases)
     print(f"Saved all cases to {out_path}")
 
-def generate_lwbs_cases_for_historical(all_days, n):
-    """Generate n LWBS cases, distributed across the date range, with different variants."""
-    cases = []
-    lwbs_variants = [
-        ["Registration"],
-        ["Registration", "Triage"],
-        ["Registration", "Triage", "Bed Assigned"],
-        ["Registration", "Triage", "Bed Assigned", "Nurse Assessment"]
-    ]
-    used_case_ids = set()
-    used_patient_ids = set()
+def save_all_batches_csv(batches, output_dir, compression=None):
+    out_path = compressed_path(os.path.join(output_dir, "alderaan_year_to_date.csv"), compression)
+    with open_csv_writer(out_path, compression_level=COMPRESSION_LEVEL) as writer:
+        for batch in batches:
+            writer.write_rows(batch_to_csv_rows(batch))
+    print(f"Saved all cases to {out_path}")
+
+def iter_lwbs_cases_for_historical(all_days, n, start=0, roster=None):
+    """Yield n LWBS cases, distributed across the date range, cycling through the LWBS paths.
+
+    `start` continues the path cycle when LWBS cases are generated one day at a time.
+    """
     for i in range(n):
         # Distribute cases across the date range
         day = all_days[i % len(all_days)]
-        case_id = f"ED{random.randint(100000, 999999)}"
-        patient_id = f"P{random.randint(1000, 9999)}"
-        path = lwbs_variants[i % len(lwbs_variants)].copy()
-        path.append("Left Without Being Seen")
-        time = day.replace(hour=8, minute=0, second=0)
-        activities_list = []
-        for activity in path:
-            time += timedelta(minutes=random.randint(5, 30))
-            activities_list.append({
-                "ActivityName": activity,
-                "ActivityTime": time.strftime("%Y-%m-%d %H:%M:%S")
-            })
-        activities_list = add_resource_to_activities(activities_list)
-        cases.append({
-            "CaseId": case_id,
-            "PatientID": patient_id,
-            "activities": activities_list
-        })
-    return cases
-
-def generate_unique_ids(prefix, n, min_val, max_val):
-    # Ensure there are enough unique values in the range
-    if n > (max_val - min_val + 1):
-        raise ValueError("Not enough unique IDs in the specified range.")
-    ids = list(range(min_val, max_val + 1))
-    random.shuffle(ids)
-    return [f"{prefix}{id_}" for id_ in ids[:n]]
+        code = HISTORICAL_VARIANTS.lwbs_code + (start + i) % HISTORICAL_VARIANTS.n_lwbs_paths
+        yield generate_variant_case(code, day, roster)
+
+def generate_lwbs_cases_for_historical(all_days, n):
+    """Generate n LWBS cases, distributed across the date range, with different variants."""
+    return list(iter_lwbs_cases_for_historical(all_days, n))
 
 def random_age():
     r = random.random()
@@ -245,15 +244,14 @@ def random_triage():
     return random.choices([1, 2, 3, 4, 5], weights=[0.05, 0.15, 0.5, 0.2, 0.1])[0]
 
 def get_arrival_shift(activities):
-    reg_time_str = None
+    reg_time = None
     for act in activities:
         if act['ActivityName'] == 'Registration':
-            reg_time_str = act['ActivityTime']
+            reg_time = act['ActivityTime']
             break
-    if not reg_time_str:
+    if reg_time is None:
         return None
-    reg_time = datetime.strptime(reg_time_str, '%Y-%m-%d %H:%M:%S')
-    hour = reg_time.hour
+    hour = reg_time // 60 % 24
     if 7 <= hour < 15:
         return 'Day'
     elif 15 <= hour < 23:
@@ -271,128 +269,776 @@ def add_case_attributes(case):
     case['ArrivalShift'] = get_arrival_shift(case['activities'])
     return case
 
+# --- STEP 1b: BATCH (COLUMNAR) ENGINE ---
+# The batch engine produces a whole day's cases at once as NumPy columns. Activities,
+# resources and categorical attributes are stored as integer codes into the tables below;
+# case dicts and CSV rows are only materialized when the batch is written out.
+
+ACTIVITY_NAMES = [
+    "Registration", "Triage", "Bed Assigned", "Nurse Assessment", "Doctor Examination",
+    "Diagnostic Test Ordered", "Blood Test Performed", "Imaging Performed", "Test Results Available",
+    "Treatment Administered", "Observation", "Specialist Consultation", "Disposition Decision Recorded",
+    "Discharged", "Admitted to Hospital", "Left Without Being Seen",
+]
+ACTIVITY_CODES = {name: code for code, name in enumerate(ACTIVITY_NAMES)}
+
+# Variants compiled from variants.json: the templated variants in spec order, then one code per
+# LWBS path. Templated steps sit at fixed times; LWBS steps take 5-30 minutes each from 08:00.
+HISTORICAL_VARIANTS = CompiledVariants(load_variant_spec(VARIANT_SPEC_PATH), ACTIVITY_CODES)
+LWBS_VARIANT_CODE = HISTORICAL_VARIANTS.lwbs_code
+
+# Flat resource table plus, per activity code, the slice of it that forms the activity's pool
+RESOURCE_NAMES = DOCTORS + NURSES + NP_PA + CLERKS + TECHS
+_RESOURCE_INDEX = {name: i for i, name in enumerate(RESOURCE_NAMES)}
+ACTIVITY_POOL_START = np.array([_RESOURCE_INDEX[ACTIVITY_RESOURCE_MAP.get(name, NURSES)[0]] for name in ACTIVITY_NAMES])
+ACTIVITY_POOL_SIZE = np.array([len(ACTIVITY_RESOURCE_MAP.get(name, NURSES)) for name in ACTIVITY_NAMES])
+ROLE_CODES = {role: code for code, role in enumerate(ROLE_POOLS)}
+_ACTIVITY_ROLE_CODE = np.array([ROLE_CODES[ACTIVITY_ROLE.get(name, "nurse")] for name in ACTIVITY_NAMES])
+
+SEX_VALUES = ['Male', 'Female', 'Other']
+SEX_WEIGHTS = [0.49, 0.49, 0.02]
+MODE_OF_ARRIVAL_VALUES = ['Ambulance', 'Walk-in', 'Referral']
+MODE_OF_ARRIVAL_WEIGHTS = [0.25, 0.7, 0.05]
+VISIT_TYPE_VALUES = ['New', 'Follow-up', 'Transfer']
+VISIT_TYPE_WEIGHTS = [0.85, 0.1, 0.05]
+TRIAGE_VALUES = [1, 2, 3, 4, 5]
+TRIAGE_WEIGHTS = [0.05, 0.15, 0.5, 0.2, 0.1]
+ARRIVAL_SHIFT_VALUES = ['Day', 'Evening', 'Night']
+
+def format_day_minutes(day, minutes):
+    """Format minute offsets from midnight of `day` as 'YYYY-MM-DD HH:MM:SS' strings."""
+    return format_epoch_minutes(to_epoch_minutes(day) + np.asarray(minutes, dtype=np.int64))
+
+def batch_arrival_shift(registration_minutes):
+    hour = (registration_minutes // 60) % 24
+    return np.select([(hour >= 7) & (hour < 15), (hour >= 15) & (hour < 23)], [0, 1], 2).astype(np.int8)
+
+def batch_ages(rng, n):
+    r = rng.random(n)
+    pediatric = rng.integers(0, 18, n)
+    adult = rng.integers(18, 76, n)
+    elderly = rng.integers(76, 101, n)
+    return np.where(r < 0.15, pediatric, np.where(r < 0.85, adult, elderly))
+
+def batch_case_attributes(rng, n_cases):
+    """Draw the per-case attribute columns (demographics, vitals, triage code) of a batch."""
+    return {
+        "Age": batch_ages(rng, n_cases),
+        "Sex": rng.choice(len(SEX_VALUES), n_cases, p=SEX_WEIGHTS).astype(np.int8),
+        "ModeOfArrival": rng.choice(len(MODE_OF_ARRIVAL_VALUES), n_cases, p=MODE_OF_ARRIVAL_WEIGHTS).astype(np.int8),
+        "VisitType": rng.choice(len(VISIT_TYPE_VALUES), n_cases, p=VISIT_TYPE_WEIGHTS).astype(np.int8),
+        "HR": rng.integers(50, 121, n_cases),
+        "BPSystolic": rng.integers(90, 161, n_cases),
+        "BPDiastolic": rng.integers(50, 101, n_cases),
+        "Temp": np.round(rng.uniform(35.5, 39.5, n_cases), 1),
+        "O2Sat": rng.integers(90, 101, n_cases),
+        "Triage": rng.choice(len(TRIAGE_VALUES), n_cases, p=TRIAGE_WEIGHTS).astype(np.int8),
+    }
+
+def generate_day_batch(day, variant_counts, n_lwbs, rng, case_ids, patient_ids, roster=None):
+    """Generate one day's cases as columnar arrays; variant_counts follows HISTORICAL_VARIANTS.names.
+
+    With a roster, each event's resource is someone of its role on duty at the event's time.
+    """
+    # Templated cases in variant order, then LWBS cases on randomly drawn paths
+    variant = np.repeat(np.arange(len(variant_counts), dtype=np.int8), variant_counts)
+    if n_lwbs:
+        lwbs_kind = rng.integers(0, HISTORICAL_VARIANTS.n_lwbs_paths, n_lwbs)
+        variant = np.concatenate([variant, (LWBS_VARIANT_CODE + lwbs_kind).astype(np.int8)])
+    n_cases = len(variant)
+    event_case, event_activity, event_minute = HISTORICAL_VARIANTS.expand(variant, rng)
+    # One resource draw per event, from the on-duty staff or else from the activity's whole pool
+    u = rng.random(len(event_activity))
+    if roster is not None:
+        event_resource = roster_resources(roster, day, event_activity, event_minute, u)
+    else:
+        pool_size = ACTIVITY_POOL_SIZE[event_activity]
+        event_resource = (ACTIVITY_POOL_START[event_activity] + (u * pool_size).astype(np.int64)).astype(np.int16)
+    # Registration is always the first event of a case
+    first_event = np.searchsorted(event_case, np.arange(n_cases))
+    return {
+        "Day": day,
+        "CaseId": list(case_ids),
+        "PatientID": list(patient_ids),
+        "Variant": variant,
+        **batch_case_attributes(rng, n_cases),
+        "ArrivalShift": batch_arrival_shift(event_minute[first_event]) if n_cases else np.empty(0, dtype=np.int8),
+        "EventCase": event_case,
+        "EventActivity": event_activity,
+        "EventMinute": event_minute,
+        "EventResource": event_resource,
+    }
+
+def batch_to_cases(batch):
+    """Materialize a columnar batch as case dicts in the per-case output structure."""
+    times = format_day_minutes(batch["Day"], batch["EventMinute"].tolist())
+    event_case = batch["EventCase"].tolist()
+    event_activity = batch["EventActivity"].tolist()
+    event_resource = batch["EventResource"].tolist()
+    activities = [[] for _ in batch["CaseId"]]
+    for case_idx, act, t, res in zip(event_case, event_activity, times, event_resource):
+        activities[case_idx].append({"ActivityName": ACTIVITY_NAMES[act], "ActivityTime": t, "Resource": RESOURCE_NAMES[res]})
+    columns = zip(
+        batch["CaseId"], batch["PatientID"], activities, batch["Age"].tolist(), batch["Sex"].tolist(),
+        batch["ModeOfArrival"].tolist(), batch["VisitType"].tolist(), batch["HR"].tolist(),
+        batch["BPSystolic"].tolist(), batch["BPDiastolic"].tolist(), batch["Temp"].tolist(),
+        batch["O2Sat"].tolist(), batch["Triage"].tolist(), batch["ArrivalShift"].tolist(),
+    )
+    return [
+        {
+            "CaseId": case_id,
+            "PatientID": patient_id,
+            "activities": acts,
+            "Age": age,
+            "Sex": SEX_VALUES[sex],
+            "ModeOfArrival": MODE_OF_ARRIVAL_VALUES[mode],
+            "VisitType": VISIT_TYPE_VALUES[visit],
+            "VitalSigns": {"HR": hr, "BP": f"{bp_sys}/{bp_dia}", "Temp": temp, "O2Sat": o2},
+            "Triage": TRIAGE_VALUES[triage],
+            "ArrivalShift": ARRIVAL_SHIFT_VALUES[shift],
+        }
+        for case_id, patient_id, acts, age, sex, mode, visit, hr, bp_sys, bp_dia, temp, o2, triage, shift in columns
+    ]
+
+def write_batch_columns(writer, batch):
+    """Append a columnar batch to a ColumnarBundleWriter, translating engine codes to bundle codes."""
+    activity_map = writer.code_map("ActivityName", ACTIVITY_NAMES)
+    resource_map = writer.code_map("Resource", RESOURCE_NAMES)
+    day_seconds = int((batch["Day"] - datetime(1970, 1, 1)).total_seconds())
+    n_cases = len(batch["CaseId"])
+    case_columns = {
+        "CaseId": batch["CaseId"],
+        "PatientID": batch["PatientID"],
+        "Age": batch["Age"],
+        "Sex": writer.code_map("Sex", SEX_VALUES)[batch["Sex"]],
+        "ModeOfArrival": writer.code_map("ModeOfArrival", MODE_OF_ARRIVAL_VALUES)[batch["ModeOfArrival"]],
+        "VisitType": writer.code_map("VisitType", VISIT_TYPE_VALUES)[batch["VisitType"]],
+        "HR": batch["HR"],
+        "BPSystolic": batch["BPSystolic"],
+        "BPDiastolic": batch["BPDiastolic"],
+        "Temp": batch["Temp"],
+        "O2Sat": batch["O2Sat"],
+        "Triage": np.array(TRIAGE_VALUES)[batch["Triage"]],
+        "ArrivalShift": writer.code_map("ArrivalShift", ARRIVAL_SHIFT_VALUES)[batch["ArrivalShift"]],
+        "current_stage": np.full(n_cases, -1),
+        "waiting_time": np.full(n_cases, np.nan),
+    }
+    event_columns = {
+        "event_case": batch["EventCase"],
+        "event_activity": activity_map[batch["EventActivity"]],
+        "event_resource": resource_map[batch["EventResource"]],
+        "event_time": day_seconds + batch["EventMinute"].astype(np.int64) * 60,
+    }
+    writer.write_columns(case_columns, event_columns)
+
+def batch_to_csv_rows(batch):
+    """Yield CSV rows (in event_log_io.CSV_FIELDNAMES order) for a columnar batch without building case dicts."""
+    times = format_day_minutes(batch["Day"], batch["EventMinute"].tolist())
+    case_ids = batch["CaseId"]
+    patient_ids = batch["PatientID"]
+    ages = batch["Age"].tolist()
+    sexes = [SEX_VALUES[c] for c in batch["Sex"].tolist()]
+    modes = [MODE_OF_ARRIVAL_VALUES[c] for c in batch["ModeOfArrival"].tolist()]
+    visits = [VISIT_TYPE_VALUES[c] for c in batch["VisitType"].tolist()]
+    hrs = batch["HR"].tolist()
+    bps = [f"{s}/{d}" for s, d in zip(batch["BPSystolic"].tolist(), batch["BPDiastolic"].tolist())]
+    temps = batch["Temp"].tolist()
+    o2s = batch["O2Sat"].tolist()
+    triages = [TRIAGE_VALUES[c] for c in batch["Triage"].tolist()]
+    shifts = [ARRIVAL_SHIFT_VALUES[c] for c in batch["ArrivalShift"].tolist()]
+    for i, act, t, res in zip(batch["EventCase"].tolist(), batch["EventActivity"].tolist(), times, batch["EventResource"].tolist()):
+        yield [
+            case_ids[i], ACTIVITY_NAMES[act], t, patient_ids[i], RESOURCE_NAMES[res],
+            ages[i], sexes[i], modes[i], visits[i], hrs[i], bps[i], temps[i], o2s[i], triages[i], shifts[i],
+        ]
+
+# --- STEP 1c: DAY PLAN ---
+# The day plan is computed once, before any case is generated. Generation, ID allocation and
+# parallel scheduling all read from it. Each day's row comes from its own RNG stream, so a day's
+# plan does not depend on the configured date range.
+
+LWBS_RATE = HISTORICAL_VARIANTS.lwbs_rate  # LWBS cases are added on top of the day's regular cases
+SEASONAL_FACTOR_BY_MONTH = {1: 1.10, 2: 1.10, 3: 0.95, 4: 0.95}
+# Day-of-week factor: CASE_COUNT_BY_WEEKDAY relative to its weekly mean, so the average stays 100/day
+WEEKDAY_FACTOR = {
+    weekday: count / (sum(CASE_COUNT_BY_WEEKDAY.values()) / len(CASE_COUNT_BY_WEEKDAY))
+    for weekday, count in CASE_COUNT_BY_WEEKDAY.items()
+}
+# Partial days (the snapshot day ends at 14:00): fraction of a full day's volume
+PARTIAL_DAYS = {"2025-05-04": 14 / 24}
+
+DAY_PLAN_DTYPE = np.dtype([
+    ("ordinal", np.int32),          # datetime.toordinal() of the day
+    ("case_count", np.int32),       # regular (non-LWBS) cases
+    ("variant_counts", np.int32, (HISTORICAL_VARIANTS.n_templated,)),  # cases per templated variant
+    ("n_lwbs", np.int32),
+    ("n_cases", np.int32),          # all cases of the day, LWBS included
+    ("case_offset", np.int64),      # cases planned before this day (index into the ID allocators)
+    ("bed_shortage", np.bool_),
+    ("doctor_shortage", np.bool_),
+])
+
+def plan_rng(day, site_index=0):
+    """RNG stream for a day's plan row, independent of the day's case generation stream."""
+    return np.random.default_rng([RANDOM_SEED, day.toordinal(), 1, site_index])
+
+def build_day_plan(start_date=None, end_date=None, site_index=0):
+    """Compute each day's case count, variant split, LWBS count and problem flags into a table."""
+    start_date = START_DATE if start_date is None else start_date
+    end_date = END_DATE if end_date is None else end_date
+    n_days = max(0, (end_date - start_date).days + 1)
+    plan = np.zeros(n_days, dtype=DAY_PLAN_DTYPE)
+    for i in range(n_days):
+        day = start_date + timedelta(days=i)
+        day_str = day.strftime("%Y-%m-%d")
+        rng = plan_rng(day, site_index)
+        noise = rng.uniform(-0.08, 0.08)
+        base_count = 100 * SEASONAL_FACTOR_BY_MONTH.get(day.month, 1.0) * WEEKDAY_FACTOR[day.weekday()] * LOAD_MULTIPLIER
+        case_count = int(round(base_count * (1 + noise) * PARTIAL_DAYS.get(day_str, 1.0)))
+        problems = PROBLEM_DAYS.get(day_str, {})
+        plan[i] = (
+            day.toordinal(), case_count, HISTORICAL_VARIANTS.split(case_count),
+            rng.binomial(case_count, LWBS_RATE), 0, 0,
+            problems.get('bed_shortage', False), problems.get('doctor_shortage', False),
+        )
+    plan["n_cases"] = plan["case_count"] + plan["n_lwbs"]
+    plan["case_offset"] = np.cumsum(plan["n_cases"]) - plan["n_cases"]
+    return plan
+
+def plan_day(row):
+    return datetime.fromordinal(int(row["ordinal"]))
+
+# --- STEP 1d: SHIFT ROSTER ---
+# Staff work three 8-hour shifts a day (the ArrivalShift boundaries: Day 07-15, Evening 15-23,
+# Night 23-07). Each shift starts HANDOVER_MINUTES before the previous one ends, and nobody
+# works two shifts in a row. Resources in the log are staff on duty at the activity's time;
+# in simulation mode the roster also decides who can take new patients.
+
+SHIFT_START_HOURS = [7, 15, 23]
+SHIFT_HOURS = 8
+HANDOVER_MINUTES = 30
+# Staff per shift as (min, max) for each role (see Docs/process_historical.md)
+SHIFT_STAFFING = {"clerk": (1, 1), "nurse": (5, 7), "doctor": (2, 3), "tech": (1, 2)}
+# Roster span shipped with each day's task: the day itself plus a day of spill past midnight
+ROSTER_WINDOW_MINUTES = 2 * 24 * 60
+# A simulated day whose queue outlasts that span is simulated again with more days of roster
+# (doubling each time), up to this many days past the span
+ROSTER_EXTENSION_MAX_DAYS = 64
+# Problem days shrink the affected pool to this fraction of its normal size (at least one)
+BED_SHORTAGE_FACTOR = 0.3
+DOCTOR_SHORTAGE_FACTOR = 0.5
+
+def shortage_capacity(normal, factor, shortage):
+    return max(1, int(round(normal * factor))) if shortage else normal
+
+def roster_rng(day, site_index=0):
+    """RNG stream for a day's shift staffing, independent of the plan and generation streams."""
+    return np.random.default_rng([RANDOM_SEED, day.toordinal(), 2, site_index])
+
+def staff_shifts(ordinals, site_index, doctor_shortage, previous):
+    """Shifts of consecutive days; `previous` maps each role to its last shift's members and is updated."""
+    shifts = []
+    for ordinal in ordinals:
+        day = datetime.fromordinal(ordinal)
+        rng = roster_rng(day, site_index)
+        midnight = to_epoch_minutes(day)
+        for hour in SHIFT_START_HOURS:
+            start = midnight + 60 * hour - HANDOVER_MINUTES
+            end = midnight + 60 * (hour + SHIFT_HOURS)
+            for role, (low, high) in SHIFT_STAFFING.items():
+                count = int(rng.integers(low, high + 1))
+                if role == "doctor":
+                    count = shortage_capacity(count, DOCTOR_SHORTAGE_FACTOR, doctor_shortage.get(ordinal, False))
+                available = [_RESOURCE_INDEX[name] for name in ROLE_POOLS[role] if _RESOURCE_INDEX[name] not in previous[role]]
+                members = rng.choice(available, min(count, len(available)), replace=False).tolist()
+                shifts.append((role, start, end, members))
+                previous[role] = members
+    return shifts
+
+def build_shift_roster(plan, site_index=0):
+    """Staff every shift from the night before the plan's first day to two days after its last."""
+    if not len(plan):
+        return ShiftRoster([])
+    doctor_shortage = dict(zip(plan["ordinal"].tolist(), plan["doctor_shortage"].tolist()))
+    previous = {role: [] for role in SHIFT_STAFFING}
+    return ShiftRoster(staff_shifts(range(int(plan["ordinal"][0]) - 1, int(plan["ordinal"][-1]) + 3), site_index, doctor_shortage, previous))
+
+def extend_shift_roster(roster, days, site_index=0):
+    """The roster plus the shifts of the `days` days after its last one, staffed as build_shift_roster
+    would staff them (the rotation continues from the roster's last shifts)."""
+    previous = {role: [] for role in SHIFT_STAFFING}
+    for role, _, _, members in roster.shifts:
+        previous[role] = list(members)
+    last_day = from_epoch_minutes(roster.shifts[-1][1] + HANDOVER_MINUTES).toordinal()
+    doctor_shortage = {
+        datetime.strptime(day_str, "%Y-%m-%d").toordinal(): problems.get('doctor_shortage', False)
+        for day_str, problems in PROBLEM_DAYS.items()
+    }
+    return ShiftRoster(roster.shifts + staff_shifts(range(last_day + 1, last_day + 1 + days), site_index, doctor_shortage, previous))
+
+def roster_resources(roster, day, event_activity, event_minute, u):
+    """Vectorized Resource codes: for each event, a member of its role on duty at its time."""
+    resources = np.empty(len(event_activity), dtype=np.int16)
+    minutes = to_epoch_minutes(day) + event_minute.astype(np.int64)
+    for role in ROLE_POOLS:
+        mask = _ACTIVITY_ROLE_CODE[event_activity] == ROLE_CODES[role]
+        if mask.any():
+            resources[mask] = roster.pick(role, minutes[mask], u[mask])
+    return resources
+
+# --- STEP 1e: QUEUEING SIMULATION ENGINE ---
+# Simulation mode keeps the day plan and the batch layout but replaces the fixed templates with a
+# discrete-event simulation (ed_simulation.simulate_day). Patients arrive over the day following
+# an hourly profile, walk their variant's path and wait for beds and on-duty staff; more urgent
+# triage levels are served first. Each day is simulated on its own, starting with an empty ED, so
+# days can still be generated in parallel; patients still in the ED at midnight finish their path.
+
+# Share of a day's arrivals per hour (0-23): quiet nights, a late-morning and an early-evening peak
+ARRIVAL_WEIGHT_BY_HOUR = [
+    2, 1.5, 1.5, 1, 1, 1.5, 2.5, 4, 5.5, 6.5, 7, 7, 6.5, 6, 5.5, 5.5, 6, 6.5, 6.5, 5.5, 4.5, 3.5, 3, 2.5,
+]
+# Activity -> (role, min minutes, max minutes, holds a staff member); roles follow ACTIVITY_ROLE.
+# Activities that hold nobody (lab turnaround, observation, handover to the ward, leaving) only
+# take time.
+SIMULATION_SERVICE = {
+    "Registration": ("clerk", 3, 10, True),
+    "Triage": ("nurse", 5, 15, True),
+    "Bed Assigned": ("nurse", 2, 5, True),
+    "Nurse Assessment": ("nurse", 10, 20, True),
+    "Doctor Examination": ("doctor", 10, 30, True),
+    "Diagnostic Test Ordered": ("doctor", 2, 5, True),
+    "Blood Test Performed": ("tech", 10, 20, True),
+    "Imaging Performed": ("tech", 15, 30, True),
+    "Test Results Available": ("tech", 20, 60, False),
+    "Treatment Administered": ("nurse", 10, 30, True),
+    "Observation": ("nurse", 60, 180, False),
+    "Specialist Consultation": ("doctor", 20, 45, True),
+    "Disposition Decision Recorded": ("doctor", 5, 15, True),
+    "Discharged": ("nurse", 5, 15, True),
+    "Admitted to Hospital": ("nurse", 15, 60, False),
+    "Left Without Being Seen": ("clerk", 5, 30, False),
+}
+_SIMULATION_SERVICE_TABLE = [SIMULATION_SERVICE[name] for name in ACTIVITY_NAMES]
+# Activity code paths per variant code (templated variants, then LWBS variants)
+VARIANT_PATHS = HISTORICAL_VARIANTS.paths
+
+def simulate_day_batch(day, variant_counts, n_lwbs, rng, case_ids, patient_ids, roster, bed_shortage=False, site_index=0):
+    """Simulation mode: one day's cases as a columnar batch, timed by the queueing simulation.
+
+    Staff availability comes from `roster` (doctor shortages are already applied to it); it is
+    extended when the day's queue outlasts it.
+    """
+    n_cases = sum(variant_counts) + n_lwbs
+    attributes = batch_case_attributes(rng, n_cases)
+    variant = np.repeat(np.arange(len(variant_counts), dtype=np.int8), variant_counts)
+    variant = rng.permutation(np.concatenate([variant, (LWBS_VARIANT_CODE + rng.integers(0, HISTORICAL_VARIANTS.n_lwbs_paths, n_lwbs)).astype(np.int8)]))
+    hour_weights = np.array(ARRIVAL_WEIGHT_BY_HOUR) / sum(ARRIVAL_WEIGHT_BY_HOUR)
+    arrivals = np.sort(rng.choice(24, n_cases, p=hour_weights) * 60 + rng.integers(0, 60, n_cases))
+    beds = shortage_capacity(BED_CAPACITY, BED_SHORTAGE_FACTOR, bed_shortage)
+    # The simulation runs on the roster's epoch-minute clock; the batch stores minutes after midnight
+    midnight = to_epoch_minutes(day)
+    paths = [VARIANT_PATHS[v] for v in variant.tolist()]
+    # The simulation's draws do not depend on the roster, so a rerun with a longer roster gives the
+    # result a long enough roster would have given the first time
+    rng_state = rng.bit_generator.state
+    extra_days = 0
+    while True:
+        try:
+            event_case, event_activity, event_minute, event_resource = simulate_day(
+                (midnight + arrivals).tolist(), attributes["Triage"].tolist(), paths,
+                _SIMULATION_SERVICE_TABLE, roster, beds, ACTIVITY_CODES["Bed Assigned"], rng,
+            )
+            break
+        except RosterExhausted:
+            days = max(2, extra_days)
+            if extra_days + days > ROSTER_EXTENSION_MAX_DAYS:
+                raise ValueError(
+                    f"{day:%Y-%m-%d}: patients are still queued {ROSTER_EXTENSION_MAX_DAYS} days after the day's roster "
+                    "ends; add staff (SHIFT_STAFFING) or beds (BED_CAPACITY), or lower LOAD_MULTIPLIER."
+                ) from None
+            roster = extend_shift_roster(roster, days, site_index)
+            extra_days += days
+            rng.bit_generator.state = rng_state
+    event_minute = (event_minute.astype(np.int64) - midnight).astype(np.int32)
+    first_event = np.searchsorted(event_case, np.arange(n_cases))
+    return {
+        "Day": day,
+        "CaseId": list(case_ids),
+        "PatientID": list(patient_ids),
+        "Variant": variant,
+        **attributes,
+        "ArrivalShift": batch_arrival_shift(event_minute[first_event]) if n_cases else np.empty(0, dtype=np.int8),
+        "EventCase": event_case,
+        "EventActivity": event_activity,
+        "EventMinute": event_minute,
+        "EventResource": event_resource,
+    }
+
 # --- STEP 2: MAIN GENERATION LOOP ---
-def main(output_dir=None):
-    print('Starting historical event log generation...')
+def day_rng(day, site_index=0):
+    """Independent, deterministic NumPy RNG stream for one day, derived from RANDOM_SEED and the date."""
+    return np.random.default_rng([RANDOM_SEED, day.toordinal(), 0, site_index])
+
+def iter_batch_day_tasks(plan, case_ids, patient_ids, roster, site_index=0, id_base=0):
+    """Batch mode: yield one generation task per day of the plan.
+
+    `id_base` is the allocator index of the plan's first case, so sites draw disjoint ID blocks.
+    Each task carries the part of the roster the day (and its spill past midnight) can touch.
+    """
+    for row in plan:
+        day = plan_day(row)
+        ids = id_base + np.arange(row["case_offset"], row["case_offset"] + row["n_cases"])
+        variant_counts = tuple(row["variant_counts"].tolist())
+        midnight = to_epoch_minutes(day)
+        day_roster = roster.window(midnight, midnight + ROSTER_WINDOW_MINUTES)
+        yield day, site_index, variant_counts, int(row["n_lwbs"]), case_ids.ids_at(ids), patient_ids.ids_at(ids), bool(row["bed_shortage"]), day_roster
+
+def render_day_batch(task, columnar=False, indent=2, mode="batch"):
+    """Generate one day's batch and serialize it for the writers (runs in worker processes).
+
+    `mode` is "batch" (fixed templates) or "simulation". Returns (per-case JSON texts, CSV text,
+    CSV row count, first and last ActivityTime, and the batch itself when columnar output is
+    requested, else None).
+    """
+    day, site_index, variant_counts, n_lwbs, case_ids, patient_ids, bed_shortage, roster = task
+    rng = day_rng(day, site_index)
+    if mode == "simulation":
+        batch = simulate_day_batch(day, variant_counts, n_lwbs, rng, case_ids, patient_ids, roster, bed_shortage, site_index)
+    else:
+        batch = generate_day_batch(day, variant_counts, n_lwbs, rng, case_ids, patient_ids, roster)
+    minutes = batch["EventMinute"]
+    time_range = format_day_minutes(day, [int(minutes.min()), int(minutes.max())]) if len(minutes) else [None, None]
+    return (
+        serialize_cases_json(batch_to_cases(batch), indent), csv_text(batch_to_csv_rows(batch)), len(minutes),
+        time_range[0], time_range[1], batch if columnar else None,
+    )
+
+def iter_parallel(func, tasks, workers):
+    """Yield func(task) for each task in order, fanning the tasks out over a process pool."""
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        for task in tasks:
+            yield func(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Keep a bounded window of tasks in flight so finished results never pile up in memory
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(func, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+# --- STEP 2b: PARTITIONED (SHARDED) OUTPUT ---
+
+SHARD_DIR_NAME = "year_to_date_shards"
+
+def partition_key(day, partition):
+    if partition == "day":
+        return day.strftime("%Y-%m-%d")
+    if partition == "month":
+        return day.strftime("%Y-%m")
+    raise ValueError(f"Unknown OUTPUT_PARTITION: {partition!r} (expected None, 'day' or 'month')")
+
+def iter_shard_tasks(plans, rosters, partition, shard_dir, case_ids, patient_ids, options):
+    """Yield one shard task per (site, period), in site then date order."""
+    id_base = 0
+    for site_index, (site, plan, roster) in enumerate(zip(HOSPITAL_SITES, plans, rosters)):
+        periods = [partition_key(plan_day(row), partition) for row in plan]
+        start = 0
+        while start < len(plan):
+            end = start
+            while end < len(plan) and periods[end] == periods[start]:
+                end += 1
+            first, last = to_epoch_minutes(plan_day(plan[start])), to_epoch_minutes(plan_day(plan[end - 1]))
+            shard_roster = roster.window(first, last + ROSTER_WINDOW_MINUTES)
+            yield site_index, site, periods[start], plan[start:end], shard_roster, id_base, shard_dir, case_ids, patient_ids, options
+            start = end
+        id_base += int(plan["n_cases"].sum())
+
+def write_shard(task):
+    """Generate and write one shard's CSV/JSON (runs in worker processes); returns its manifest entry."""
+    site_index, site, period, plan, roster, id_base, shard_dir, case_ids, patient_ids, options = task
+    name = f"{site.lower().replace(' ', '_')}_{period}"
+    columnar = options["columnar"]
+    entry = {
+        "site": site, "period": period,
+        "csv": compressed_path(f"{name}.csv", options["compression"]),
+        "json": json_log_path(name, options["json_format"], options["compression"]),
+        "columnar": f"{name}_columnar" if columnar else None,
+        "cases": 0, "rows": 0, "first_activity_time": None, "last_activity_time": None,
+    }
+    level = options["compression_level"]
+    with open_case_json_writer(os.path.join(shard_dir, entry["json"]), indent=options["indent"], compression_level=level) as json_writer, \
+            open_csv_writer(os.path.join(shard_dir, entry["csv"]), compression_level=level, sort=options["csv_sorted"]) as csv_writer, \
+            open_columnar_writer(os.path.join(shard_dir, entry["columnar"]) if columnar else None) as columnar_writer:
+        for day_task in iter_batch_day_tasks(plan, case_ids, patient_ids, roster, site_index, id_base):
+            json_texts, csv_chunk, n_rows, first_time, last_time, batch = render_day_batch(day_task, columnar, json_writer.indent, options["mode"])
+            json_writer.write_serialized(json_texts)
+            csv_writer.write_text(csv_chunk, n_rows)
+            if columnar_writer:
+                write_batch_columns(columnar_writer, batch)
+            if first_time is not None:
+                entry["first_activity_time"] = min(filter(None, [entry["first_activity_time"], first_time]))
+                entry["last_activity_time"] = max(filter(None, [entry["last_activity_time"], last_time]))
+    entry["cases"] = json_writer.cases_written
+    entry["rows"] = csv_writer.rows_written
+    return entry
+
+def write_partitioned_output(plans, rosters, partition, output_dir, case_ids, patient_ids, workers, columnar, mode="batch", inst=None):
+    """Write one shard per site and period (shards are generated in parallel) plus manifest.json."""
+    shard_dir = os.path.join(output_dir, SHARD_DIR_NAME)
+    os.makedirs(shard_dir, exist_ok=True)
+    options = {
+        "columnar": columnar, "indent": JSON_INDENT, "json_format": JSON_FORMAT, "mode": mode,
+        "compression": OUTPUT_COMPRESSION, "compression_level": COMPRESSION_LEVEL, "csv_sorted": CSV_SORTED,
+    }
+    tasks = iter_shard_tasks(plans, rosters, partition, shard_dir, case_ids, patient_ids, options)
+    if inst:
+        inst.watch(shard_dir)
+    shards = []
+    for shard in iter_parallel(write_shard, tasks, workers):
+        shards.append(shard)
+        if inst:
+            inst.count("cases", shard["cases"])
+            inst.count("events", shard["rows"])
+    manifest = {
+        "dataset": "alderaan_year_to_date",
+        "partition": partition,
+        "sites": list(HOSPITAL_SITES),
+        "start_date": START_DATE.strftime("%Y-%m-%d"),
+        "end_date": END_DATE.strftime("%Y-%m-%d"),
+        "total_cases": sum(shard["cases"] for shard in shards),
+        "total_rows": sum(shard["rows"] for shard in shards),
+        "shards": shards,
+    }
+    manifest_path = os.path.join(shard_dir, "manifest.json")
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    if inst:
+        inst.message(f"Saved {len(shards)} shards and manifest to {shard_dir}")
+    return manifest
+
+def iter_per_case_days(plan, case_id_iter, patient_id_iter, roster=None, lwbs_start=0):
+    """Per-case mode: yield each day's list of case dicts, LWBS cases included.
+
+    `lwbs_start` is the number of LWBS cases generated on days before the plan's first day.
+    """
+    lwbs_so_far = lwbs_start
+    for row in plan:
+        current_date = plan_day(row)
+        cases = []
+        for code, count in enumerate(row['variant_counts'].tolist()):
+            for i in range(count):
+                try:
+                    case = generate_variant_case(code, current_date, roster)
+                    case["CaseId"] = next(case_id_iter)
+                    case["PatientID"] = next(patient_id_iter)
+                except StopIteration:
+                    raise ValueError("Ran out of unique IDs. Increase the ID range.")
+                cases.append(add_case_attributes(case))
+        for case in iter_lwbs_cases_for_historical([current_date], int(row['n_lwbs']), start=lwbs_so_far, roster=roster):
+            try:
+                case["CaseId"] = next(case_id_iter)
+                case["PatientID"] = next(patient_id_iter)
+            except StopIteration:
+                raise ValueError("Ran out of unique IDs. Increase the ID range.")
+            cases.append(add_case_attributes(case))
+        lwbs_so_far += int(row['n_lwbs'])
+        yield cases
+
+# --- STEP 2c: INCREMENTAL (CHECKPOINTED) OUTPUT ---
+# Single-file runs leave a checkpoint next to the outputs: the settings it was written with (a
+# digest stands for those that shape the cases), the last generated date, the ID allocator
+# position, the state of the `random` module (per_case mode) and each writer's resume point (byte
+# offset and count; rows and dictionaries for the columnar bundle). Batch and simulation days draw
+# from per-day RNG streams and the plan and roster are rebuilt from START_DATE, so an incremental
+# run only has to cut the outputs back to the checkpoint and append the new days. Uncompressed
+# runs with an unsorted CSV checkpoint after every day, so an interrupted run keeps its progress;
+# otherwise the checkpoint is written once the outputs are closed.
+
+CHECKPOINT_NAME = "alderaan_year_to_date.checkpoint.json"
+
+def generation_digest():
+    """Digest of the settings that shape the generated cases (volumes, problem days, staffing,
+    attributes and simulation timings), so appending runs can refuse a changed configuration."""
+    settings = [
+        BED_CAPACITY, CASE_COUNT_BY_WEEKDAY, LOAD_MULTIPLIER, SEASONAL_FACTOR_BY_MONTH, PARTIAL_DAYS,
+        PROBLEM_DAYS, BED_SHORTAGE_FACTOR, DOCTOR_SHORTAGE_FACTOR, ROLE_POOLS, NP_PA, ACTIVITY_ROLE,
+        SHIFT_START_HOURS, SHIFT_HOURS, HANDOVER_MINUTES, SHIFT_STAFFING, ARRIVAL_WEIGHT_BY_HOUR,
+        SIMULATION_SERVICE, SEX_WEIGHTS, MODE_OF_ARRIVAL_WEIGHTS, VISIT_TYPE_WEIGHTS, TRIAGE_WEIGHTS,
+    ]
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+
+def checkpoint_config(mode, columnar):
+    """Settings that must match between the checkpointed run and the run appending to it."""
+    return {
+        "start_date": START_DATE.strftime("%Y-%m-%d"), "random_seed": RANDOM_SEED, "mode": mode,
+        "sites": list(HOSPITAL_SITES), "json_format": JSON_FORMAT, "json_indent": JSON_INDENT,
+        "compression": OUTPUT_COMPRESSION, "columnar": columnar, "csv_sorted": CSV_SORTED,
+        "variants": HISTORICAL_VARIANTS.digest, "generation": generation_digest(),
+    }
+
+def load_checkpoint(path, config):
+    """The checkpoint at `path`, or None if there is none; raises if it was written with other settings."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint["config"] != config:
+        raise ValueError(f"{path} was written with different settings; delete it or run without INCREMENTAL.")
+    return checkpoint
+
+def save_checkpoint(path, config, row, writers):
+    """Record that everything up to plan row `row` is written; `writers` maps output names to writers."""
+    state = random.getstate()
+    checkpoint = {
+        "config": config,
+        "last_date": plan_day(row).strftime("%Y-%m-%d"),
+        "id_position": int(row["case_offset"] + row["n_cases"]),
+        "random_state": [state[0], list(state[1]), state[2]] if config["mode"] == "per_case" else None,
+        "outputs": {name: writer.resume_point() for name, writer in writers.items()},
+    }
+    # Write-then-rename, so a crash never leaves a half-written checkpoint behind
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+def resume_row(plan, checkpoint):
+    """Index of the first plan row after the checkpoint's last date."""
+    last = datetime.strptime(checkpoint["last_date"], "%Y-%m-%d").toordinal()
+    start = int(np.searchsorted(plan["ordinal"], last, side="right"))
+    if start and int(plan["case_offset"][start - 1] + plan["n_cases"][start - 1]) != checkpoint["id_position"]:
+        raise ValueError("The day plan no longer matches the checkpoint; regenerate without INCREMENTAL.")
+    return start
+
+def write_single_file_output(plan, roster, output_dir, case_ids, patient_ids, workers, columnar, mode, incremental, checkpointing, inst):
+    """Write alderaan_year_to_date.csv/json (and the columnar bundle), appending after the checkpoint if incremental."""
+    # Each day's cases flow straight into the incremental JSON and CSV writers
+    json_path = json_log_path(os.path.join(output_dir, "alderaan_year_to_date"), JSON_FORMAT, OUTPUT_COMPRESSION)
+    csv_path = compressed_path(os.path.join(output_dir, "alderaan_year_to_date.csv"), OUTPUT_COMPRESSION)
+    columnar_path = os.path.join(output_dir, "alderaan_year_to_date_columnar")
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_NAME)
+    config = checkpoint_config(mode, columnar)
+    checkpoint = load_checkpoint(checkpoint_path, config) if incremental else None
+    if checkpoint is None and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)  # a full run invalidates the previous checkpoint
+    resume = checkpoint["outputs"] if checkpoint else {}
+    start = resume_row(plan, checkpoint) if checkpoint else 0
+    if start == len(plan) and checkpoint:
+        inst.message(f"Outputs are up to date (last generated day: {checkpoint['last_date']}).")
+        return {"cases": resume["json"]["count"], "events": resume["csv"]["count"]}
+    if checkpoint:
+        inst.message(f"Appending {len(plan) - start} days after {checkpoint['last_date']} to the existing outputs")
+        if checkpoint["random_state"]:
+            version, internal_state, gauss_next = checkpoint["random_state"]
+            random.setstate((version, tuple(internal_state), gauss_next))
+        case_ids.position = patient_ids.position = checkpoint["id_position"]
+    rows = plan[start:]
+    inst.expect("cases", int(rows["n_cases"].sum()))
+    # A sorted CSV is only complete once it is closed
+    checkpoint_daily = checkpointing and not OUTPUT_COMPRESSION and not CSV_SORTED
+    with inst.phase("generate"), \
+            open_case_json_writer(json_path, indent=JSON_INDENT, compression_level=COMPRESSION_LEVEL, resume=resume.get("json")) as json_writer, \
+            open_csv_writer(csv_path, compression_level=COMPRESSION_LEVEL, resume=resume.get("csv")) as csv_writer, \
+            open_columnar_writer(columnar_path if columnar else None, resume=resume.get("columnar")) as columnar_writer:
+        inst.watch(json_path)
+        inst.watch(csv_path)
+        if columnar:
+            # A full run replaces the bundle's .npy files only when it closes
+            inst.watch(columnar_path, None if checkpoint else 0)
+        writers = {"json": json_writer, "csv": csv_writer}
+        if columnar_writer:
+            writers["columnar"] = columnar_writer
+        if mode != "per_case":
+            tasks = iter_batch_day_tasks(rows, case_ids, patient_ids, roster)
+            render = partial(render_day_batch, columnar=columnar, indent=json_writer.indent, mode=mode)
+            for row, (json_texts, csv_chunk, n_rows, _, _, batch) in zip(rows, iter_parallel(render, tasks, workers)):
+                with inst.phase("write"):
+                    json_writer.write_serialized(json_texts)
+                    csv_writer.write_text(csv_chunk, n_rows)
+                    if columnar_writer:
+                        write_batch_columns(columnar_writer, batch)
+                if checkpoint_daily:
+                    with inst.phase("checkpoint"):
+                        save_checkpoint(checkpoint_path, config, row, writers)
+                inst.count("cases", len(json_texts))
+                inst.count("events", n_rows)
+        else:
+            lwbs_start = int(plan["n_lwbs"][:start].sum())
+            for row, cases in zip(rows, iter_per_case_days(rows, case_ids, patient_ids, roster, lwbs_start)):
+                with inst.phase("write"):
+                    json_writer.write_cases(cases)
+                    csv_writer.write_cases(cases)
+                    if columnar_writer:
+                        columnar_writer.write_cases(cases)
+                if checkpoint_daily:
+                    with inst.phase("checkpoint"):
+                        save_checkpoint(checkpoint_path, config, row, writers)
+                inst.count("cases", len(cases))
+                inst.count("events", sum(len(case["activities"]) for case in cases))
+    with inst.phase("finish"):
+        if checkpointing and len(rows):
+            save_checkpoint(checkpoint_path, config, rows[-1], writers)
+    inst.message(f"Saved all cases to {json_path}")
+    inst.message(f"Saved all cases to {csv_path}")
+    if columnar_writer:
+        inst.message(f"Saved all cases to {columnar_path}")
+    return {"cases": json_writer.cases_written, "events": csv_writer.rows_written}
+
+def main(output_dir=None, mode=None, workers=None, partition=None, columnar=None, incremental=None, instrumentation=None):
+    """Generate the year-to-date log; returns {"cases", "events"} written in total (appended ones included)."""
+    if mode is None:
+        mode = GENERATION_MODE
+    if workers is None:
+        workers = PARALLEL_WORKERS
+    if partition is None:
+        partition = OUTPUT_PARTITION
+    if columnar is None:
+        columnar = COLUMNAR_EXPORT
+    if incremental is None:
+        incremental = INCREMENTAL
+    if mode not in ("batch", "simulation", "per_case"):
+        raise ValueError(f"Unknown GENERATION_MODE: {mode!r} (expected 'batch', 'simulation' or 'per_case')")
+    if mode == "per_case" and (workers != 1 or partition):
+        raise ValueError("Parallel and partitioned generation require GENERATION_MODE = 'batch' or 'simulation'.")
+    if len(HOSPITAL_SITES) > 1 and not partition:
+        raise ValueError("Multiple HOSPITAL_SITES require OUTPUT_PARTITION = 'day' or 'month'.")
+    if incremental and partition:
+        raise ValueError("INCREMENTAL runs append to the single-file outputs; set OUTPUT_PARTITION = None.")
+    if incremental and CSV_SORTED:
+        raise ValueError("INCREMENTAL runs append to the CSV in generation order; set CSV_SORTED = False.")
+    # A gzip/zstd JSON document cannot be cut back to before its closing brackets
+    checkpointing = not partition and not (OUTPUT_COMPRESSION and JSON_FORMAT == "json")
+    if incremental and not checkpointing:
+        raise ValueError("INCREMENTAL runs with OUTPUT_COMPRESSION require JSON_FORMAT = 'ndjson'.")
     # Ensure output directory is src/Output relative to this script
     if output_dir is None:
         script_dir = os.path.dirname(os.path.abspath(__file__))
         output_dir = os.path.join(script_dir, 'Output')
     os.makedirs(output_dir, exist_ok=True)
-    current_date = START_DATE
-    all_cases = []
-    all_days = []
-    # First, determine total number of cases needed
-    print('Counting total number of cases...')
-    total_case_count = 0
-    temp_date = START_DATE
-    while temp_date <= END_DATE:
-        day_str = temp_date.strftime("%Y-%m-%d")
-        month = temp_date.month
-        seasonal_factor = 1.0
-        if month in [1, 2]:
-            seasonal_factor = 1.10
-        elif month in [3, 4]:
-            seasonal_factor = 0.95
-        noise = random.uniform(-0.08, 0.08)
-        base_count = 100 * seasonal_factor
-        case_count = int(round(base_count * (1 + noise)))
-        if day_str == "2025-05-04":
-            case_count = int(round(case_count * 14 / 24))
-        total_case_count += case_count
-        temp_date += timedelta(days=1)
-    # Add LWBS cases (~2% of total)
-    lwbs_n = max(1, round(0.02 * total_case_count))
-    total_case_count += lwbs_n
-    print(f'Total number of cases to generate: {total_case_count}')
-    SAFETY_MARGIN = 2
-    print('Generating unique CaseIds...')
-    unique_case_ids = generate_unique_ids("ED", total_case_count * SAFETY_MARGIN, 100000, 9999999)
-    print('Generating unique PatientIDs...')
-    unique_patient_ids = generate_unique_ids("P", total_case_count * SAFETY_MARGIN, 1000, 999999)
-    print('Unique IDs generated. Beginning per-day case generation...')
-    case_id_iter = iter(unique_case_ids)
-    patient_id_iter = iter(unique_patient_ids)
-    # Now generate cases as before, but assign unique IDs
-    current_date = START_DATE
-    while current_date <= END_DATE:
-        all_days.append(current_date)
-        day_str = current_date.strftime("%Y-%m-%d")
-        month = current_date.month
-        seasonal_factor = 1.0
-        if month in [1, 2]:
-            seasonal_factor = 1.10
-        elif month in [3, 4]:
-            seasonal_factor = 0.95
-        noise = random.uniform(-0.08, 0.08)
-        base_count = 100 * seasonal_factor
-        case_count = int(round(base_count * (1 + noise)))
-        if day_str == "2025-05-04":
-            case_count = int(round(case_count * 14 / 24))
-        n_admitted = int(round(case_count * 0.17))
-        n_discharged = case_count - n_admitted
-        print(f"Generating {case_count} cases for {day_str} (admitted: {n_admitted}, discharged: {n_discharged})")
-        simple_discharge_cases = []
-        for _ in range(n_discharged):
-            try:
-                case = generate_simple_discharge(current_date, None, None)
-                case["CaseId"] = next(case_id_iter)
-                case["PatientID"] = next(patient_id_iter)
-            except StopIteration:
-                print("ERROR: Ran out of unique IDs. Increase the SAFETY_MARGIN or ID range.")
-                raise
-            case = add_case_attributes(case)
-            simple_discharge_cases.append(case)
-            if (len(simple_discharge_cases)) % 100 == 0:
-                print(f'  Created {len(simple_discharge_cases)} simple discharge cases...')
-        print('Generating discharge with tests cases...')
-        discharge_with_tests_cases = []
-        for _ in range(n_discharged):
-            try:
-                case = generate_discharge_with_tests(current_date, None, None)
-                case["CaseId"] = next(case_id_iter)
-                case["PatientID"] = next(patient_id_iter)
-            except StopIteration:
-                print("ERROR: Ran out of unique IDs. Increase the SAFETY_MARGIN or ID range.")
-                raise
-            case = add_case_attributes(case)
-            discharge_with_tests_cases.append(case)
-            if (len(discharge_with_tests_cases)) % 100 == 0:
-                print(f'  Created {len(discharge_with_tests_cases)} discharge with tests cases...')
-        print('Generating admission after observation cases...')
-        admission_after_observation_cases = []
-        for _ in range(n_admitted):
-            try:
-                case = generate_admission_after_observation(current_date, None, None)
-                case["CaseId"] = next(case_id_iter)
-                case["PatientID"] = next(patient_id_iter)
-            except StopIteration:
-                print("ERROR: Ran out of unique IDs. Increase the SAFETY_MARGIN or ID range.")
-                raise
-            case = add_case_attributes(case)
-            admission_after_observation_cases.append(case)
-            if (len(admission_after_observation_cases)) % 100 == 0:
-                print(f'  Created {len(admission_after_observation_cases)} admission after observation cases...')
-        print('Assembling all cases...')
-        cases = simple_discharge_cases + discharge_with_tests_cases + admission_after_observation_cases
-        print(f'Total cases generated for {day_str}: {len(cases)}')
-        all_cases.extend(cases)
-        current_date += timedelta(days=1)
-    # Add LWBS cases at ~2% of total cases
-    lwbs_cases = generate_lwbs_cases_for_historical(all_days, lwbs_n)
-    for case in lwbs_cases:
-        try:
-            case["CaseId"] = next(case_id_iter)
-            case["PatientID"] = next(patient_id_iter)
-        except StopIteration:
-            print("ERROR: Ran out of unique IDs. Increase the SAFETY_MARGIN or ID range.")
-            raise
-        case = add_case_attributes(case)
-    all_cases.extend(lwbs_cases)
-    print('Historical event log generation complete.')
-    # Save all cases to a single JSON and CSV file
-    save_all_cases_json(all_cases, output_dir)
-    save_all_cases_csv(all_cases, output_dir)
+    with Instrumentation("historical_event_log", INSTRUMENTATION if instrumentation is None else instrumentation) as inst:
+        with inst.phase("plan"):
+            plans = [build_day_plan(site_index=site_index) for site_index in range(len(HOSPITAL_SITES))]
+        with inst.phase("roster"):
+            rosters = [build_shift_roster(plan, site_index) for site_index, plan in enumerate(plans)]
+        total_case_count = sum(int(p["n_cases"].sum()) for p in plans)
+        inst.message(f'Total number of cases in the plan: {total_case_count} over {len(plans[0])} days')
+        # IDs come from keyed permutations of the ID ranges: unique, constant memory, no upfront shuffle
+        case_ids = UniqueIdAllocator("ED", 100000, 9999999, key=[RANDOM_SEED, 1])
+        patient_ids = UniqueIdAllocator("P", 1000, 999999, key=[RANDOM_SEED, 2])
+        if total_case_count > min(case_ids.size, patient_ids.size):
+            raise ValueError("Not enough unique IDs in the specified range.")
+        if partition:
+            inst.expect("cases", total_case_count)
+            with inst.phase("generate"):
+                manifest = write_partitioned_output(plans, rosters, partition, output_dir, case_ids, patient_ids, workers, columnar, mode, inst)
+            return {"cases": manifest["total_cases"], "events": manifest["total_rows"]}
+        return write_single_file_output(
+            plans[0], rosters[0], output_dir, case_ids, patient_ids, workers, columnar, mode, incremental, checkpointing, inst,
+        )
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main(incremental=True if "--incremental" in sys.argv[1:] else None)
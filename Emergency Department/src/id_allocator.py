@@ -0,0 +1,74 @@
+import numpy as np
+
+# Unique pseudo-random ID allocation in constant memory. The n-th ID is the image of n under a
+# keyed bijective permutation of the ID range (a small Feistel network with cycle walking), so
+# IDs never repeat, nothing has to be materialized or shuffled up front, and the allocator's
+# whole state is the number of IDs drawn so far.
+
+FEISTEL_ROUNDS = 4
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+class UniqueIdAllocator:
+    """Yields unique IDs f"{prefix}{n}" with n drawn without replacement from [min_val, max_val]."""
+
+    def __init__(self, prefix, min_val, max_val, key, position=0):
+        if max_val < min_val:
+            raise ValueError("Empty ID range.")
+        self.prefix = prefix
+        self.min_val = min_val
+        self.max_val = max_val
+        self.size = max_val - min_val + 1
+        self.key = key
+        self.position = position
+        bits = max(2, (self.size - 1).bit_length())
+        bits += bits % 2
+        if bits > 64:
+            raise ValueError("ID range too large for the allocator (more than 2**64 values).")
+        self._half_bits = np.uint64(bits // 2)
+        self._half_mask = np.uint64((1 << (bits // 2)) - 1)
+        self._round_keys = np.random.SeedSequence(key).generate_state(FEISTEL_ROUNDS, np.uint64)
+
+    def _round(self, right, round_key):
+        # High bits of a multiplicative hash of (right + key); uint64 arithmetic wraps by design
+        return ((right + round_key) * _HASH_MULTIPLIER) >> (np.uint64(64) - self._half_bits)
+
+    def _permute(self, values):
+        left = values >> self._half_bits
+        right = values & self._half_mask
+        for round_key in self._round_keys:
+            left, right = right, left ^ (self._round(right, round_key) & self._half_mask)
+        return (left << self._half_bits) | right
+
+    def numbers_at(self, indices):
+        """Numeric IDs for the given draw indices (vectorized)."""
+        indices = np.asarray(indices, dtype=np.uint64)
+        if indices.size and int(indices.max()) >= self.size:
+            raise ValueError("Not enough unique IDs in the specified range.")
+        values = self._permute(indices)
+        # Cycle walking: re-permute values that fall outside the range until they land inside it
+        outside = values >= self.size
+        while outside.any():
+            values[outside] = self._permute(values[outside])
+            outside = values >= self.size
+        return values + np.uint64(self.min_val)
+
+    def ids_at(self, indices):
+        return [f"{self.prefix}{n}" for n in self.numbers_at(indices).tolist()]
+
+    def take(self, n):
+        """Draw the next n IDs."""
+        ids = self.ids_at(np.arange(self.position, self.position + n, dtype=np.uint64))
+        self.position += n
+        return ids
+
+    @property
+    def remaining(self):
+        return self.size - self.position
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.position >= self.size:
+            raise StopIteration
+        return self.take(1)[0]
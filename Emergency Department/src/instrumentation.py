@@ -0,0 +1,186 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Progress and timing instrumentation for the generators and upload scripts. A run is split into
+# named phases (timed; they can nest), counters accumulate cases, events and bytes written, and a
+# report goes out at most every REPORT_INTERVAL seconds instead of a print per day or per case.
+#
+# Modes: "quiet" reports nothing, "progress" keeps a one-line progress bar with rates on stderr,
+# "jsonl" appends one JSON object per top-level phase, per report and a final summary to a metrics
+# file. Child processes started by the upload scripts inherit the mode and metrics file through
+# the ED_INSTRUMENTATION and ED_METRICS_PATH environment variables.
+
+MODES = ("quiet", "progress", "jsonl")
+DEFAULT_MODE = "progress"
+REPORT_INTERVAL = 1.0  # seconds between reports
+DEFAULT_METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Output", "metrics.jsonl")
+BAR_WIDTH = 24
+
+def resolve_mode(mode=None):
+    """`mode`, else $ED_INSTRUMENTATION, else DEFAULT_MODE."""
+    mode = mode or os.environ.get("ED_INSTRUMENTATION") or DEFAULT_MODE
+    if mode not in MODES:
+        raise ValueError(f"Unknown instrumentation mode: {mode!r} (expected one of {', '.join(MODES)})")
+    return mode
+
+def resolve_metrics_path(path=None):
+    return path or os.environ.get("ED_METRICS_PATH") or DEFAULT_METRICS_PATH
+
+def _size(path):
+    # Bytes on disk for a file, or for every file under a directory (columnar bundles)
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def _human_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+class Instrumentation:
+    """Phase timers, counters and periodic reports for one run (see the module comment for modes)."""
+
+    def __init__(self, run, mode=None, metrics_path=None, interval=REPORT_INTERVAL, stream=None):
+        self.run = run
+        self.mode = resolve_mode(mode)
+        self.metrics_path = resolve_metrics_path(metrics_path)
+        self.interval = interval
+        self.counters = {}
+        self.expected = {}
+        self.phases = {}
+        self._phase_stack = []
+        self._watched = {}
+        self._stream = stream or sys.stderr
+        self._tty = self._stream.isatty()
+        self._bar_shown = False
+        self._started = time.perf_counter()
+        self._last_report = self._started
+        self._metrics = None
+        if self.mode == "jsonl":
+            os.makedirs(os.path.dirname(os.path.abspath(self.metrics_path)), exist_ok=True)
+            self._metrics = open(self.metrics_path, "a")
+            self._emit("start")
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block; time is added to the phase's total each time it runs."""
+        self._phase_stack.append(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self._phase_stack.pop()
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+            if not self._phase_stack:
+                self._emit("phase", phase=name, seconds=round(seconds, 4))
+
+    def expect(self, name, total):
+        """Announce the final value of a counter, for the progress bar and ETA."""
+        self.expected[name] = total
+
+    def watch(self, path, baseline=None):
+        """Count bytes written to an output file or directory (sampled at each report).
+
+        Bytes already there are not counted, unless `baseline` gives the size to count from.
+        """
+        self._watched[path] = _size(path) if baseline is None else baseline
+
+    def child_env(self):
+        """Environment for a child process that should report the same way (and to the same file)."""
+        return {**os.environ, "ED_INSTRUMENTATION": self.mode, "ED_METRICS_PATH": self.metrics_path}
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+        if time.perf_counter() - self._last_report >= self.interval:
+            self.report()
+
+    def message(self, text):
+        """A one-off status line (shown above the progress bar, recorded in jsonl mode)."""
+        if self.mode == "progress":
+            self._clear_bar()
+            print(text, file=self._stream, flush=True)
+        elif self.mode == "jsonl":
+            self._emit("message", message=text)
+
+    def snapshot(self):
+        if self._watched:
+            self.counters["bytes_written"] = sum(max(0, _size(path) - base) for path, base in self._watched.items())
+        elapsed = self.elapsed
+        return {
+            "elapsed": round(elapsed, 3),
+            "counters": dict(self.counters),
+            "rates": {name: round(value / elapsed, 1) for name, value in self.counters.items()} if elapsed else {},
+        }
+
+    def report(self):
+        self._last_report = time.perf_counter()
+        if self.mode == "progress":
+            self._draw_bar(self.snapshot())
+        elif self.mode == "jsonl":
+            self._emit("progress", **self.snapshot())
+
+    def close(self):
+        summary = {**self.snapshot(), "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()}}
+        if self.mode == "progress":
+            self._draw_bar(summary)
+            self._clear_bar(keep=True)
+            phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in summary["phases"].items())
+            print(f"{self.run}: done in {summary['elapsed']:.2f}s ({phases})", file=self._stream, flush=True)
+        elif self.mode == "jsonl":
+            self._emit("summary", **summary)
+            self._metrics.close()
+            self._metrics = None
+        return summary
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _emit(self, event, **fields):
+        if self._metrics is None:
+            return
+        record = {"run": self.run, "event": event, "time": round(time.time(), 3), **fields}
+        self._metrics.write(json.dumps(record) + "\n")
+        self._metrics.flush()  # child processes append to the same file
+
+    def _draw_bar(self, snapshot):
+        counters, rates = snapshot["counters"], snapshot["rates"]
+        parts = [self.run]
+        primary = next(iter(self.expected), None)
+        if primary:
+            done, total = counters.get(primary, 0), self.expected[primary]
+            fraction = min(1.0, done / total) if total else 1.0
+            filled = int(round(fraction * BAR_WIDTH))
+            parts.append(f"[{'#' * filled}{'-' * (BAR_WIDTH - filled)}] {fraction:4.0%} {done:,}/{total:,} {primary}")
+            if rates.get(primary) and done < total:
+                parts.append(f"ETA {(total - done) / rates[primary]:.0f}s")
+        for name, value in counters.items():
+            if name == "bytes_written":
+                parts.append(_human_bytes(value))
+            elif name != primary:
+                parts.append(f"{value:,} {name}")
+        parts.extend(f"{rate:,.0f} {name}/s" for name, rate in rates.items() if name != "bytes_written")
+        parts.append(f"{snapshot['elapsed']:.1f}s")
+        line = "  ".join(parts)
+        if self._tty:
+            self._stream.write("\r\033[K" + line)
+            self._bar_shown = True
+        else:
+            self._stream.write(line + "\n")
+        self._stream.flush()
+
+    def _clear_bar(self, keep=False):
+        if self._bar_shown:
+            self._stream.write("\n" if keep else "\r\033[K")
+            self._bar_shown = False
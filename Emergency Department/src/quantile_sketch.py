@@ -0,0 +1,82 @@
+import math
+import random
+
+# Mergeable quantile sketch (KLL: Karnin, Lang and Liberty, "Optimal Quantile Approximation in
+# Streams", 2016). Values enter a stack of compactors; a full compactor sorts its items and
+# promotes every other one (a random half) to the level above, where each item stands for twice
+# as many values. Capacities shrink geometrically towards the lower levels, so the sketch holds
+# O(k log(n / k)) items whatever the stream length, and the rank error of a quantile is about
+# 1.7 / k of n. Two sketches merge level by level, so partial sketches from shards or worker
+# processes combine into one with the same guarantee.
+
+KLL_K = 200  # accuracy parameter: items kept by the top compactor
+_CAPACITY_DECAY = 2 / 3
+
+class KLLSketch:
+    """Streaming quantiles of a sequence of numbers in bounded memory; see the module comment."""
+
+    def __init__(self, k=KLL_K, seed=0):
+        self.k = k
+        self.n = 0
+        self.compactors = [[]]
+        # Seeded coin flips, so a given stream always gives the same sketch
+        self._rng = random.Random(seed)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * _CAPACITY_DECAY ** depth)))
+
+    def _size(self):
+        return sum(len(items) for items in self.compactors)
+
+    def _max_size(self):
+        return sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def update(self, value):
+        self.compactors[0].append(value)
+        self.n += 1
+        if len(self.compactors[0]) >= self._capacity(0):
+            self._compress()
+
+    def update_many(self, values):
+        """Add a batch of values; the same as merging a sketch that holds them all at the bottom level."""
+        items = list(values)
+        self.compactors[0].extend(items)
+        self.n += len(items)
+        self._compress()
+
+    def _compress(self):
+        while self._size() >= self._max_size():
+            for level, items in enumerate(self.compactors):
+                if len(items) >= self._capacity(level):
+                    if level + 1 == len(self.compactors):
+                        self.compactors.append([])
+                    items.sort()
+                    # An odd item out stays at this level; the rest is halved into the next one
+                    keep = [items.pop()] if len(items) % 2 else []
+                    self.compactors[level + 1].extend(items[self._rng.random() < 0.5::2])
+                    self.compactors[level] = keep
+                    break
+
+    def merge(self, other):
+        """Add another sketch's values to this one (the other sketch is left unchanged)."""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1); None for an empty sketch."""
+        if not self.n:
+            return None
+        weighted = sorted((value, 1 << level) for level, items in enumerate(self.compactors) for value in items)
+        target = q * sum(weight for _, weight in weighted)
+        cumulative = 0
+        for value, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return weighted[-1][0]
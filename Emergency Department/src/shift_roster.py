@@ -0,0 +1,75 @@
+import bisect
+from collections import defaultdict
+import numpy as np
+
+# Staff calendars for the generators. A roster is a list of shifts (role, start, end, members),
+# with times in epoch minutes and members as resource codes. Each role's timeline is cut at every
+# shift start and end into segments with a fixed on-duty set, so "who is on duty for role r at
+# minute t" is one binary search over the segment starts, however many years the roster covers.
+
+class ShiftRoster:
+    """Interval index over staff shifts; build once, then query on_duty / pick / changes."""
+
+    def __init__(self, shifts):
+        self.shifts = sorted(shifts, key=lambda shift: (shift[1], shift[2], shift[0]))
+        self._shift_starts = [shift[1] for shift in self.shifts]
+        self._longest_shift = max((end - start for _, start, end, _ in self.shifts), default=0)
+        by_role = defaultdict(list)
+        for role, start, end, members in self.shifts:
+            by_role[role].append((start, end, tuple(members)))
+        self._starts = {}
+        self._on_duty = {}
+        self._table = {}
+        for role, role_shifts in by_role.items():
+            boundaries = sorted({t for start, end, _ in role_shifts for t in (start, end)})
+            segments = []
+            active = []
+            next_shift = 0
+            for t in boundaries:
+                # Shifts are sorted by start; drop the ended ones, then add the ones starting at t
+                active = [shift for shift in active if shift[1] > t]
+                while next_shift < len(role_shifts) and role_shifts[next_shift][0] <= t:
+                    if role_shifts[next_shift][1] > t:
+                        active.append(role_shifts[next_shift])
+                    next_shift += 1
+                segments.append(tuple(dict.fromkeys(m for shift in active for m in shift[2])))
+            self._starts[role] = boundaries
+            self._on_duty[role] = segments
+            # Padded member table for vectorized picks; column 0 of each row holds the count
+            width = max((len(s) for s in segments), default=0)
+            table = np.zeros((len(segments) + 1, width + 1), dtype=np.int64)
+            for i, members in enumerate(segments):
+                table[i, 0] = len(members)
+                table[i, 1:len(members) + 1] = members
+            self._table[role] = table  # the extra last row (count 0) stands for "before the roster"
+
+    @property
+    def roles(self):
+        return list(self._starts)
+
+    def on_duty(self, role, minute):
+        """Members of `role` on duty at `minute` (a tuple, empty outside the roster)."""
+        i = bisect.bisect_right(self._starts.get(role, []), minute) - 1
+        return self._on_duty[role][i] if i >= 0 else ()
+
+    def changes(self, role, start=None, end=None):
+        """Minutes in [start, end) at which the on-duty set of `role` changes."""
+        starts = self._starts.get(role, [])
+        lo = 0 if start is None else bisect.bisect_left(starts, start)
+        hi = len(starts) if end is None else bisect.bisect_left(starts, end)
+        return starts[lo:hi]
+
+    def pick(self, role, minutes, u):
+        """Vectorized: for each minute, the on-duty member at position floor(u * on-duty count)."""
+        table = self._table[role]
+        segment = np.searchsorted(self._starts[role], minutes, side="right") - 1  # -1 selects the empty last row
+        count = table[segment, 0]
+        if (count == 0).any():
+            raise ValueError(f"No {role} on duty at some of the requested times.")
+        return table[segment, 1 + (np.asarray(u) * count).astype(np.int64)]
+
+    def window(self, start, end):
+        """A roster holding only the shifts that overlap [start, end) (e.g. to ship one day to a worker)."""
+        lo = bisect.bisect_left(self._shift_starts, start - self._longest_shift)
+        hi = bisect.bisect_left(self._shift_starts, end)
+        return ShiftRoster([shift for shift in self.shifts[lo:hi] if shift[2] > start])
@@ -0,0 +1,397 @@
+import argparse
+import csv
+import io
+import os
+import time
+import numpy as np
+from event_log_io import CSV_FIELDNAMES, load_columnar, open_binary_input, open_text_input, parse_epoch_seconds
+
+# Columnar stage-duration statistics. The event log is loaded as three typed arrays (case code,
+# activity code and epoch-second time per event), either straight from a columnar .npy bundle or
+# by parsing the CSV block by block with NumPy, and every stage's durations come out of one
+# group-by over (case, activity): a stable sort keeps each case's events in file order, so the
+# first and last row of each group are the activity's first and last occurrence in the case.
+# The report is the one historical_event_log_stats.py prints from the JSON log.
+#
+# The CSV parser relies on the first three columns (CaseId, ActivityName, ActivityTime) never
+# being quoted and the times being 'YYYY-MM-DD HH:MM:SS', which is how the generators write them;
+# a block that breaks this falls back to the csv module.
+
+CSV_BLOCK_BYTES = 64 * 1024 * 1024  # CSV bytes parsed per NumPy pass
+
+# --- Stage Definitions and Thresholds ---
+STAGES = [
+    {
+        "name": "Waiting for Triage",
+        "from": "Registration",
+        "to": "Triage",
+        "fast": 5,
+        "warning": 15,
+        "critical": 45
+    },
+    {
+        "name": "Waiting for Bed",
+        "from": "Triage",
+        "to": "Bed Assigned",
+        "fast": 7,
+        "warning": 20,
+        "critical": 60
+    },
+    {
+        "name": "Waiting for Nurse Assessment",
+        "from": "Bed Assigned",
+        "to": "Nurse Assessment",
+        "fast": 3,
+        "warning": 10,
+        "critical": 30
+    },
+    {
+        "name": "Waiting for Doctor",
+        "from": "Nurse Assessment",
+        "to": "Doctor Examination",
+        "fast": 10,
+        "warning": 30,
+        "critical": 90
+    },
+    {
+        "name": "Waiting for Test Results",
+        "from": "Diagnostic Test Ordered",
+        "to": "Test Results Available",
+        "fast": 20,
+        "warning": 60,
+        "critical": 180
+    },
+    {
+        "name": "Waiting for Treatment",
+        "from": "Test Results Available",
+        "to": "Treatment Administered",
+        "fast": 5,
+        "warning": 15,
+        "critical": 45
+    },
+    {
+        "name": "Waiting for Specialist Consultation",
+        "from": "Doctor Examination",
+        "to": "Specialist Consultation",
+        "fast": 20,
+        "warning": 60,
+        "critical": 180
+    },
+    {
+        "name": "Waiting for Discharge",
+        "from": "Treatment Administered",
+        "to": "Disposition Decision Recorded",
+        "fast": 5,
+        "warning": 15,
+        "critical": 45
+    },
+    {
+        "name": "Total Case Duration",
+        "from": "Registration",
+        "to": ["Discharged", "Admitted to Hospital"],
+        "fast": 60,
+        "warning": 180,
+        "critical": 300
+    }
+]
+
+def sla_bucket_counts(stage, arr):
+    """(fast, on target, warning, critical) counts of a duration array against the stage's thresholds."""
+    fast, warning, critical = stage['fast'], stage['warning'], stage['critical']
+    return (
+        int(np.sum(arr <= fast)),
+        int(np.sum((arr > fast) & (arr <= warning))),
+        int(np.sum((arr > warning) & (arr <= critical))),
+        int(np.sum(arr > critical)),
+    )
+
+def print_stage_report(stage, n, mean, median, p90, std, buckets):
+    if n == 0:
+        print(f"\n{stage['name']}: No data.")
+        return
+    n_fast, n_on_target, n_warning, n_critical = buckets
+    print(f"\n=== {stage['name']} ===")
+    print(f"SLA thresholds: Fast ≤ {stage['fast']} min, Warning ≤ {stage['warning']} min, Critical > {stage['critical']} min")
+    print(f"Cases: {n}")
+    print(f"  Mean: {mean:.1f} min | Median: {median:.1f} min | 90th percentile: {p90:.1f} min | Std: {std:.1f} min")
+    print(f"  Fast: {n_fast} ({n_fast/n*100:.1f}%) | On Target: {n_on_target} ({n_on_target/n*100:.1f}%) | Warning: {n_warning} ({n_warning/n*100:.1f}%) | Critical: {n_critical} ({n_critical/n*100:.1f}%)")
+
+def print_stage_stats(stage, durations):
+    arr = np.array(durations)
+    if len(arr) == 0:
+        print_stage_report(stage, 0, None, None, None, None, None)
+        return
+    print_stage_report(stage, len(arr), np.mean(arr), np.median(arr), np.percentile(arr, 90), np.std(arr), sla_bucket_counts(stage, arr))
+
+# --- PER-CASE DURATIONS ---
+
+def case_activity_index(case):
+    """{activity name: [first time, last time, last position]} for a case, in one pass over its
+    activities; times are epoch seconds, each parsed once."""
+    index = {}
+    for position, act in enumerate(case['activities']):
+        t = parse_epoch_seconds(act['ActivityTime'])
+        entry = index.get(act['ActivityName'])
+        if entry is None:
+            index[act['ActivityName']] = [t, t, position]
+        else:
+            entry[1], entry[2] = t, position
+    return index
+
+def extract_stage_durations(case, stages=STAGES):
+    """(stage name, minutes) for every stage the case passes through (the same rules as stage_durations)."""
+    index = case_activity_index(case)
+    durations = []
+    for stage in stages:
+        start = index.get(stage['from'])
+        if start is None:
+            continue
+        if isinstance(stage['to'], list):
+            # The last occurrence of any of the outcome activities
+            ends = [index[name] for name in stage['to'] if name in index]
+            if not ends:
+                continue
+            t_end = max(ends, key=lambda entry: entry[2])[1]
+        elif stage['to'] in index:
+            t_end = index[stage['to']][0]
+        else:
+            continue
+        if t_end > start[0]:
+            durations.append((stage['name'], (t_end - start[0]) / 60.0))
+    return durations
+
+# --- LOADING ---
+
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_DIGIT = np.int32(ord("0"))
+
+class _HashCollision(Exception):
+    pass
+
+def _field_bytes(data, start, end):
+    """data[start:end] per row as a zero-padded (rows, width) uint8 matrix; width is a multiple of 8."""
+    length = end - start
+    width = max(8, -(-int(length.max()) // 8) * 8)
+    if int(start.max()) + width > len(data):
+        data = np.concatenate((data, np.zeros(width, dtype=np.uint8)))
+    field = np.lib.stride_tricks.sliding_window_view(data, width)[start]
+    np.multiply(field, np.arange(width) < length[:, None], out=field)
+    return field
+
+def _hash_field(field):
+    """(table index per row, table keys, table strings) for a zero-padded field matrix.
+
+    Rows are keyed by a 64-bit hash of their bytes, and the table lists the distinct keys in order
+    of first appearance. Rows with equal keys are checked byte for byte, so a key identifies its
+    string.
+    """
+    words = field.view(np.uint64)
+    key = words[:, 0].copy()
+    for j in range(1, words.shape[1]):
+        # All-zero words are padding (strings hold no NUL bytes), so a key does not depend on the block's width
+        word = words[:, j]
+        key = np.where(word != 0, key * _HASH_MULTIPLIER ^ word, key)
+    distinct, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    if not (field == field[first][inverse]).all():
+        raise _HashCollision()
+    order = np.argsort(first)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank[inverse], distinct[order], field[first[order]].view(f"S{field.shape[1]}").ravel()
+
+def _codes(hashed):
+    """Codes in order of first appearance for the per-block _hash_field results, and the strings they code."""
+    table_keys = np.concatenate([block[1] for block in hashed])
+    table_values = np.concatenate([block[2] for block in hashed])
+    distinct, first, inverse = np.unique(table_keys, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    # Blocks agree on every key they share
+    if (table_values != table_values[first][inverse]).any():
+        raise _HashCollision()
+    # The tables are in order of first appearance, so the earliest table row of a key orders the codes
+    order = np.argsort(first)
+    code = np.empty(len(distinct), dtype=np.int64)
+    code[order] = np.arange(len(distinct))
+    table_code = code[inverse]
+    offsets = np.cumsum([0] + [len(block[1]) for block in hashed[:-1]])
+    event_code = np.concatenate([table_code[offset + block[0]] for offset, block in zip(offsets, hashed)])
+    return event_code, [value.decode() for value in table_values[first[order]].tolist()]
+
+def _parse_csv_block(block):
+    """(hashed CaseId, hashed ActivityName, epoch seconds) for a block of complete CSV lines."""
+    data = np.frombuffer(block, dtype=np.uint8)
+    line_end = np.flatnonzero(data == ord("\n"))
+    line_start = np.concatenate(([0], line_end[:-1] + 1))
+    commas = np.flatnonzero(data == ord(","))
+    first = np.searchsorted(commas, line_start)
+    if len(commas) < first[-1] + 3:
+        raise ValueError("CSV line with fewer than four columns.")
+    c0, c1, c2 = commas[first], commas[first + 1], commas[first + 2]
+    if (c2 > line_end).any() or (c2 - c1 != 20).any() or (data[line_start] == ord('"')).any() or (data[c0 + 1] == ord('"')).any():
+        return _parse_csv_block_slow(block)
+    return (
+        _hash_field(_field_bytes(data, line_start, c0)),
+        _hash_field(_field_bytes(data, c0 + 1, c1)),
+        _time_seconds(np.lib.stride_tricks.sliding_window_view(data, 19)[c1 + 1]),
+    )
+
+def _time_seconds(text):
+    """Epoch seconds for a (rows, 19) uint8 matrix of 'YYYY-MM-DD HH:MM:SS' times."""
+    d = [text[:, i].astype(np.int32) - _DIGIT for i in range(19)]
+    year = d[0] * 1000 + d[1] * 100 + d[2] * 10 + d[3]
+    month = d[5] * 10 + d[6]
+    day = d[8] * 10 + d[9]
+    # Days since 1970-01-01 for a proleptic Gregorian date (the "days from civil" algorithm)
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = (era * 146097 + day_of_era - 719468).astype(np.int64)
+    return days * 86400 + (d[11] * 10 + d[12]) * 3600 + (d[14] * 10 + d[15]) * 60 + d[17] * 10 + d[18]
+
+def _string_field(values):
+    field = np.array(values, dtype=bytes)
+    width = max(8, -(-field.dtype.itemsize // 8) * 8)
+    return field.astype(f"S{width}").view(np.uint8).reshape(len(field), width)
+
+def _parse_csv_block_slow(block):
+    rows = [row[:3] for row in csv.reader(io.StringIO(bytes(block).decode(), newline=""))]
+    return (
+        _hash_field(_string_field([row[0].encode() for row in rows])),
+        _hash_field(_string_field([row[1].encode() for row in rows])),
+        np.array([parse_epoch_seconds(row[2]) for row in rows], dtype=np.int64),
+    )
+
+def _iter_csv_blocks(path, block_bytes):
+    """Blocks of complete lines after the header of an event log CSV."""
+    with open_binary_input(path) as f:
+        header = next(csv.reader([f.readline().decode()]))
+        if header[:3] != CSV_FIELDNAMES[:3]:
+            raise ValueError(f"{path}: expected an event log CSV starting with {CSV_FIELDNAMES[:3]}.")
+        rest = b""
+        while True:
+            block = f.read(block_bytes)
+            if not block:
+                break
+            if rest:
+                block = rest + block
+            cut = block.rfind(b"\n") + 1
+            if cut:
+                yield memoryview(block)[:cut]
+            rest = block[cut:]
+        if rest.strip():
+            yield rest + b"\n"
+
+def load_csv_events(path, block_bytes=CSV_BLOCK_BYTES):
+    """(event case, event activity, event time in epoch seconds, activity names) from an event log CSV.
+
+    Cases and activities are coded in order of first appearance.
+    """
+    try:
+        blocks = [_parse_csv_block(block) for block in _iter_csv_blocks(path, block_bytes)]
+    except _HashCollision:
+        # Vanishingly unlikely: parse again with the csv module and exact string codes
+        return _load_csv_events_slow(path)
+    if not blocks:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int64), []
+    cases, activities, times = zip(*blocks)
+    try:
+        event_case, _ = _codes(cases)
+        event_activity, activity_names = _codes(activities)
+    except _HashCollision:
+        return _load_csv_events_slow(path)
+    return event_case, event_activity, np.concatenate(times), activity_names
+
+def _load_csv_events_slow(path):
+    with open_text_input(path, newline="") as f:
+        rows = [row[:3] for row in csv.reader(f)][1:]
+    case_codes, activity_codes = {}, {}
+    return (
+        np.array([case_codes.setdefault(row[0], len(case_codes)) for row in rows], dtype=np.int64),
+        np.array([activity_codes.setdefault(row[1], len(activity_codes)) for row in rows], dtype=np.int64),
+        np.array([parse_epoch_seconds(row[2]) for row in rows], dtype=np.int64),
+        list(activity_codes),
+    )
+
+def load_columnar_events(path):
+    """(event case, event activity, event time in epoch seconds, activity names) from a columnar bundle."""
+    columns, schema = load_columnar(path)
+    return columns["event_case"], columns["event_activity"], columns["event_time"], schema["dictionaries"]["ActivityName"]
+
+def load_events(path):
+    """Events of a columnar bundle (a directory) or an event log CSV (.csv, .csv.gz, .csv.zst)."""
+    return load_columnar_events(path) if os.path.isdir(path) else load_csv_events(path)
+
+# --- ENGINE ---
+
+def stage_durations(event_case, event_activity, event_time, activity_names, stages=STAGES):
+    """{stage name: durations in minutes (float64, in case order)} for every stage entry.
+
+    A stage runs from the first occurrence of its "from" activity to the first occurrence of its
+    "to" activity (for a list of "to" activities: the last occurrence of any of them) and counts
+    only when it has positive length. Each case's events must be in time order in the arrays.
+    """
+    event_case = np.asarray(event_case, dtype=np.int64)
+    n_codes = len(activity_names)
+    key = event_case * n_codes + np.asarray(event_activity, dtype=np.int64)
+    order = np.argsort(key, kind="stable")
+    sorted_key = key[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_key[1:] != sorted_key[:-1]))) if len(key) else np.empty(0, np.int64)
+    ends = np.append(starts[1:], len(key)) - 1
+    group_case, group_activity = np.divmod(sorted_key[starts], n_codes)
+    first_row, last_row = order[starts], order[ends]
+    n_cases = int(event_case.max()) + 1 if len(event_case) else 0
+    codes = {name: code for code, name in enumerate(activity_names)}
+
+    def occurrences(names, row):
+        # Per case: the row of the named activity's occurrence (the latest row over several names), -1 if none
+        found = np.full(n_cases, -1, dtype=np.int64)
+        for name in names:
+            if name in codes:
+                mask = group_activity == codes[name]
+                # (case, activity) groups are unique, so each case appears at most once per name
+                found[group_case[mask]] = np.maximum(found[group_case[mask]], row[mask])
+        return found
+
+    event_time = np.asarray(event_time, dtype=np.int64)
+    durations = {}
+    for stage in stages:
+        start = occurrences([stage['from']], first_row)
+        if isinstance(stage['to'], list):
+            end = occurrences(stage['to'], last_row)
+        else:
+            end = occurrences([stage['to']], first_row)
+        both = np.flatnonzero((start >= 0) & (end >= 0))
+        seconds = event_time[end[both]] - event_time[start[both]]
+        durations[stage['name']] = seconds[seconds > 0] / 60.0
+    return durations
+
+def default_event_log(output_dir):
+    """The year-to-date columnar bundle if there is one, else the year-to-date CSV."""
+    bundle = os.path.join(output_dir, "alderaan_year_to_date_columnar")
+    if os.path.isdir(bundle):
+        return bundle
+    for extension in ("", ".gz", ".zst"):
+        path = os.path.join(output_dir, "alderaan_year_to_date.csv" + extension)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No alderaan_year_to_date columnar bundle or CSV in {output_dir}")
+
+def main(path=None):
+    if path is None:
+        path = default_event_log(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Output"))
+    started = time.perf_counter()
+    event_case, event_activity, event_time, activity_names = load_events(path)
+    loaded = time.perf_counter()
+    durations = stage_durations(event_case, event_activity, event_time, activity_names)
+    print("\n=================\nStage Duration SLA Statistics\n=================")
+    for stage in STAGES:
+        print_stage_stats(stage, durations[stage['name']])
+    print(f"\n{len(event_case)} events from {path}: loaded in {loaded - started:.2f}s, stages computed in {time.perf_counter() - loaded:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stage duration SLA statistics from an event log CSV or columnar bundle.")
+    parser.add_argument("path", nargs="?", help="CSV (.csv/.gz/.zst) or columnar bundle directory (default: the year-to-date log in Output)")
+    main(parser.parse_args().path)
@@ -0,0 +1,225 @@
+import argparse
+import csv
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+import numpy as np
+from event_log_io import CSV_FIELDNAMES, find_event_log, open_text_input, read_event_log
+from quantile_sketch import KLL_K, KLLSketch
+from stage_duration_engine import STAGES, extract_stage_durations, print_stage_report, sla_bucket_counts
+
+# Streaming stage-duration statistics in constant memory. Cases are read one at a time from an
+# NDJSON log or from a CSV whose rows are grouped by case (the generators' default, unsorted CSV),
+# and each stage keeps a StageSummary: exact count, mean and standard deviation (merged with
+# Chan's parallel-variance formula), exact SLA bucket counts, and a KLL sketch (quantile_sketch.py)
+# for the median and 90th percentile. Summaries of several logs, such as the shards of a
+# partitioned output, are computed in a process pool and merged, so the report covers them all.
+# A .json log is still loaded whole by json.load; write NDJSON for constant memory.
+#
+# --check also runs the exact path (every duration in memory) and reports, per stage, how far the
+# sketch's median and 90th percentile are from the exact ones, in minutes and in rank.
+
+STREAM_BATCH = 8192  # durations buffered per stage before they are folded into its summary
+STREAM_WORKERS = 0  # processes summarizing logs (0 = one per CPU core, 1 = in this process)
+RECENT_CASES = 10_000  # closed CSV cases remembered to detect a CSV whose rows are not grouped by case
+
+class StageSummary:
+    """Mergeable summary of one stage's durations: exact moments and buckets, sketched quantiles."""
+
+    def __init__(self, stage, k=KLL_K):
+        self.stage = stage
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared deviations from the mean
+        self.buckets = [0, 0, 0, 0]  # fast, on target, warning, critical
+        self.sketch = KLLSketch(k)
+
+    def add_many(self, durations):
+        arr = np.asarray(durations, dtype=np.float64)
+        if len(arr):
+            batch_mean = float(np.mean(arr))
+            self._combine(len(arr), batch_mean, float(np.sum((arr - batch_mean) ** 2)))
+            self.buckets = [a + b for a, b in zip(self.buckets, sla_bucket_counts(self.stage, arr))]
+            self.sketch.update_many(arr.tolist())
+
+    def _combine(self, n, mean, m2):
+        total = self.n + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.mean += delta * n / total
+        self.n = total
+
+    def merge(self, other):
+        if other.n:
+            self._combine(other.n, other.mean, other.m2)
+            self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+            self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / self.n) if self.n else None
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def print_report(self):
+        if not self.n:
+            print_stage_report(self.stage, 0, None, None, None, None, None)
+            return
+        print_stage_report(self.stage, self.n, self.mean, self.quantile(0.5), self.quantile(0.9), self.std, self.buckets)
+
+# --- READING ---
+
+def iter_csv_cases(path):
+    """Cases ({"CaseId", "activities"}) of an event log CSV whose rows are grouped by case."""
+    recent = deque(maxlen=RECENT_CASES)
+    recent_ids = set()
+    with open_text_input(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if header[:3] != CSV_FIELDNAMES[:3]:
+            raise ValueError(f"{path}: expected an event log CSV starting with {CSV_FIELDNAMES[:3]}.")
+        for case_id, rows in groupby(reader, key=itemgetter(0)):
+            if case_id in recent_ids:
+                raise ValueError(f"{path}: the rows of case {case_id} are not together; streaming needs a CSV written with CSV_SORTED = False, or an NDJSON log.")
+            if len(recent) == recent.maxlen:
+                recent_ids.discard(recent[0])
+            recent.append(case_id)
+            recent_ids.add(case_id)
+            yield {"CaseId": case_id, "activities": [{"ActivityName": row[1], "ActivityTime": row[2]} for row in rows]}
+
+def iter_log_cases(path):
+    """Cases of an event log CSV (.csv/.gz/.zst, streamed), NDJSON log (streamed) or JSON log."""
+    if path.endswith((".csv", ".csv.gz", ".csv.zst")):
+        return iter_csv_cases(path)
+    return read_event_log(path)[1]
+
+def expand_log_paths(paths):
+    """The logs to summarize: a partitioned output's manifest.json stands for its shards' JSON logs."""
+    logs = []
+    for path in paths:
+        if os.path.basename(path) == "manifest.json":
+            with open(path, "r") as f:
+                shards = json.load(f)["shards"]
+            logs.extend(os.path.join(os.path.dirname(path), shard["json"]) for shard in shards)
+        else:
+            logs.append(path)
+    return logs
+
+# --- SUMMARIES ---
+
+def summarize_cases(cases, stages=STAGES, k=KLL_K):
+    """{stage name: StageSummary} over an iterable of cases, holding at most STREAM_BATCH durations per stage."""
+    summaries = {stage['name']: StageSummary(stage, k) for stage in stages}
+    buffers = {stage['name']: [] for stage in stages}
+    for case in cases:
+        for name, duration in extract_stage_durations(case, stages):
+            buffer = buffers[name]
+            buffer.append(duration)
+            if len(buffer) >= STREAM_BATCH:
+                summaries[name].add_many(buffer)
+                buffer.clear()
+    for name, buffer in buffers.items():
+        summaries[name].add_many(buffer)
+    return summaries
+
+def summarize_log(path, stages=STAGES, k=KLL_K):
+    return summarize_cases(iter_log_cases(path), stages, k)
+
+def merge_summaries(partials):
+    """Merge {stage name: StageSummary} dicts (from shards or workers) into the first one."""
+    merged = None
+    for partial in partials:
+        if merged is None:
+            merged = partial
+        else:
+            for name, summary in partial.items():
+                merged[name].merge(summary)
+    return merged
+
+def summarize_logs(paths, workers=STREAM_WORKERS):
+    """Merged summaries of several logs, each summarized in a process pool; the merge runs in path
+    order, so the result is the same for any number of workers."""
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers == 1 or len(paths) == 1:
+        return merge_summaries(map(summarize_log, paths))
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        return merge_summaries(executor.map(summarize_log, paths))
+
+# --- ACCURACY ---
+
+def exact_durations(paths, stages=STAGES):
+    """{stage name: every duration} of the logs, for checking the sketches."""
+    durations = {stage['name']: [] for stage in stages}
+    for path in paths:
+        for case in iter_log_cases(path):
+            for name, duration in extract_stage_durations(case, stages):
+                durations[name].append(duration)
+    return {name: np.sort(np.array(values)) for name, values in durations.items()}
+
+def print_accuracy(summaries, exact):
+    """Sketch quantiles against np.median/np.percentile: error in minutes and normalized rank error."""
+    print("\n=================\nSketch Accuracy (against all durations in memory)\n=================")
+    worst = 0.0
+    for name, summary in summaries.items():
+        values = exact[name]
+        if summary.n != len(values):
+            raise AssertionError(f"{name}: {summary.n} durations in the summary, {len(values)} in the log.")
+        if not len(values):
+            continue
+        parts = []
+        for label, q in (("Median", 0.5), ("P90", 0.9)):
+            estimate = summary.quantile(q)
+            true = np.percentile(values, q * 100)
+            # Fraction of the durations between the estimate and the exact quantile
+            lo, hi = np.searchsorted(values, estimate, "left"), np.searchsorted(values, estimate, "right")
+            rank_error = max(0.0, lo / len(values) - q, q - hi / len(values))
+            worst = max(worst, rank_error)
+            parts.append(f"{label}: {estimate:.1f} vs {true:.1f} min (rank error {rank_error:.2%})")
+        print(f"{name}: " + " | ".join(parts))
+    print(f"Worst rank error: {worst:.2%}")
+
+def default_stream_log(output_dir, name="alderaan_year_to_date"):
+    """The log to stream when none is given: the NDJSON log, else the CSV, else the JSON log (which
+    is loaded whole). The columnar bundle is skipped; stage_duration_engine.py reads it."""
+    try:
+        json_log = find_event_log(output_dir, name)
+    except FileNotFoundError:
+        json_log = None
+    if json_log and ".ndjson" in os.path.basename(json_log):
+        return json_log
+    for extension in ("", ".gz", ".zst"):
+        path = os.path.join(output_dir, name + ".csv" + extension)
+        if os.path.exists(path):
+            return path
+    if json_log:
+        return json_log
+    raise FileNotFoundError(f"No {name} NDJSON, CSV or JSON log in {output_dir}")
+
+def main(paths=None, workers=STREAM_WORKERS, check=False):
+    if not paths:
+        paths = [default_stream_log(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Output"))]
+    paths = expand_log_paths(paths)
+    started = time.perf_counter()
+    summaries = summarize_logs(paths, workers)
+    print("\n=================\nStage Duration SLA Statistics (streaming)\n=================")
+    for stage in STAGES:
+        summaries[stage['name']].print_report()
+    print(f"\n{len(paths)} log(s) summarized in {time.perf_counter() - started:.2f}s")
+    if check:
+        print_accuracy(summaries, exact_durations(paths))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stage duration SLA statistics in constant memory, with mergeable quantile sketches.")
+    parser.add_argument("paths", nargs="*", help="NDJSON/JSON logs, CSVs grouped by case, or a partitioned output's manifest.json (default: the year-to-date log in Output)")
+    parser.add_argument("--workers", type=int, default=STREAM_WORKERS, help="processes summarizing the logs (0: one per CPU core)")
+    parser.add_argument("--check", action="store_true", help="also compute the exact quantiles and report the sketch's error")
+    args = parser.parse_args()
+    main(args.paths, args.workers, args.check)
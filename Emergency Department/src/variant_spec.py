@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import re
+import numpy as np
+
+# Declarative case variants. variants.json (next to activities.json) holds every path a case can
+# follow and how its times are laid out, for both generators; the generators contain no
+# per-variant code, so a variant is added or changed by editing the JSON file only.
+#
+# The spec is compiled once at import. Historical variants become flat integer arrays (activity
+# code, base minute and random gap bounds per step) that one vectorized engine expands into a
+# whole day's events. Daily stages become activity paths with their waiting-time ranges resolved
+# against the stage thresholds.
+
+SPEC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "variants.json")
+LWBS_ACTIVITY = "Left Without Being Seen"
+
+def load_variant_spec(path=None):
+    with open(path or SPEC_PATH, "r") as f:
+        return json.load(f)
+
+def parse_clock(text):
+    """Minutes after midnight for an "HH:MM" time."""
+    hours, minutes = text.split(":")
+    return 60 * int(hours) + int(minutes)
+
+def check_path(path, known, where):
+    if not path:
+        raise ValueError(f"{where}: empty path.")
+    unknown = [name for name in path if name not in known]
+    if unknown:
+        raise ValueError(f"{where}: unknown activities {unknown}.")
+    return list(path)
+
+def allocate_counts(total, variants):
+    """Split `total` cases over variants with a "rate" or a "weight".
+
+    Rate variants get round(total * rate) each; the rest is shared by the weight variants in
+    proportion, rounding in order, with the last one taking the remainder.
+    """
+    counts = [int(round(total * v["rate"])) if "rate" in v else 0 for v in variants]
+    remaining = total - sum(counts)
+    weighted = [i for i, v in enumerate(variants) if "rate" not in v]
+    weight_left = sum(variants[i]["weight"] for i in weighted)
+    for i in weighted[:-1]:
+        counts[i] = int(round(remaining * (variants[i]["weight"] / weight_left)))
+        remaining -= counts[i]
+        weight_left -= variants[i]["weight"]
+    counts[weighted[-1]] = remaining
+    return counts
+
+def check_allocation(variants, where):
+    if not any("rate" not in v for v in variants):
+        raise ValueError(f"{where}: at least one variant needs a weight instead of a rate.")
+    if sum(v.get("rate", 0) for v in variants) > 1:
+        raise ValueError(f"{where}: variant rates add up to more than 1.")
+
+# --- HISTORICAL ---
+
+def variant_steps(variant, n, where):
+    """(base minute, gap low, gap high) per step: fixed "times", or a "start" plus random "gap_minutes"."""
+    if "times" in variant:
+        if len(variant["times"]) != n:
+            raise ValueError(f"{where}: one time per activity expected.")
+        return [(parse_clock(t), 0, 0) for t in variant["times"]]
+    gap_low, gap_high = variant["gap_minutes"]
+    if not 0 < gap_low <= gap_high:
+        raise ValueError(f"{where}: bad gap_minutes {variant['gap_minutes']}.")
+    return [(parse_clock(variant["start"]), gap_low, gap_high)] * n
+
+class CompiledVariants:
+    """Historical variants as flat step arrays: step i of variant k is at index start[k] + i.
+
+    A step's minute after midnight is base plus the random gaps drawn so far in the case; steps
+    with gap_high 0 draw no gap. Variant codes are the templated variants in spec order, then one
+    code per LWBS path from lwbs_code on.
+    """
+
+    def __init__(self, spec, activity_codes):
+        historical = spec["historical"]
+        variants = historical["variants"]
+        check_allocation(variants, "historical variants")
+        lwbs = historical["lwbs"]
+        self.allocation = [{key: v[key] for key in ("rate", "weight") if key in v} for v in variants]
+        self.names = [v["name"] for v in variants]
+        self.n_templated = len(variants)
+        self.lwbs_code = self.n_templated
+        self.lwbs_rate = lwbs["rate"]
+        self.n_lwbs_paths = len(spec["lwbs_paths"])
+        # Identifies the compiled variants, e.g. so appending runs can refuse a changed spec
+        self.digest = hashlib.sha1(json.dumps([historical, spec["lwbs_paths"]], sort_keys=True).encode()).hexdigest()[:12]
+        paths, steps = [], []
+        for v in variants:
+            path = check_path(v["path"], activity_codes, f"historical variant {v['name']!r}")
+            paths.append(path)
+            steps.append(variant_steps(v, len(path), f"historical variant {v['name']!r}"))
+        for k, path in enumerate(spec["lwbs_paths"]):
+            paths.append(check_path(path, activity_codes, f"LWBS path {k}"))
+            self.names.append(f"lwbs_{k}")
+            steps.append(variant_steps(lwbs, len(path), "historical LWBS"))
+        self.paths = [[activity_codes[a] for a in path] for path in paths]
+        self.length = np.array([len(path) for path in paths], dtype=np.int64)
+        self.start = np.cumsum(self.length) - self.length
+        self.activity = np.array([a for path in self.paths for a in path], dtype=np.int8)
+        self.base = np.array([s[0] for variant in steps for s in variant], dtype=np.int32)
+        self.gap_low = np.array([s[1] for variant in steps for s in variant], dtype=np.int64)
+        self.gap_high = np.array([s[2] for variant in steps for s in variant], dtype=np.int64)
+        self._steps = [list(zip(path, *zip(*variant))) for path, variant in zip(self.paths, steps)]
+
+    def split(self, case_count):
+        """Cases per templated variant for a day with `case_count` regular cases."""
+        return allocate_counts(case_count, self.allocation)
+
+    def steps(self, code):
+        """(activity code, base minute, gap low, gap high) per step of a variant, as Python ints."""
+        return self._steps[code]
+
+    def expand(self, variant, rng):
+        """Events of cases with the given variant codes: (event_case, event_activity, event_minute).
+
+        Events are ordered by case, then path. Gaps are drawn in one call, in event order.
+        """
+        lengths = self.length[variant]
+        n_events = int(lengths.sum())
+        case_start = np.cumsum(lengths) - lengths
+        index = np.repeat(self.start[variant] - case_start, lengths) + np.arange(n_events)
+        offset = np.zeros(n_events, dtype=np.int64)
+        random_step = self.gap_high[index] > 0
+        if random_step.any():
+            offset[random_step] = rng.integers(self.gap_low[index[random_step]], self.gap_high[index[random_step]] + 1)
+            # Running sum of the gaps within each case
+            running = np.cumsum(offset)
+            offset = running - np.repeat(running[case_start] - offset[case_start], lengths)
+        return (
+            np.repeat(np.arange(len(variant), dtype=np.int32), lengths),
+            self.activity[index],
+            (self.base[index] + offset).astype(np.int32),
+        )
+
+# --- DAILY ---
+
+_WAIT_BOUND = re.compile(r"^(warning|critical)?([+-]?\d+)?$")
+
+def resolve_wait(bound, thresholds, where):
+    """Minutes for a waiting-time bound such as "1", "warning", "warning+1" or "critical-1"."""
+    match = _WAIT_BOUND.match(bound.replace(" ", ""))
+    if not match or not any(match.groups()):
+        raise ValueError(f"{where}: bad waiting-time bound {bound!r}.")
+    name, delta = match.groups()
+    minutes = 0
+    if name:
+        minutes = thresholds[0 if name == "warning" else 1]
+        if minutes is None:
+            raise ValueError(f"{where}: the stage has no {name} threshold.")
+    return minutes + int(delta or 0)
+
+def split_paths(n, paths):
+    """(path, count) pairs sharing n cases evenly over paths; the last path takes the remainder."""
+    share = n // len(paths)
+    return [(path, share) for path in paths[:-1]] + [(paths[-1], n - share * (len(paths) - 1))]
+
+def compile_daily_spec(spec, known_activities):
+    """Resolve the daily section: paths checked, waiting-time bounds in minutes.
+
+    Returns {"gap_minutes", "stage_thresholds", "in_progress", "lwbs", "completed"}; each
+    in-progress stage is {"stage", "bands": [{"band", "count", "wait": (low, high), "paths"}]}
+    and completed paths are lists of (activity, probability or None).
+    """
+    daily = spec["daily"]
+    thresholds = {stage: tuple(bounds) for stage, bounds in daily["stage_thresholds"].items()}
+    stages = []
+    for stage in daily["in_progress"]:
+        name = stage["stage"]
+        if name not in thresholds:
+            raise ValueError(f"daily stage {name!r}: not in stage_thresholds.")
+        defaults = stage.get("default_thresholds", (None, None))
+        stage_thresholds = tuple(t if t is not None else d for t, d in zip(thresholds[name], defaults))
+        bands = []
+        for band in stage["bands"]:
+            where = f"daily stage {name!r}, band {band['band']!r}"
+            paths = band.get("paths", stage.get("paths"))
+            if not paths:
+                raise ValueError(f"{where}: no paths.")
+            low, high = (resolve_wait(bound, stage_thresholds, where) for bound in band["wait"])
+            if not 0 < low <= high:
+                raise ValueError(f"{where}: empty waiting-time range {low}..{high}.")
+            bands.append({
+                "band": band["band"],
+                "count": band["count"],
+                "wait": (low, high),
+                "paths": [check_path(path, known_activities, where) for path in paths],
+            })
+        stages.append({"stage": name, "bands": bands})
+    completed = daily["completed"]
+    check_allocation(completed["variants"], "daily completed variants")
+    variants = []
+    for v in completed["variants"]:
+        path = [(step, None) if isinstance(step, str) else (step["activity"], step["probability"]) for step in v["path"]]
+        check_path([a for a, _ in path], known_activities, f"daily completed variant {v['name']!r}")
+        variants.append({**{key: v[key] for key in ("name", "rate", "weight") if key in v}, "path": path})
+    lwbs = daily["lwbs"]
+    return {
+        "gap_minutes": tuple(daily["gap_minutes"]),
+        "stage_thresholds": thresholds,
+        "in_progress": stages,
+        "lwbs": {
+            "rate": lwbs["rate"],
+            "minimum": lwbs.get("minimum", 0),
+            "start_hours_ago": tuple(lwbs["start_hours_ago"]),
+            "paths": [check_path(path, known_activities, f"LWBS path {k}") for k, path in enumerate(spec["lwbs_paths"])],
+        },
+        "completed": {
+            "total": completed["total"],
+            "end_hours_ago": tuple(completed["end_hours_ago"]),
+            "variants": variants,
+        },
+    }
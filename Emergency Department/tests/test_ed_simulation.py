@@ -0,0 +1,89 @@
+from datetime import timedelta
+import numpy as np
+import pytest
+import historical_event_log as hel
+from ed_simulation import RosterExhausted, simulate_day
+from shift_roster import ShiftRoster
+
+# Activity codes: 0 needs a bed and a nurse, 1 is a nurse-attributed delay, 2 needs a doctor.
+# min == max, so every duration is fixed.
+SERVICE = [("nurse", 10, 10, True), ("nurse", 30, 30, False), ("doctor", 20, 20, True)]
+BED = 0
+
+def run(arrivals, priorities, paths, shifts, beds=10):
+    return simulate_day(arrivals, priorities, paths, SERVICE, ShiftRoster(shifts), beds, BED, np.random.default_rng(0))
+
+def completion_minutes(result, n):
+    event_case, _, event_minute, _ = result
+    return [event_minute[event_case == c].tolist() for c in range(n)]
+
+def test_bed_queue_serves_by_priority_when_a_bed_frees():
+    shifts = [("nurse", 0, 1000, [1, 2, 3])]
+    # One bed: the first patient holds it until its last activity; then the more urgent patient (priority 1) goes first
+    result = run([0, 1, 2], [3, 3, 1], [[0, 1]] * 3, shifts, beds=1)
+    assert completion_minutes(result, 3) == [[10, 40], [90, 120], [50, 80]]
+
+def test_staff_queue_serves_by_priority():
+    shifts = [("doctor", 0, 1000, [7])]
+    result = run([0, 1, 2], [5, 3, 1], [[2]] * 3, shifts)
+    assert completion_minutes(result, 3) == [[20], [60], [40]]
+    assert result[3].tolist() == [7, 7, 7]
+
+def test_queued_patients_wait_for_the_next_shift():
+    shifts = [("doctor", 100, 200, [7]), ("doctor", 110, 300, [8])]
+    result = run([0, 0], [1, 2], [[2], [2]], shifts)
+    # Nobody is on duty before minute 100; the second patient waits for the doctor arriving at 110
+    assert completion_minutes(result, 2) == [[120], [130]]
+    assert result[3].tolist() == [7, 8]
+
+def test_staff_finish_an_activity_past_their_shift():
+    result = run([0, 0], [1, 2], [[2], [2]], [("doctor", 0, 30, [7])])
+    assert completion_minutes(result, 2) == [[20], [40]]
+
+def test_queue_past_the_roster_raises():
+    with pytest.raises(RosterExhausted):
+        run([0, 35], [1, 1], [[2], [2]], [("doctor", 0, 30, [7])])
+    with pytest.raises(RosterExhausted):
+        run([0], [1], [[1]], [("doctor", 0, 30, [7])])
+
+def test_same_rng_gives_the_same_day():
+    shifts = [("nurse", 0, 1000, [1, 2]), ("doctor", 0, 1000, [7, 8])]
+    paths = [[0, 2, 1]] * 20
+    arrivals = list(range(0, 200, 10))
+    first = run(arrivals, [1] * 20, paths, shifts, beds=3)
+    second = run(arrivals, [1] * 20, paths, shifts, beds=3)
+    for a, b in zip(first, second):
+        assert np.array_equal(a, b)
+
+# --- simulate_day_batch: extending the roster when the queue outlasts it ---
+
+def simulate_first_day(roster):
+    day = hel.START_DATE
+    row = hel.build_day_plan(day, day)[0]
+    n = int(row["n_cases"])
+    ids = [f"ED{i}" for i in range(n)]
+    return hel.simulate_day_batch(
+        day, tuple(row["variant_counts"].tolist()), int(row["n_lwbs"]), hel.day_rng(day),
+        ids, ids, roster,
+    )
+
+def day_roster(days):
+    """The generator's roster from START_DATE's midnight through `days` days."""
+    plan = hel.build_day_plan(hel.START_DATE, hel.START_DATE + timedelta(days=days - 1))
+    midnight = hel.to_epoch_minutes(hel.START_DATE)
+    return hel.build_shift_roster(plan).window(midnight, midnight + days * 24 * 60)
+
+def test_short_roster_is_extended_to_the_same_result(monkeypatch):
+    # With two beds the day's queue lasts several days, far past a one-day roster
+    monkeypatch.setattr(hel, "BED_CAPACITY", 2)
+    extended = simulate_first_day(day_roster(1))
+    reference = simulate_first_day(day_roster(30))
+    assert extended["EventMinute"].max() > 2 * 24 * 60
+    for name in ("EventCase", "EventActivity", "EventMinute", "EventResource", "Variant", "Triage"):
+        assert np.array_equal(extended[name], reference[name])
+
+def test_roster_extension_gives_up(monkeypatch):
+    monkeypatch.setattr(hel, "BED_CAPACITY", 2)
+    monkeypatch.setattr(hel, "ROSTER_EXTENSION_MAX_DAYS", 2)
+    with pytest.raises(ValueError, match="still queued"):
+        simulate_first_day(day_roster(1))
@@ -0,0 +1,65 @@
+import json
+import os
+import pytest
+from event_log_io import CaseCsvWriter, CaseJsonWriter, CaseNdjsonWriter, SortedCsvWriter, read_event_log
+
+CASES = [
+    {"CaseId": f"ED{i}", "PatientID": f"P{i}", "activities": [
+        {"ActivityName": "Registration", "ActivityTime": f"2025-01-01 0{i}:00:00"},
+        {"ActivityName": "Triage", "ActivityTime": f"2025-01-01 0{i}:10:00"},
+    ]}
+    for i in range(4)
+]
+
+def fail_while_writing(writer, cases=CASES):
+    with pytest.raises(RuntimeError):
+        with writer:
+            writer.write_cases(cases)
+            raise RuntimeError("generation failed")
+
+@pytest.mark.parametrize("indent", [2, None])
+def test_json_writer_round_trip(tmp_path, indent):
+    path = str(tmp_path / "log.json")
+    with CaseJsonWriter(path, {"FreezeTime": "2025-01-01 12:00:00"}, indent=indent) as writer:
+        writer.write_cases(CASES)
+    with open(path) as f:
+        document = json.load(f)
+    assert document["FreezeTime"] == "2025-01-01 12:00:00"
+    assert document["cases"] == CASES
+
+@pytest.mark.parametrize("writer_class, name", [
+    (CaseJsonWriter, "log.json"), (CaseNdjsonWriter, "log.ndjson"), (CaseCsvWriter, "log.csv"), (SortedCsvWriter, "log.csv"),
+])
+def test_failed_run_leaves_no_log(tmp_path, writer_class, name):
+    path = str(tmp_path / name)
+    fail_while_writing(writer_class(path))
+    assert os.listdir(tmp_path) == []
+
+def test_failed_run_after_a_checkpoint_leaves_the_json_unterminated(tmp_path):
+    path = str(tmp_path / "log.json")
+    writer = CaseJsonWriter(path)
+    writer.write_cases(CASES[:2])
+    resume = writer.resume_point()
+    fail_while_writing(writer, CASES[2:])
+    with open(path) as f:
+        with pytest.raises(json.JSONDecodeError):
+            json.load(f)
+    # Appending from the checkpoint gives the same document as an uninterrupted run
+    with CaseJsonWriter(path, resume=resume) as writer:
+        writer.write_cases(CASES[2:])
+    assert read_event_log(path)[1] == CASES
+
+@pytest.mark.parametrize("writer_class, name", [(CaseNdjsonWriter, "log.ndjson"), (CaseCsvWriter, "log.csv")])
+def test_failed_resumed_run_keeps_the_log(tmp_path, writer_class, name):
+    path = str(tmp_path / name)
+    with writer_class(path) as writer:
+        writer.write_cases(CASES[:2])
+    resume = writer.resume_point()
+    fail_while_writing(writer_class(path, resume=resume), CASES[2:])
+    with writer_class(path, resume=resume) as writer:
+        writer.write_cases(CASES[2:])
+    full_path = str(tmp_path / ("full_" + name))
+    with writer_class(full_path) as writer:
+        writer.write_cases(CASES)
+    with open(path) as resumed, open(full_path) as full:
+        assert resumed.read() == full.read()
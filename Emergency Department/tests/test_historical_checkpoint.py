@@ -0,0 +1,31 @@
+from datetime import timedelta
+import pytest
+import historical_event_log as hel
+
+@pytest.fixture
+def short_run(monkeypatch, tmp_path):
+    """A four-day batch run into tmp_path, left with its checkpoint."""
+    monkeypatch.setattr(hel, "END_DATE", hel.START_DATE + timedelta(days=3))
+    monkeypatch.setattr(hel, "INSTRUMENTATION", "quiet")
+    hel.main(str(tmp_path), mode="batch", workers=1, partition=None, columnar=False, incremental=False)
+    monkeypatch.setattr(hel, "END_DATE", hel.START_DATE + timedelta(days=5))
+    return tmp_path
+
+def test_unchanged_settings_append(short_run):
+    appended = hel.main(str(short_run), mode="batch", workers=1, partition=None, columnar=False, incremental=True)
+    assert appended["cases"] == int(hel.build_day_plan()["n_cases"].sum())
+
+@pytest.mark.parametrize("name, value", [
+    ("LOAD_MULTIPLIER", 2),
+    ("PROBLEM_DAYS", {"2025-01-05": {"bed_shortage": True}}),
+    ("SHIFT_STAFFING", {**hel.SHIFT_STAFFING, "doctor": (3, 4)}),
+    ("HANDOVER_MINUTES", 15),
+    ("BED_CAPACITY", 20),
+    ("DOCTOR_SHORTAGE_FACTOR", 0.25),
+    ("ARRIVAL_WEIGHT_BY_HOUR", [1] * 24),
+    ("SIMULATION_SERVICE", {**hel.SIMULATION_SERVICE, "Triage": ("nurse", 5, 20, True)}),
+])
+def test_changed_generation_settings_are_refused(short_run, monkeypatch, name, value):
+    monkeypatch.setattr(hel, name, value)
+    with pytest.raises(ValueError, match="different settings"):
+        hel.main(str(short_run), mode="batch", workers=1, partition=None, columnar=False, incremental=True)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from id_allocator import UniqueIdAllocator
+
+def test_every_id_in_a_small_range_is_drawn_once():
+    allocator = UniqueIdAllocator("ED", 100, 1099, key=[1, 2])
+    numbers = allocator.numbers_at(np.arange(allocator.size)).tolist()
+    assert sorted(numbers) == list(range(100, 1100))
+
+def test_ids_are_unique_and_in_range():
+    allocator = UniqueIdAllocator("ED", 100000, 9999999, key=[42, 1])
+    ids = allocator.take(50_000)
+    assert len(set(ids)) == len(ids)
+    assert all(id_.startswith("ED") and 100000 <= int(id_[2:]) <= 9999999 for id_ in ids)
+
+def test_take_continues_where_it_stopped():
+    allocator = UniqueIdAllocator("P", 1000, 999999, key=[42, 2])
+    first, second = allocator.take(10), allocator.take(5)
+    assert first + second == allocator.ids_at(np.arange(15))
+    assert allocator.position == 15
+
+def test_same_key_gives_the_same_ids():
+    a = UniqueIdAllocator("ED", 100000, 9999999, key=[42, 1])
+    b = UniqueIdAllocator("ED", 100000, 9999999, key=[42, 1])
+    other = UniqueIdAllocator("ED", 100000, 9999999, key=[43, 1])
+    assert a.take(100) == b.take(100)
+    assert a.ids_at([0, 1, 2]) != other.ids_at([0, 1, 2])
+
+def test_resuming_at_a_position_matches_an_uninterrupted_run():
+    whole = UniqueIdAllocator("ED", 100000, 9999999, key=[42, 1]).take(30)
+    resumed = UniqueIdAllocator("ED", 100000, 9999999, key=[42, 1], position=20)
+    assert resumed.take(10) == whole[20:]
+
+def test_exhaustion():
+    allocator = UniqueIdAllocator("X", 1, 10, key=[7])
+    assert allocator.remaining == 10
+    ids = list(allocator)
+    assert sorted(ids, key=lambda id_: int(id_[1:])) == [f"X{n}" for n in range(1, 11)]
+    assert allocator.remaining == 0
+    with pytest.raises(StopIteration):
+        next(allocator)
+    with pytest.raises(ValueError):
+        allocator.take(1)
+
+def test_empty_range_is_refused():
+    with pytest.raises(ValueError):
+        UniqueIdAllocator("X", 10, 9, key=[7])
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from quantile_sketch import KLLSketch
+
+QUANTILES = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+# Well above the sketch's expected rank error (about 1.7 / k) for the default k = 200
+MAX_RANK_ERROR = 0.02
+
+def rank_error(sorted_values, estimate, q):
+    """Distance in normalized rank between `estimate` and the q-quantile of `sorted_values`."""
+    lo = np.searchsorted(sorted_values, estimate, "left") / len(sorted_values)
+    hi = np.searchsorted(sorted_values, estimate, "right") / len(sorted_values)
+    return max(0.0, lo - q, q - hi)
+
+@pytest.fixture
+def values():
+    return np.random.default_rng(7).lognormal(3, 1, 200_000)
+
+def test_empty_sketch_has_no_quantiles():
+    assert KLLSketch().quantile(0.5) is None
+
+def test_small_streams_are_exact():
+    sketch = KLLSketch()
+    sketch.update_many([5.0, 1.0, 3.0, 2.0, 4.0])
+    assert sketch.n == 5
+    assert sketch.quantile(0) == 1.0
+    assert sketch.quantile(0.5) == 3.0
+    assert sketch.quantile(1) == 5.0
+
+def test_rank_error_is_bounded(values):
+    sketch = KLLSketch()
+    for chunk in np.array_split(values, 50):
+        sketch.update_many(chunk.tolist())
+    for value in values[:1000]:
+        sketch.update(value)
+    exact = np.sort(np.concatenate([values, values[:1000]]))
+    assert sketch.n == len(exact)
+    for q in QUANTILES:
+        assert rank_error(exact, sketch.quantile(q), q) <= MAX_RANK_ERROR
+
+def test_memory_stays_bounded(values):
+    sketch = KLLSketch()
+    sketch.update_many(values.tolist())
+    assert sum(len(items) for items in sketch.compactors) < 2000
+
+def test_merge_matches_a_single_sketch(values):
+    single = KLLSketch()
+    single.update_many(values.tolist())
+    parts = [KLLSketch(seed=i) for i in range(8)]
+    for part, chunk in zip(parts, np.array_split(values, len(parts))):
+        part.update_many(chunk.tolist())
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    exact = np.sort(values)
+    assert merged.n == single.n == len(values)
+    for q in QUANTILES:
+        assert rank_error(exact, merged.quantile(q), q) <= MAX_RANK_ERROR
+        # Both estimates are within the error bound of the same quantile, so of each other
+        merged_rank = np.searchsorted(exact, merged.quantile(q)) / len(exact)
+        single_rank = np.searchsorted(exact, single.quantile(q)) / len(exact)
+        assert abs(merged_rank - single_rank) <= 2 * MAX_RANK_ERROR
+
+def test_merge_leaves_the_other_sketch_unchanged():
+    a, b = KLLSketch(), KLLSketch()
+    a.update_many([1.0, 2.0])
+    b.update_many([3.0, 4.0])
+    a.merge(b)
+    assert b.n == 2 and b.compactors == [[3.0, 4.0]]
+    assert a.n == 4
+
+def test_same_stream_gives_the_same_sketch(values):
+    first, second = KLLSketch(), KLLSketch()
+    first.update_many(values.tolist())
+    second.update_many(values.tolist())
+    assert first.compactors == second.compactors
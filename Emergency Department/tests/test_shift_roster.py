@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from shift_roster import ShiftRoster
+
+# Two nurse shifts handing over in [450, 480), and a doctor covering the whole span
+SHIFTS = [
+    ("nurse", 0, 480, [1, 2]),
+    ("nurse", 450, 930, [3, 4]),
+    ("doctor", 0, 930, [9]),
+]
+
+@pytest.fixture
+def roster():
+    return ShiftRoster(SHIFTS)
+
+def test_on_duty_across_the_handover(roster):
+    assert roster.on_duty("nurse", 0) == (1, 2)
+    assert roster.on_duty("nurse", 449) == (1, 2)
+    assert roster.on_duty("nurse", 450) == (1, 2, 3, 4)
+    assert roster.on_duty("nurse", 479) == (1, 2, 3, 4)
+    assert roster.on_duty("nurse", 480) == (3, 4)
+    assert roster.on_duty("doctor", 465) == (9,)
+
+def test_nobody_on_duty_outside_the_roster(roster):
+    assert roster.on_duty("nurse", -1) == ()
+    assert roster.on_duty("nurse", 930) == ()
+    assert roster.on_duty("clerk", 100) == ()
+
+def test_pick_spreads_over_everyone_on_duty(roster):
+    minutes = np.array([10, 10, 460, 460, 460, 460, 600])
+    u = np.array([0.0, 0.99, 0.0, 0.3, 0.6, 0.99, 0.0])
+    assert roster.pick("nurse", minutes, u).tolist() == [1, 2, 1, 2, 3, 4, 3]
+
+def test_pick_matches_on_duty(roster):
+    rng = np.random.default_rng(3)
+    minutes = rng.integers(0, 930, 1000)
+    u = rng.random(1000)
+    picked = roster.pick("nurse", minutes, u)
+    for minute, member in zip(minutes.tolist(), picked.tolist()):
+        assert member in roster.on_duty("nurse", minute)
+
+def test_pick_outside_the_roster_is_refused(roster):
+    with pytest.raises(ValueError):
+        roster.pick("nurse", np.array([100, 930]), np.array([0.5, 0.5]))
+
+def test_changes(roster):
+    assert roster.changes("nurse") == [0, 450, 480, 930]
+    assert roster.changes("nurse", 1, 480) == [450]
+
+def test_window_keeps_the_overlapping_shifts(roster):
+    window = roster.window(470, 500)
+    assert sorted(window.shifts) == sorted(SHIFTS)
+    assert roster.window(500, 600).on_duty("nurse", 550) == (3, 4)
+    assert [shift[1] for shift in roster.window(500, 600).shifts if shift[0] == "nurse"] == [450]
+
+def test_generated_roster_covers_every_minute():
+    import historical_event_log as hel
+    plan = hel.build_day_plan(hel.START_DATE, hel.START_DATE)
+    roster = hel.build_shift_roster(plan)
+    day_start = hel.to_epoch_minutes(hel.START_DATE)
+    minutes = np.arange(day_start, day_start + 24 * 60)
+    for role in hel.SHIFT_STAFFING:
+        assert all(roster.on_duty(role, minute) for minute in minutes.tolist())
+        handover = day_start + 60 * hel.SHIFT_START_HOURS[0] - hel.HANDOVER_MINUTES
+        # During a handover both shifts are on duty, and nobody works two shifts in a row
+        outgoing = set(roster.on_duty(role, handover - 1))
+        both = set(roster.on_duty(role, handover))
+        incoming = set(roster.on_duty(role, handover + hel.HANDOVER_MINUTES))
+        assert both == outgoing | incoming
+        assert not outgoing & incoming
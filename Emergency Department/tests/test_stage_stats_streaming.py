@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from stage_duration_engine import STAGES, sla_bucket_counts
+from stage_stats_streaming import StageSummary, merge_summaries
+
+STAGE = STAGES[0]
+
+@pytest.fixture
+def durations():
+    return np.random.default_rng(11).gamma(2.0, 20.0, 50_000)
+
+def summary_of(stage, *batches):
+    summary = StageSummary(stage)
+    for batch in batches:
+        summary.add_many(batch)
+    return summary
+
+def test_moments_and_buckets_are_exact(durations):
+    summary = summary_of(STAGE, *np.array_split(durations, 7))
+    assert summary.n == len(durations)
+    assert summary.mean == pytest.approx(np.mean(durations))
+    assert summary.std == pytest.approx(np.std(durations))
+    assert summary.buckets == list(sla_bucket_counts(STAGE, durations))
+
+def test_merge_matches_one_summary(durations):
+    whole = summary_of(STAGE, durations)
+    first, second = np.array_split(durations, [12_345])
+    merged = summary_of(STAGE, first).merge(summary_of(STAGE, second))
+    assert merged.n == whole.n
+    assert merged.buckets == whole.buckets
+    assert merged.mean == pytest.approx(whole.mean)
+    assert merged.std == pytest.approx(whole.std)
+    exact = np.sort(durations)
+    for q in (0.5, 0.9):
+        rank = np.searchsorted(exact, merged.quantile(q)) / len(exact)
+        assert rank == pytest.approx(q, abs=0.02)
+
+def test_merge_with_an_empty_summary(durations):
+    summary = summary_of(STAGE, durations)
+    assert StageSummary(STAGE).merge(summary).mean == pytest.approx(summary.mean)
+    assert summary.merge(StageSummary(STAGE)).n == len(durations)
+
+def test_empty_summary():
+    summary = summary_of(STAGE, [])
+    assert summary.n == 0
+    assert summary.std is None
+    assert summary.quantile(0.5) is None
+
+def test_merge_summaries_combines_every_stage(durations):
+    parts = np.array_split(durations, 3)
+    partials = [{stage['name']: summary_of(stage, part) for stage in STAGES} for part in parts]
+    merged = merge_summaries(partials)
+    for stage in STAGES:
+        summary = merged[stage['name']]
+        assert summary.n == len(durations)
+        assert summary.buckets == list(sla_bucket_counts(stage, durations))
+        assert summary.std == pytest.approx(np.std(durations))